@@ -0,0 +1,51 @@
+# backfill_profile_format.py
+
+# This script normalizes the matching fields of profiles saved before profiles
+# were canonicalized on write. It adds the profile_format_version and match key
+# columns (with their indexes) if the table does not have them yet, then rewrites
+# old rows in committed batches. Run it once before deploying; it is safe to run again.
+
+import sys
+import os
+import argparse
+
+# Add the project root to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect, text
+from smart_buddy.db import SessionLocal, engine
+from smart_buddy.matching.profile_normalization import backfill_profile_format
+from smart_buddy.models.sqlalchemy_models import Profile
+
+parser = argparse.ArgumentParser(description="Normalize the matching fields of existing profiles.")
+parser.add_argument("--batch-size", type=int, default=500, help="Profiles rewritten per commit.")
+args = parser.parse_args()
+
+existing_columns = {column["name"] for column in inspect(engine).get_columns("profiles")}
+new_columns = {
+    "profile_format_version": "INTEGER",
+    "personality_key": "VARCHAR(100)",
+    "study_style_key": "VARCHAR(100)",
+    "environment_key": "VARCHAR(100)",
+    "availability_mask": "BIGINT"
+}
+for name, column_type in new_columns.items():
+    if name not in existing_columns:
+        print(f"Adding profiles.{name}...")
+        with engine.begin() as connection:
+            connection.execute(text(f"ALTER TABLE profiles ADD COLUMN {name} {column_type}"))
+
+existing_indexes = {index["name"] for index in inspect(engine).get_indexes("profiles")}
+for index in Profile.__table__.indexes:
+    if index.name not in existing_indexes:
+        print(f"Creating index {index.name}...")
+        index.create(bind=engine)
+
+print("Normalizing profiles...")
+db = SessionLocal()
+try:
+    summary = backfill_profile_format(db, Profile.__table__, batch_size=args.batch_size)
+finally:
+    db.close()
+
+print(f"Profiles normalized: {summary['normalized']}")
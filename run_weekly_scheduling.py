@@ -0,0 +1,42 @@
+# run_weekly_scheduling.py
+
+# This script schedules study sessions for every student for one week and
+# writes them to the sessions table. It checkpoints after each chunk, so an
+# interrupted run picks up where it stopped when started again.
+
+import sys
+import os
+import argparse
+from datetime import date, datetime, timedelta
+
+# Add the project root to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from smart_buddy.db import SessionLocal
+from smart_buddy.matching.batch_scheduler import WeeklyBatchScheduler
+
+parser = argparse.ArgumentParser(description="Schedule study sessions for the whole campus for one week.")
+parser.add_argument("--week-start", help="Monday of the week to schedule (YYYY-MM-DD). Defaults to next Monday.")
+parser.add_argument("--chunk-size", type=int, default=500, help="Students processed per committed chunk.")
+parser.add_argument("--checkpoint", default="weekly_schedule_checkpoint.json", help="Checkpoint file path.")
+parser.add_argument("--reset", action="store_true", help="Ignore the checkpoint and start from the first student.")
+args = parser.parse_args()
+
+if args.week_start:
+    week_start = datetime.strptime(args.week_start, "%Y-%m-%d").date()
+else:
+    today = date.today()
+    week_start = today + timedelta(days=7 - today.weekday())
+
+print(f"Scheduling week starting {week_start.isoformat()}...")
+db = SessionLocal()
+try:
+    scheduler = WeeklyBatchScheduler(chunk_size=args.chunk_size, checkpoint_path=args.checkpoint)
+    summary = scheduler.run(db, week_start, reset=args.reset)
+finally:
+    db.close()
+
+if summary["resumed"]:
+    print("Resumed from checkpoint.")
+print(f"Chunks processed this run: {summary['chunks_this_run']}")
+print(f"Sessions written for the week: {summary['sessions_written']}")
@@ -79,6 +79,53 @@ def get_db():
         yield db_session
     finally:
         db_session.close()
+
+# --- Optional Async Engine ---
+
+# Set USE_ASYNC_DB=true to serve the matching endpoints through an AsyncSession.
+# The async URL is derived from DATABASE_URL unless ASYNC_DATABASE_URL is set.
+USE_ASYNC_DB = os.getenv("USE_ASYNC_DB", "").lower() in ("1", "true", "yes")
+
+# Async drivers for the sync drivers used above
+ASYNC_DRIVERS = {
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql": "mysql+aiomysql",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+_async_session_factory = None
+
+
+def to_async_url(url: str) -> str:
+    """Swap the driver of a database URL for its async counterpart"""
+    scheme, separator, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + separator + rest
+
+
+def get_async_sessionmaker():
+    """
+    Session factory bound to the async engine, created on first use
+    so the async driver is only imported when the async path is enabled.
+    """
+    global _async_session_factory
+    if _async_session_factory is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        async_engine = create_async_engine(os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL))
+        _async_session_factory = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    return _async_session_factory
+
+
+async def get_async_db():
+    """
+    Dependency function to get an async database session for each request.
+    Ensures the session is always closed after the request.
+    """
+    async with get_async_sessionmaker()() as db_session:
+        yield db_session
+
+
 def create_tables():
     """Create all database tables defined by models inheriting from Base."""
     try:
@@ -8,6 +8,7 @@ from sqlalchemy.orm import Session
 # Fix imports to use the correct module path
 from .db import engine, get_db
 from .models import Base, User, Profile, Session as StudySession, Rating
+from .matching.compute_pool import compute_pool
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
@@ -18,6 +19,17 @@ app.add_middleware(SessionMiddleware, secret_key="SUPER_SECRET_KEY")
 app.mount('/static', StaticFiles(directory='smart_buddy/static'), name='static')
 templates = Jinja2Templates(directory="smart_buddy/templates")
 
+# --- MATCHING COMPUTE POOL ---
+# Scoring and scheduling run in worker processes so they cannot stall light routes like /health
+
+@app.on_event("startup")
+def start_compute_pool():
+    compute_pool.start()
+
+@app.on_event("shutdown")
+def stop_compute_pool():
+    compute_pool.shutdown()
+
 # Add a root endpoint to redirect to home
 @app.get("/")
 def redirect_to_home():
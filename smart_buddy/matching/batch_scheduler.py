@@ -0,0 +1,248 @@
+"""
+Campus-wide weekly batch scheduling
+Runs matching and the CSP solver over the whole population in chunks, bulk inserts the
+resulting sessions and checkpoints progress so an interrupted run resumes where it stopped
+"""
+from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass, asdict
+from datetime import date, datetime, time, timedelta
+import json
+import os
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from smart_buddy.models.sqlalchemy_models import Session as StudySessionRecord
+from smart_buddy.matching.matching_service import StudyBuddyMatcher
+from smart_buddy.matching.compatibility_engine import StudentProfile
+from smart_buddy.matching.encoded_population import EncodedPopulation
+from smart_buddy.matching.csp_solver import ConstraintState, PairOverlapCache, ScheduleSlot, StudySession, DayOfWeek
+
+
+DAY_NAMES = [day.value for day in DayOfWeek]
+
+# Clock time each coarse availability slot starts at
+SLOT_START_TIMES = {
+    "Morning": time(9, 0),
+    "Afternoon": time(13, 0),
+    "Evening": time(18, 0)
+}
+
+
+def session_datetime(slot: ScheduleSlot, week_start: date) -> Optional[datetime]:
+    """
+    Concrete start time of a scheduled slot in the given week
+
+    Accepts coarse slots ("Morning") and interval scheduler starts ("14:30").
+    Returns None for days or times that cannot be placed.
+    """
+    if slot.day not in DAY_NAMES:
+        return None
+
+    start = SLOT_START_TIMES.get(slot.time)
+    if start is None:
+        try:
+            start = datetime.strptime(slot.time, "%H:%M").time()
+        except ValueError:
+            return None
+
+    session_date = week_start + timedelta(days=DAY_NAMES.index(slot.day))
+    return datetime.combine(session_date, start)
+
+
+def slot_from_datetime(value: datetime) -> ScheduleSlot:
+    """Inverse of session_datetime, used to rebuild state from stored sessions"""
+    labels = {start: label for label, start in SLOT_START_TIMES.items()}
+    label = labels.get(value.time().replace(second=0, microsecond=0), value.strftime("%H:%M"))
+    return ScheduleSlot(day=DAY_NAMES[value.weekday()], time=label)
+
+
+@dataclass
+class BatchCheckpoint:
+    """Progress of a weekly batch run, persisted after every committed chunk"""
+    week_start: str
+    last_student_id: int = 0
+    chunks_completed: int = 0
+    sessions_written: int = 0
+    completed: bool = False
+
+    @classmethod
+    def load(cls, path: str, week_start: date) -> "BatchCheckpoint":
+        """Load the checkpoint for a week, or start fresh if missing or for another week"""
+        if os.path.exists(path):
+            with open(path) as checkpoint_file:
+                data = json.load(checkpoint_file)
+            if data.get("week_start") == week_start.isoformat():
+                return cls(**data)
+        return cls(week_start=week_start.isoformat())
+
+    def save(self, path: str) -> None:
+        """Write the checkpoint atomically so a crash never leaves a partial file"""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as checkpoint_file:
+            json.dump(asdict(self), checkpoint_file)
+        os.replace(temp_path, path)
+
+
+class WeeklyBatchScheduler:
+    """Chunked, resumable scheduling job for the whole student population"""
+
+    def __init__(self,
+                 matcher: Optional[StudyBuddyMatcher] = None,
+                 chunk_size: int = 500,
+                 matches_per_student: int = 5,
+                 min_score: float = 50.0,
+                 insert_batch_size: int = 1000,
+                 checkpoint_path: str = "weekly_schedule_checkpoint.json"):
+        """
+        Initialize the batch scheduler
+
+        Args:
+            matcher: Matcher providing the compatibility engine and CSP solver
+            chunk_size: Students matched and scheduled per committed chunk
+            matches_per_student: Top matches considered per student
+            min_score: Minimum compatibility score for a pair to be scheduled
+            insert_batch_size: Rows per bulk INSERT statement
+            checkpoint_path: File that records progress between runs
+        """
+        self.matcher = matcher or StudyBuddyMatcher()
+        self.chunk_size = chunk_size
+        self.matches_per_student = matches_per_student
+        self.min_score = min_score
+        self.insert_batch_size = insert_batch_size
+        self.checkpoint_path = checkpoint_path
+
+    def run(self, db: Session, week_start: date, reset: bool = False) -> Dict:
+        """
+        Schedule every student for the week starting at week_start
+
+        Args:
+            db: Database session
+            week_start: Monday of the week to schedule
+            reset: Ignore any existing checkpoint and start from the first student
+
+        Returns:
+            Summary of the run
+        """
+        checkpoint = BatchCheckpoint(week_start=week_start.isoformat()) if reset \
+            else BatchCheckpoint.load(self.checkpoint_path, week_start)
+
+        if checkpoint.completed:
+            return {**asdict(checkpoint), "resumed": True, "chunks_this_run": 0}
+
+        resumed = checkpoint.last_student_id > 0
+        population = sorted(self.matcher.get_student_profiles(db), key=lambda profile: profile.id)
+        profiles_by_id = {profile.id: profile for profile in population}
+        availabilities = {profile.id: profile.availability for profile in population}
+        encoded = EncodedPopulation()
+        for profile in population:
+            encoded.add(profile)
+
+        # Sessions committed by earlier chunks (or an interrupted run) still count. They
+        # are counted from the stored rows, since a run can stop after committing a chunk
+        # but before checkpointing it.
+        constraint_state = ConstraintState(self.matcher.csp_solver.constraints)
+        scheduled_pairs = set()
+        stored_sessions = self._load_week_sessions(db, week_start, population)
+        for session in stored_sessions:
+            constraint_state.add(session)
+            scheduled_pairs.add(frozenset((session.partner1_id, session.partner2_id)))
+        checkpoint.sessions_written = len(stored_sessions)
+
+        overlap_cache = PairOverlapCache({profile.id: profile.version for profile in population})
+        pending = [profile for profile in population if profile.id > checkpoint.last_student_id]
+        chunks_this_run = 0
+
+        for chunk_start in range(0, len(pending), self.chunk_size):
+            chunk = pending[chunk_start:chunk_start + self.chunk_size]
+            compatibility_pairs = self._chunk_pairs(chunk, encoded, scheduled_pairs)
+
+            sessions = self.matcher.csp_solver.solve_schedule(
+                student_availabilities=availabilities,
+                compatibility_pairs=compatibility_pairs,
+                max_sessions_to_schedule=len(compatibility_pairs),
+                overlap_cache=overlap_cache,
+                constraint_state=constraint_state
+            )
+
+            rows = self._session_rows(sessions, profiles_by_id, week_start)
+            for batch_start in range(0, len(rows), self.insert_batch_size):
+                db.execute(insert(StudySessionRecord), rows[batch_start:batch_start + self.insert_batch_size])
+            db.commit()
+
+            for session in sessions:
+                scheduled_pairs.add(frozenset((session.partner1_id, session.partner2_id)))
+
+            checkpoint.last_student_id = chunk[-1].id
+            checkpoint.chunks_completed += 1
+            checkpoint.sessions_written += len(rows)
+            checkpoint.save(self.checkpoint_path)
+            chunks_this_run += 1
+
+        checkpoint.completed = True
+        checkpoint.save(self.checkpoint_path)
+
+        return {**asdict(checkpoint), "resumed": resumed, "chunks_this_run": chunks_this_run}
+
+    def _chunk_pairs(self,
+                     chunk: List[StudentProfile],
+                     population: EncodedPopulation,
+                     scheduled_pairs: set) -> List[Tuple[int, int, float]]:
+        """Top matches of each student in the chunk that are not scheduled yet"""
+        compatibility_pairs = []
+        seen = set()
+        for student in chunk:
+            matches = population.top_matches(
+                self.matcher.compatibility_engine,
+                student,
+                min_score=self.min_score,
+                max_results=self.matches_per_student
+            )
+            for partner_id, score in matches:
+                pair = frozenset((student.id, partner_id))
+                if pair in scheduled_pairs or pair in seen:
+                    continue
+                seen.add(pair)
+                compatibility_pairs.append((student.id, partner_id, score))
+        return compatibility_pairs
+
+    def _session_rows(self,
+                      sessions: List[StudySession],
+                      profiles_by_id: Dict[int, StudentProfile],
+                      week_start: date) -> List[Dict]:
+        """Rows for a bulk insert into the sessions table"""
+        rows = []
+        for session in sessions:
+            start = session_datetime(session.schedule_slot, week_start)
+            if start is None:
+                continue
+            rows.append({
+                "student1": profiles_by_id[session.partner1_id].username,
+                "student2": profiles_by_id[session.partner2_id].username,
+                "datetime": start,
+                "status": "scheduled"
+            })
+        return rows
+
+    def _load_week_sessions(self,
+                            db: Session,
+                            week_start: date,
+                            population: List[StudentProfile]) -> List[StudySession]:
+        """Sessions already stored for the week, as StudySession objects"""
+        ids_by_username = {profile.username: profile.id for profile in population}
+        week_begin = datetime.combine(week_start, time.min)
+        records = db.query(
+            StudySessionRecord.student1, StudySessionRecord.student2, StudySessionRecord.datetime
+        ).filter(
+            StudySessionRecord.datetime >= week_begin,
+            StudySessionRecord.datetime < week_begin + timedelta(days=7),
+            StudySessionRecord.status == "scheduled"
+        ).all()
+
+        sessions = []
+        for student1, student2, start in records:
+            if student1 in ids_by_username and student2 in ids_by_username:
+                sessions.append(StudySession(
+                    partner1_id=ids_by_username[student1],
+                    partner2_id=ids_by_username[student2],
+                    schedule_slot=slot_from_datetime(start)
+                ))
+        return sessions
@@ -0,0 +1,114 @@
+"""
+SQL prefilter for matching candidates
+Upper bounds on the compatibility score become a WHERE clause over the indexed match key
+columns, so profiles that cannot reach min_score are never loaded
+"""
+from typing import List, Optional, Tuple
+from itertools import product
+from sqlalchemy import and_, or_
+from smart_buddy.matching.compatibility_engine import CompatibilityEngine, StudentProfile, \
+    PersonalityType, StudyStyle, Environment
+from smart_buddy.matching.profile_normalization import AVAILABILITY_BITS, match_key
+
+
+# Keys the engine scores specially; every other key gets the same default score
+PERSONALITY_KEYS = tuple(match_key(member.value) for member in PersonalityType)
+STUDY_STYLE_KEYS = tuple(match_key(member.value) for member in StudyStyle)
+ENVIRONMENT_KEYS = tuple(match_key(member.value) for member in Environment)
+
+# Stands in for any key without a special rule
+_OTHER_KEY = "\x00OTHER"
+
+
+def _key_classes(query_value, special_keys: Tuple[str, ...], score_fn) -> List[Tuple[float, Optional[Tuple[str, ...]]]]:
+    """
+    (score, candidate keys) classes for one categorical component
+
+    Candidate keys of None stand for every key not listed in another class.
+    """
+    listed = tuple(dict.fromkeys((match_key(query_value),) + special_keys))
+    classes = [(score_fn(query_value, key), (key,)) for key in listed]
+    classes.append((score_fn(query_value, _OTHER_KEY), None))
+    return classes
+
+
+def _key_condition(column, keys: Optional[Tuple[str, ...]], listed: Tuple[str, ...]):
+    return column.in_(keys) if keys is not None else column.notin_(listed)
+
+
+def _query_slot_mask(availability) -> Optional[int]:
+    """Grid bits of the querying student's slots, or None if one lies outside the grid"""
+    mask = 0
+    for day, time_slots in availability.items():
+        for slot in time_slots:
+            bit = AVAILABILITY_BITS.get((day, slot))
+            if bit is None:
+                return None
+            mask |= 1 << bit
+    return mask
+
+
+def viable_partner_filter(engine: CompatibilityEngine, student: StudentProfile, min_score: float, profiles):
+    """
+    SQL condition keeping only profiles that could score at least min_score with student
+
+    Personality and study preference scores depend only on the candidate's match keys,
+    so they are exact; academic goals and availability are bounded by their best case.
+    A candidate sharing no grid slot scores 0 for availability, which rules it out when
+    availability carries enough weight. Profiles without match keys are always kept.
+
+    Args:
+        engine: Engine whose weights and scoring rules are applied
+        student: The student looking for matches
+        min_score: Minimum total score of the matches that will be kept
+        profiles: The profiles Table
+
+    Returns:
+        Condition for the WHERE clause, or None when no profile can be ruled out
+    """
+    weights = (engine.personality_weight, engine.study_preferences_weight,
+               engine.academic_goals_weight, engine.availability_weight)
+    if min(weights) < 0:
+        return None
+    personality_weight, study_preferences_weight, academic_goals_weight, availability_weight = weights
+
+    columns = profiles.c
+    has_areas = any(area and str(area).strip() for area in (student.academic_focus_areas or []))
+    academic_bound = 100.0 if has_areas else 50.0
+    availability = student.availability if isinstance(student.availability, dict) else {}
+    has_slots = any(len(time_slots) for time_slots in availability.values())
+    availability_bound = 100.0 if has_slots else 0.0
+    slot_mask = _query_slot_mask(availability) if has_slots else None
+
+    personality_classes = _key_classes(student.personality_type, PERSONALITY_KEYS,
+                                       engine._compute_personality_type_score)
+    style_classes = _key_classes(student.study_style, STUDY_STYLE_KEYS, engine._compute_study_style_score)
+    environment_classes = _key_classes(student.preferred_environment, ENVIRONMENT_KEYS,
+                                       engine._compute_environment_score)
+    listed = [tuple(key for _, keys in classes if keys is not None for key in keys)
+              for classes in (personality_classes, style_classes, environment_classes)]
+
+    conditions = []
+    ruled_out = False
+    for (personality, personality_keys), (style, style_keys), (environment, environment_keys) in \
+            product(personality_classes, style_classes, environment_classes):
+        # Same arithmetic as the scorer, with the unknown components at their maximum
+        partial = personality * personality_weight + ((style + environment) / 2.0) * study_preferences_weight + \
+            academic_bound * academic_goals_weight
+        best = partial + availability_bound * availability_weight
+        if best < min_score:
+            ruled_out = True
+            continue
+        condition = and_(
+            _key_condition(columns.personality_key, personality_keys, listed[0]),
+            _key_condition(columns.study_style_key, style_keys, listed[1]),
+            _key_condition(columns.environment_key, environment_keys, listed[2])
+        )
+        if partial < min_score and slot_mask is not None:
+            ruled_out = True
+            condition = and_(condition, columns.availability_mask.op("&")(slot_mask) != 0)
+        conditions.append(condition)
+
+    if not ruled_out:
+        return None
+    return or_(columns.personality_key.is_(None), *conditions)
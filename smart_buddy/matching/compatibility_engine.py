@@ -6,6 +6,7 @@ from typing import Dict, List, Tuple, Optional
 import json
 from dataclasses import dataclass
 from enum import Enum
+from smart_buddy.matching.profile_normalization import PROFILE_FORMAT_VERSION
 
 
 class PersonalityType(Enum):
@@ -40,11 +41,26 @@ class StudentProfile:
     preferred_environment: str
     academic_focus_areas: List[str]
     availability: Dict[str, List[str]]  # day -> time_slots
+    version: Optional[object] = None  # Profile updated_at, used to key per-profile caches
     
     @classmethod
     def from_db_profile(cls, profile):
         """Create StudentProfile from database Profile model"""
-        # Parse JSON fields if they're strings
+        # Profiles normalized on write are already canonical; read the columns as they are
+        if getattr(profile, 'profile_format_version', None) == PROFILE_FORMAT_VERSION:
+            return cls(
+                id=profile.id,
+                username=profile.username,
+                email=profile.email,
+                personality_type=profile.personality_traits,
+                study_style=profile.study_style,
+                preferred_environment=profile.preferred_environment,
+                academic_focus_areas=profile.academic_focus_areas,
+                availability=profile.availability,
+                version=getattr(profile, 'updated_at', None)
+            )
+
+        # Older rows: parse JSON fields if they're strings
         academic_areas = profile.academic_focus_areas
         if isinstance(academic_areas, str):
             try:
@@ -89,7 +105,8 @@ class StudentProfile:
             study_style=profile.study_style,
             preferred_environment=profile.preferred_environment,
             academic_focus_areas=academic_areas,
-            availability=availability
+            availability=availability,
+            version=getattr(profile, 'updated_at', None)
         )
 
 
@@ -159,8 +176,12 @@ class CompatibilityEngine:
         - Introvert + Extrovert: 70 (can complement each other)
         - Any + Ambivert: 85 (ambivert adapts well)
         """
-        p1 = student1.personality_type.upper() if hasattr(student1.personality_type, 'upper') else str(student1.personality_type).upper()
-        p2 = student2.personality_type.upper() if hasattr(student2.personality_type, 'upper') else str(student2.personality_type).upper()
+        return self._compute_personality_type_score(student1.personality_type, student2.personality_type)
+    
+    def _compute_personality_type_score(self, type1: str, type2: str) -> float:
+        """Compute personality type compatibility"""
+        p1 = type1.upper() if hasattr(type1, 'upper') else str(type1).upper()
+        p2 = type2.upper() if hasattr(type2, 'upper') else str(type2).upper()
         
         if p1 == p2:
             return 100.0
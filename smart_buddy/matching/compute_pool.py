@@ -0,0 +1,176 @@
+"""
+Process pool for CPU-heavy matching work
+Pair scoring, schedule solving and large rankings run in worker processes, so they neither
+hold the API worker's GIL nor queue behind each other on its event loop
+"""
+from typing import Callable, Dict, Optional, Tuple
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import asyncio
+import multiprocessing
+import os
+import threading
+
+
+class ComputePoolError(RuntimeError):
+    """Raised when work cannot be completed by the compute pool"""
+
+
+class ComputePoolBusy(ComputePoolError):
+    """Raised when the pool already has as many tasks pending as it accepts"""
+
+
+class ComputePoolTimeout(ComputePoolError):
+    """Raised when a task does not finish within its timeout"""
+
+
+class ComputePool:
+    """Bounded ProcessPoolExecutor owned by the application"""
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 task_timeout: float = 30.0):
+        """
+        Args:
+            max_workers: Worker processes (one per CPU if omitted, 0 disables the pool)
+            max_pending: Tasks queued or running before new ones are refused
+                (twice the number of workers if omitted)
+            task_timeout: Seconds a caller waits for a task before giving up
+        """
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self.max_pending = max_pending if max_pending is not None else 2 * max(self.max_workers, 1)
+        self.task_timeout = task_timeout
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._counters = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "timed_out": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None
+
+    def start(self) -> None:
+        """Create the executor; worker processes are spawned as the first tasks arrive"""
+        with self._lock:
+            if self._executor is None and self.max_workers > 0:
+                self._executor = self._create_executor()
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # Spawned rather than forked: the API worker has threads and open connections
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the workers, cancelling tasks that have not started"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    async def run(self, function: Callable, *args, timeout: Optional[float] = None):
+        """
+        Run function(*args) in a worker process and await its result
+
+        Without a running pool the call runs in a worker thread instead, as before the
+        pool existed. function and args must be picklable.
+
+        Args:
+            function: Module-level function or method of a picklable object
+            timeout: Seconds to wait instead of task_timeout
+
+        Raises:
+            ComputePoolBusy: max_pending tasks are already queued or running
+            ComputePoolTimeout: The task did not finish in time
+        """
+        executor, future = self._submit(function, args)
+        if future is None:
+            return await asyncio.to_thread(function, *args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.task_timeout)
+        except asyncio.TimeoutError:
+            raise self._timed_out(future, timeout)
+        except BrokenProcessPool:
+            raise self._broken(executor)
+
+    def call(self, function: Callable, *args, timeout: Optional[float] = None):
+        """
+        Blocking variant of run for code already running in a worker thread
+
+        Without a running pool the call runs inline.
+        """
+        executor, future = self._submit(function, args)
+        if future is None:
+            return function(*args)
+        try:
+            return future.result(timeout or self.task_timeout)
+        except FutureTimeoutError:
+            raise self._timed_out(future, timeout)
+        except BrokenProcessPool:
+            raise self._broken(executor)
+
+    def _submit(self, function: Callable, args: tuple) -> Tuple[Optional[ProcessPoolExecutor], Optional[Future]]:
+        """(executor, submitted future), or (None, None) if the pool is not running"""
+        with self._lock:
+            executor = self._executor
+            if executor is None:
+                return None, None
+            if self._pending >= self.max_pending:
+                self._counters["rejected"] += 1
+                raise ComputePoolBusy(f"Matching is at capacity ({self._pending} tasks pending)")
+            future = executor.submit(function, *args)
+            self._pending += 1
+            self._counters["submitted"] += 1
+        # A timed out task keeps its slot until the worker actually finishes it, so
+        # runaway tasks cannot let the queue grow past max_pending
+        future.add_done_callback(self._task_done)
+        return executor, future
+
+    def _task_done(self, future) -> None:
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                self._counters["failed"] += 1
+            else:
+                self._counters["completed"] += 1
+
+    def _timed_out(self, future, timeout: Optional[float]) -> ComputePoolTimeout:
+        # Only drops the task if no worker has picked it up yet
+        future.cancel()
+        with self._lock:
+            self._counters["timed_out"] += 1
+        return ComputePoolTimeout(f"Matching task did not finish within {timeout or self.task_timeout}s")
+
+    def _broken(self, failed_executor: ProcessPoolExecutor) -> ComputePoolError:
+        """
+        Replace an executor whose worker died so later tasks can run
+
+        Tasks failing together all report the same executor; only the first replaces
+        it, so later ones never shut down the replacement and the tasks queued on it.
+        """
+        with self._lock:
+            replace = self._executor is failed_executor
+            if replace:
+                self._executor = self._create_executor()
+        if replace:
+            failed_executor.shutdown(wait=False, cancel_futures=True)
+        return ComputePoolError("A matching worker process exited unexpectedly")
+
+    def stats(self) -> Dict:
+        """Configuration and task counters of the pool"""
+        with self._lock:
+            return {
+                "running": self.running,
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "task_timeout_seconds": self.task_timeout,
+                **self._counters
+            }
+
+
+# Pool shared by every matching request in this API worker, started and stopped with the app.
+# MATCHING_POOL_WORKERS=0 keeps matching work in threads of the API worker.
+compute_pool = ComputePool(
+    max_workers=int(os.environ["MATCHING_POOL_WORKERS"]) if os.getenv("MATCHING_POOL_WORKERS") else None,
+    max_pending=int(os.environ["MATCHING_POOL_MAX_PENDING"]) if os.getenv("MATCHING_POOL_MAX_PENDING") else None,
+    task_timeout=float(os.getenv("MATCHING_TASK_TIMEOUT", "30"))
+)
@@ -2,10 +2,12 @@
 CSP (Constraint Satisfaction Problem) solver for study buddy scheduling
 Ensures that matched partners have feasible time slots for study sessions
 """
-from typing import Dict, List, Tuple, Set, Optional
-from dataclasses import dataclass
+from typing import Dict, List, Tuple, Set, Optional, FrozenSet, Iterable, Hashable
+from dataclasses import dataclass, field
+from contextlib import contextmanager
 from enum import Enum
 import itertools
+import time
 
 
 class TimeSlot(Enum):
@@ -113,6 +115,179 @@ class SchedulingConstraints:
         return True
 
 
+class ConstraintState:
+    """
+    Incremental per-student counters for the scheduling constraints
+    
+    Mirrors SchedulingConstraints.validate_session, but sessions are added and
+    removed in O(1) instead of rescanning the whole schedule for every check.
+    """
+    
+    def __init__(self, constraints: SchedulingConstraints, sessions: Iterable[StudySession] = ()):
+        self.constraints = constraints
+        self.daily_counts: Dict[Tuple[int, str], int] = {}
+        self.weekly_counts: Dict[int, int] = {}
+        self.partner_counts: Dict[int, Dict[int, int]] = {}  # student -> partner -> sessions
+        for session in sessions:
+            self.add(session)
+    
+    def _update(self, session: StudySession, delta: int) -> None:
+        day = session.schedule_slot.day
+        for student_id, other_id in ((session.partner1_id, session.partner2_id),
+                                     (session.partner2_id, session.partner1_id)):
+            self.daily_counts[(student_id, day)] = self.daily_counts.get((student_id, day), 0) + delta
+            self.weekly_counts[student_id] = self.weekly_counts.get(student_id, 0) + delta
+            partners = self.partner_counts.setdefault(student_id, {})
+            partners[other_id] = partners.get(other_id, 0) + delta
+            if partners[other_id] <= 0:
+                del partners[other_id]
+    
+    def add(self, session: StudySession) -> None:
+        """Record a scheduled session"""
+        self._update(session, 1)
+    
+    def remove(self, session: StudySession) -> None:
+        """Forget a previously recorded session"""
+        self._update(session, -1)
+    
+    def check(self, session: StudySession) -> Optional[str]:
+        """
+        Name of the first constraint the session would violate
+        
+        Returns:
+            "daily", "weekly" or "partner", or None if the session fits
+        """
+        day = session.schedule_slot.day
+        student_ids = (session.partner1_id, session.partner2_id)
+        
+        if any(self.daily_counts.get((student_id, day), 0) >= self.constraints.max_sessions_per_day
+               for student_id in student_ids):
+            return "daily"
+        
+        if any(self.weekly_counts.get(student_id, 0) >= self.constraints.max_sessions_per_week
+               for student_id in student_ids):
+            return "weekly"
+        
+        for student_id, other_id in ((session.partner1_id, session.partner2_id),
+                                     (session.partner2_id, session.partner1_id)):
+            partners = self.partner_counts.get(student_id, {})
+            partner_total = len(partners) + (0 if other_id in partners else 1)
+            if partner_total > self.constraints.max_partners_per_student:
+                return "partner"
+        
+        return None
+    
+    def can_schedule(self, session: StudySession) -> bool:
+        """Check if a session can be added without violating any constraint"""
+        return self.check(session) is None
+
+
+@dataclass
+class SolverTrace:
+    """Search statistics for one scheduling run"""
+    pairs_considered: int = 0
+    pairs_skipped_missing_availability: int = 0
+    pairs_skipped_no_overlap: int = 0
+    pairs_scheduled: int = 0
+    pairs_blocked_by_constraints: int = 0
+    stopped_at_session_limit: bool = False
+    slots_tried: int = 0
+    rejections: Dict[str, int] = field(default_factory=lambda: {"daily": 0, "weekly": 0, "partner": 0})
+    optimize_slots_tried: int = 0
+    optimize_sessions_moved: int = 0
+    overlap_cache_hits: int = 0
+    overlap_cache_misses: int = 0
+    phase_seconds: Dict[str, float] = field(default_factory=dict)
+    
+    @contextmanager
+    def phase(self, name: str):
+        """Time a phase; repeated phases accumulate"""
+        started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + time.perf_counter() - started
+    
+    def reject(self, rule: str) -> None:
+        """Count a slot rejected by a constraint rule"""
+        self.rejections[rule] = self.rejections.get(rule, 0) + 1
+    
+    def record_cache(self, overlap_cache: "PairOverlapCache") -> None:
+        """Copy the overlap cache counters at the end of a run"""
+        self.overlap_cache_hits = overlap_cache.hits
+        self.overlap_cache_misses = overlap_cache.misses
+    
+    def to_dict(self) -> Dict:
+        """Convert to dictionary for API responses"""
+        return {
+            "pairs_considered": self.pairs_considered,
+            "pairs_skipped_missing_availability": self.pairs_skipped_missing_availability,
+            "pairs_skipped_no_overlap": self.pairs_skipped_no_overlap,
+            "pairs_scheduled": self.pairs_scheduled,
+            "pairs_blocked_by_constraints": self.pairs_blocked_by_constraints,
+            "stopped_at_session_limit": self.stopped_at_session_limit,
+            "slots_tried": self.slots_tried,
+            "constraint_rejections": dict(self.rejections),
+            "optimize_slots_tried": self.optimize_slots_tried,
+            "optimize_sessions_moved": self.optimize_sessions_moved,
+            "overlap_cache_hits": self.overlap_cache_hits,
+            "overlap_cache_misses": self.overlap_cache_misses,
+            "phase_ms": {name: round(seconds * 1000, 3) for name, seconds in self.phase_seconds.items()}
+        }
+
+
+class PairOverlapCache:
+    """
+    Common availability per student pair, scoped to a single scheduling run
+    
+    Entries are keyed by both student IDs and their availability versions, so a
+    profile edit can never be served a stale overlap.
+    """
+    
+    def __init__(self, student_versions: Optional[Dict[int, Hashable]] = None):
+        """
+        Args:
+            student_versions: Dict mapping student_id -> availability version
+                (e.g. the profile's updated_at); missing students use None
+        """
+        self.student_versions = student_versions or {}
+        self._entries: Dict[Tuple, FrozenSet[ScheduleSlot]] = {}
+        self.hits = 0
+        self.misses = 0
+    
+    def _key(self, student1_id: int, student2_id: int) -> Tuple:
+        """Order-independent key for a pair at the current versions"""
+        low, high = sorted((student1_id, student2_id))
+        return (low, high, self.student_versions.get(low), self.student_versions.get(high))
+    
+    def get(self, student1_id: int, student2_id: int) -> Optional[FrozenSet[ScheduleSlot]]:
+        """Cached common slots for a pair, or None if not computed yet"""
+        slots = self._entries.get(self._key(student1_id, student2_id))
+        if slots is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return slots
+    
+    def put(self, student1_id: int, student2_id: int, slots: Iterable[ScheduleSlot]) -> FrozenSet[ScheduleSlot]:
+        """Store the common slots for a pair"""
+        frozen = frozenset(slots)
+        self._entries[self._key(student1_id, student2_id)] = frozen
+        return frozen
+    
+    def seed(self, student1_id: int, student2_id: int, shared_time_slots: Iterable[Tuple[str, str]]) -> None:
+        """Seed a pair from the compatibility engine's (day, time_slot) overlap"""
+        self.put(student1_id, student2_id,
+                 (ScheduleSlot(day=day, time=time_slot) for day, time_slot in shared_time_slots))
+    
+    def invalidate_student(self, student_id: int) -> None:
+        """Bump a student's version so their cached overlaps are no longer used"""
+        self.student_versions[student_id] = object()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
 class CSPSolver:
     """Constraint Satisfaction Problem solver for study session scheduling"""
     
@@ -135,9 +310,24 @@ class CSPSolver:
         
         return partner1_slots.intersection(partner2_slots)
     
+    def get_common_slots(self, student1_id: int, student2_id: int,
+                         student_availabilities: Dict[int, Dict[str, List[str]]],
+                         overlap_cache: PairOverlapCache) -> FrozenSet[ScheduleSlot]:
+        """Common availability for a pair, computed at most once per cache"""
+        common_slots = overlap_cache.get(student1_id, student2_id)
+        if common_slots is None:
+            common_slots = overlap_cache.put(student1_id, student2_id, self.find_common_availability(
+                student_availabilities.get(student1_id, {}),
+                student_availabilities.get(student2_id, {})
+            ))
+        return common_slots
+    
     def solve_schedule(self, student_availabilities: Dict[int, Dict[str, List[str]]], 
                       compatibility_pairs: List[Tuple[int, int, float]],
-                      max_sessions_to_schedule: int = 20) -> List[StudySession]:
+                      max_sessions_to_schedule: int = 20,
+                      overlap_cache: Optional[PairOverlapCache] = None,
+                      constraint_state: Optional[ConstraintState] = None,
+                      trace: Optional[SolverTrace] = None) -> List[StudySession]:
         """
         Solve the scheduling CSP to create optimal study session schedule
         
@@ -145,30 +335,44 @@ class CSPSolver:
             student_availabilities: Dict mapping student_id -> availability dict
             compatibility_pairs: List of (student1_id, student2_id, compatibility_score) tuples
             max_sessions_to_schedule: Maximum number of sessions to schedule
+            overlap_cache: Pair overlap cache for this scheduling run (created if omitted)
+            constraint_state: State holding sessions scheduled earlier (e.g. by previous
+                batches); updated in place. A fresh state is used if omitted.
+            trace: Search statistics, updated in place (created if omitted)
             
         Returns:
-            List of scheduled StudySession objects that satisfy all constraints
+            List of newly scheduled StudySession objects that satisfy all constraints
         """
+        if overlap_cache is None:
+            overlap_cache = PairOverlapCache()
+        if trace is None:
+            trace = SolverTrace()
+        
         # Sort pairs by compatibility score (descending)
         sorted_pairs = sorted(compatibility_pairs, key=lambda x: x[2], reverse=True)
         
         scheduled_sessions = []
+        if constraint_state is None:
+            constraint_state = ConstraintState(self.constraints)
         
         for student1_id, student2_id, score in sorted_pairs:
             if len(scheduled_sessions) >= max_sessions_to_schedule:
+                trace.stopped_at_session_limit = True
                 break
             
+            trace.pairs_considered += 1
+            
             # Get availability for both students
             if student1_id not in student_availabilities or student2_id not in student_availabilities:
+                trace.pairs_skipped_missing_availability += 1
                 continue
             
-            availability1 = student_availabilities[student1_id]
-            availability2 = student_availabilities[student2_id]
-            
             # Find common availability slots
-            common_slots = self.find_common_availability(availability1, availability2)
+            common_slots = self.get_common_slots(student1_id, student2_id,
+                                                 student_availabilities, overlap_cache)
             
             if not common_slots:
+                trace.pairs_skipped_no_overlap += 1
                 continue  # No common availability
             
             # Try to schedule sessions in common slots
@@ -183,11 +387,18 @@ class CSPSolver:
                     partner2_id=student2_id,
                     schedule_slot=slot
                 )
+                trace.slots_tried += 1
                 
                 # Check if this session violates any constraints
-                if self.constraints.validate_session(potential_session, scheduled_sessions):
+                violated_rule = constraint_state.check(potential_session)
+                if violated_rule is None:
                     scheduled_sessions.append(potential_session)
+                    constraint_state.add(potential_session)
+                    trace.pairs_scheduled += 1
                     break  # Only schedule one session per pair for now
+                trace.reject(violated_rule)
+            else:
+                trace.pairs_blocked_by_constraints += 1
         
         return scheduled_sessions
     
@@ -256,30 +467,39 @@ class CSPSolver:
         return len(violations) == 0, violations
     
     def optimize_schedule(self, initial_schedule: List[StudySession], 
-                         student_availabilities: Dict[int, Dict[str, List[str]]]) -> List[StudySession]:
+                         student_availabilities: Dict[int, Dict[str, List[str]]],
+                         overlap_cache: Optional[PairOverlapCache] = None,
+                         trace: Optional[SolverTrace] = None) -> List[StudySession]:
         """
         Optimize an initial schedule by trying to improve slot assignments
         
         Args:
             initial_schedule: Initial schedule to optimize
             student_availabilities: Student availability data
+            overlap_cache: Pair overlap cache shared with solve_schedule (created if omitted)
+            trace: Search statistics, updated in place (created if omitted)
             
         Returns:
             Optimized schedule
         """
+        if overlap_cache is None:
+            overlap_cache = PairOverlapCache()
+        if trace is None:
+            trace = SolverTrace()
+        
         optimized_schedule = initial_schedule.copy()
+        constraint_state = ConstraintState(self.constraints, optimized_schedule)
         
         # Try to move sessions to more preferred time slots
         for i, session in enumerate(optimized_schedule):
             current_slot = session.schedule_slot
             
             # Get common availability for this pair
-            availability1 = student_availabilities.get(session.partner1_id, {})
-            availability2 = student_availabilities.get(session.partner2_id, {})
-            common_slots = self.find_common_availability(availability1, availability2)
+            common_slots = self.get_common_slots(session.partner1_id, session.partner2_id,
+                                                 student_availabilities, overlap_cache)
             
             # Remove current session temporarily
-            temp_schedule = optimized_schedule[:i] + optimized_schedule[i+1:]
+            constraint_state.remove(session)
             
             # Try better slots
             better_slots = [slot for slot in common_slots 
@@ -291,9 +511,220 @@ class CSPSolver:
                     partner2_id=session.partner2_id,
                     schedule_slot=better_slot
                 )
+                trace.optimize_slots_tried += 1
                 
-                if self.constraints.validate_session(test_session, temp_schedule):
+                if constraint_state.can_schedule(test_session):
                     optimized_schedule[i] = test_session
+                    trace.optimize_sessions_moved += 1
                     break
+            
+            constraint_state.add(optimized_schedule[i])
         
         return optimized_schedule
+    
+    def repair_schedule(self,
+                        schedule: List[StudySession],
+                        changed_student_id: int,
+                        new_availability: Dict[str, List[str]],
+                        student_availabilities: Dict[int, Dict[str, List[str]]],
+                        compatibility_pairs: Optional[List[Tuple[int, int, float]]] = None,
+                        neighborhood_size: int = 5,
+                        overlap_cache: Optional[PairOverlapCache] = None,
+                        constraint_state: Optional[ConstraintState] = None) -> Tuple[List[StudySession], Dict]:
+        """
+        Repair a schedule after one student's availability changes
+        
+        Only the changed student's sessions that no longer fit are unassigned. Each is
+        re-placed in the pair's common availability; if every slot is blocked, at most
+        neighborhood_size sessions of the two partners are moved to make room. Pairs
+        of the changed student without a session (from compatibility_pairs) are then
+        given one if the new availability allows it. Untouched sessions keep their
+        slots and their position in the schedule.
+        
+        Args:
+            schedule: Existing schedule
+            changed_student_id: Student whose availability changed
+            new_availability: The student's new availability dict
+            student_availabilities: Availability of every student in the schedule
+                (the changed student's entry is replaced, the dict is not modified)
+            compatibility_pairs: Optional (student1_id, student2_id, score) tuples used
+                to order re-placement and to add newly feasible sessions
+            neighborhood_size: Maximum number of other sessions that may be moved
+            overlap_cache: Pair overlap cache to reuse; the changed student's entries
+                are invalidated
+            constraint_state: State already reflecting schedule, updated in place
+                (built from the schedule if omitted)
+            
+        Returns:
+            Tuple of (repaired_schedule, repair_report)
+        """
+        if overlap_cache is None:
+            overlap_cache = PairOverlapCache()
+        overlap_cache.invalidate_student(changed_student_id)
+        
+        if constraint_state is None:
+            constraint_state = ConstraintState(self.constraints, schedule)
+        
+        availabilities = dict(student_availabilities)
+        availabilities[changed_student_id] = new_availability
+        new_slots = self.get_available_slots(new_availability)
+        
+        pair_scores = {}
+        for student1_id, student2_id, score in compatibility_pairs or []:
+            pair_scores[frozenset((student1_id, student2_id))] = score
+        
+        # Sessions indexed by student, so lookups stay local to the change
+        repaired = list(schedule)
+        sessions_by_student: Dict[int, Set[int]] = {}
+        for index, session in enumerate(repaired):
+            sessions_by_student.setdefault(session.partner1_id, set()).add(index)
+            sessions_by_student.setdefault(session.partner2_id, set()).add(index)
+        
+        displaced = [(index, repaired[index]) for index in sessions_by_student.get(changed_student_id, set())
+                     if repaired[index].schedule_slot not in new_slots]
+        for index, session in displaced:
+            constraint_state.remove(session)
+            repaired[index] = None
+        displaced.sort(key=lambda item: (-pair_scores.get(
+            frozenset((item[1].partner1_id, item[1].partner2_id)), 0.0), item[0]))
+        
+        report = {
+            "changed_student_id": changed_student_id,
+            "sessions_unassigned": len(displaced),
+            "sessions_replaced": 0,
+            "sessions_moved": 0,
+            "sessions_dropped": [],
+            "sessions_added": 0
+        }
+        moves_left = neighborhood_size
+        
+        for index, session in displaced:
+            placed, moves_used = self._place_with_neighborhood(
+                session.partner1_id, session.partner2_id, availabilities, overlap_cache,
+                constraint_state, repaired, sessions_by_student, moves_left, session.duration_hours
+            )
+            moves_left -= moves_used
+            report["sessions_moved"] += moves_used
+            
+            if placed is None:
+                report["sessions_dropped"].append({
+                    "partner1_id": session.partner1_id,
+                    "partner2_id": session.partner2_id,
+                    "day": session.schedule_slot.day,
+                    "time": session.schedule_slot.time
+                })
+            else:
+                repaired[index] = placed
+                constraint_state.add(placed)
+                report["sessions_replaced"] += 1
+        
+        # Pairs of the changed student that had no session may now be schedulable
+        scheduled_pairs = set()
+        for index in sessions_by_student.get(changed_student_id, set()):
+            if repaired[index] is not None:
+                scheduled_pairs.add(frozenset((repaired[index].partner1_id, repaired[index].partner2_id)))
+        
+        for student1_id, student2_id, score in sorted(compatibility_pairs or [], key=lambda x: x[2], reverse=True):
+            pair = frozenset((student1_id, student2_id))
+            if changed_student_id not in pair or pair in scheduled_pairs:
+                continue
+            if student1_id not in availabilities or student2_id not in availabilities:
+                continue
+            placed, _ = self._place_with_neighborhood(
+                student1_id, student2_id, availabilities, overlap_cache,
+                constraint_state, repaired, sessions_by_student, 0
+            )
+            if placed is not None:
+                constraint_state.add(placed)
+                repaired.append(placed)
+                sessions_by_student.setdefault(student1_id, set()).add(len(repaired) - 1)
+                sessions_by_student.setdefault(student2_id, set()).add(len(repaired) - 1)
+                scheduled_pairs.add(pair)
+                report["sessions_added"] += 1
+        
+        return [session for session in repaired if session is not None], report
+    
+    def _place_with_neighborhood(self,
+                                 student1_id: int,
+                                 student2_id: int,
+                                 availabilities: Dict[int, Dict[str, List[str]]],
+                                 overlap_cache: PairOverlapCache,
+                                 constraint_state: ConstraintState,
+                                 sessions: List[Optional[StudySession]],
+                                 sessions_by_student: Dict[int, Set[int]],
+                                 max_moves: int,
+                                 duration_hours: float = 2.0) -> Tuple[Optional[StudySession], int]:
+        """
+        Find a slot for a pair, moving at most max_moves neighbouring sessions
+        
+        Returns:
+            Tuple of (new_session or None, number_of_sessions_moved)
+        """
+        common_slots = sorted(self.get_common_slots(student1_id, student2_id, availabilities, overlap_cache),
+                              key=self._slot_preference_key)
+        
+        for slot in common_slots:
+            candidate = StudySession(partner1_id=student1_id, partner2_id=student2_id,
+                                     schedule_slot=slot, duration_hours=duration_hours)
+            if constraint_state.can_schedule(candidate):
+                return candidate, 0
+        
+        if max_moves <= 0:
+            return None, 0
+        
+        # Only the daily limit can be relieved by moving a session to another day
+        for slot in common_slots:
+            candidate = StudySession(partner1_id=student1_id, partner2_id=student2_id,
+                                     schedule_slot=slot, duration_hours=duration_hours)
+            if constraint_state.check(candidate) != "daily":
+                continue
+            
+            moves = []
+            for student_id in (student1_id, student2_id):
+                if constraint_state.daily_counts.get((student_id, slot.day), 0) < self.constraints.max_sessions_per_day:
+                    continue
+                blockers = [index for index in sessions_by_student.get(student_id, set())
+                            if sessions[index] is not None and sessions[index].schedule_slot.day == slot.day]
+                moved = self._move_one(blockers, slot.day, availabilities, overlap_cache,
+                                       constraint_state, sessions)
+                if moved is None:
+                    break
+                moves.append(moved)
+            
+            if constraint_state.can_schedule(candidate) and len(moves) <= max_moves:
+                return candidate, len(moves)
+            
+            # Undo the moves made for this slot
+            for index, original in reversed(moves):
+                constraint_state.remove(sessions[index])
+                sessions[index] = original
+                constraint_state.add(original)
+        
+        return None, 0
+    
+    def _move_one(self,
+                  blockers: List[int],
+                  blocked_day: str,
+                  availabilities: Dict[int, Dict[str, List[str]]],
+                  overlap_cache: PairOverlapCache,
+                  constraint_state: ConstraintState,
+                  sessions: List[Optional[StudySession]]) -> Optional[Tuple[int, StudySession]]:
+        """Move one blocking session off blocked_day; returns (index, original) or None"""
+        for index in blockers:
+            original = sessions[index]
+            constraint_state.remove(original)
+            alternatives = sorted(
+                (slot for slot in self.get_common_slots(original.partner1_id, original.partner2_id,
+                                                        availabilities, overlap_cache)
+                 if slot.day != blocked_day),
+                key=self._slot_preference_key
+            )
+            for slot in alternatives:
+                moved = StudySession(partner1_id=original.partner1_id, partner2_id=original.partner2_id,
+                                     schedule_slot=slot, duration_hours=original.duration_hours)
+                if constraint_state.can_schedule(moved):
+                    sessions[index] = moved
+                    constraint_state.add(moved)
+                    return index, original
+            constraint_state.add(original)
+        return None
@@ -0,0 +1,78 @@
+"""
+Diversity-aware re-ranking of top matches
+Maximal marginal relevance over a larger pool of ranked candidates, comparing candidates
+on their encoded personality, study style, environment, focus areas and availability
+"""
+from typing import List, Tuple
+from smart_buddy.matching.encoded_population import EncodedPopulation
+
+
+# Candidates ranked by relevance before re-ranking, unless the caller asks for another pool
+DIVERSITY_POOL_SIZE = 100
+
+
+def _jaccard(shared: int, either: int) -> float:
+    """Overlap of two sets; two empty sets count as identical"""
+    return shared / either if either else 1.0
+
+
+def profile_similarity(a: Tuple, b: Tuple) -> float:
+    """
+    Similarity of two candidates, from 0 (nothing in common) to 1 (identical)
+
+    Args:
+        a, b: (personality code, style code, environment code, focus area set, slot mask)
+    """
+    same = (a[0] == b[0]) + (a[1] == b[1]) + (a[2] == b[2])
+    areas = _jaccard(len(a[3] & b[3]), len(a[3] | b[3]))
+    slots = _jaccard((a[4] & b[4]).bit_count(), (a[4] | b[4]).bit_count())
+    return (same + areas + slots) / 5.0
+
+
+def rerank_diverse(population: EncodedPopulation, ranked: List[Tuple[int, float]], max_results: int,
+                   diversity: float) -> List[Tuple[int, float]]:
+    """
+    Pick max_results of the ranked (student_id, score) pairs by maximal marginal relevance
+
+    Each step takes the candidate with the best (1 - diversity) * score / 100 minus
+    diversity * its highest similarity to any candidate already picked. Highest
+    similarities are kept per candidate and only compared with the latest pick, so
+    re-ranking N candidates to k costs N * k similarity checks.
+
+    Args:
+        population: Population the candidates were ranked in
+        ranked: Candidates, best first
+        max_results: Pairs to return
+        diversity: 0 keeps the ranking as it is; 1 only avoids repeating similar partners
+
+    Returns:
+        The picked pairs, in the order they were picked
+    """
+    if diversity <= 0 or len(ranked) <= 1:
+        return ranked[:max_results]
+
+    index_by_id = population.index_by_id
+    features = []
+    for student_id, _ in ranked:
+        index = index_by_id[student_id]
+        features.append((population.personality_codes[index], population.style_codes[index],
+                         population.environment_codes[index], population.area_sets[index],
+                         population.slot_masks[index]))
+    relevance = [(1.0 - diversity) * score / 100.0 for _, score in ranked]
+    max_similarity = [0.0] * len(ranked)
+    remaining = list(range(len(ranked)))
+    picked = []
+
+    while remaining and len(picked) < max_results:
+        # max keeps the first of equal candidates, i.e. the more relevant one
+        best_position = max(range(len(remaining)),
+                            key=lambda position: relevance[remaining[position]] -
+                            diversity * max_similarity[remaining[position]])
+        best = remaining.pop(best_position)
+        picked.append(best)
+        best_features = features[best]
+        for candidate in remaining:
+            similarity = profile_similarity(features[candidate], best_features)
+            if similarity > max_similarity[candidate]:
+                max_similarity[candidate] = similarity
+    return [ranked[candidate] for candidate in picked]
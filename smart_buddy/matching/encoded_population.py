@@ -0,0 +1,327 @@
+"""
+Compact encoded representation of the student population for matching
+Categorical fields become small integer codes, availability becomes a slot bitmask and focus
+areas become interned code sets, so whole-population scoring avoids per-profile objects
+"""
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+from array import array
+from operator import itemgetter
+import heapq
+from smart_buddy.matching.compatibility_engine import CompatibilityEngine, StudentProfile
+
+
+def _normalize(value) -> str:
+    """Uppercase a categorical value the way the compatibility engine compares it"""
+    return value.upper() if hasattr(value, 'upper') else str(value).upper()
+
+
+class Vocabulary:
+    """Grow-only mapping from values to dense integer codes"""
+
+    def __init__(self):
+        self.codes: Dict[Hashable, int] = {}
+        self.values: List[Hashable] = []
+
+    def encode(self, value: Hashable) -> int:
+        """Code for a value, assigning the next code to unseen values"""
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class EncodedPopulation:
+    """
+    Column-oriented store of encoded student profiles
+
+    Scores computed from the encoding are identical to CompatibilityEngine scores,
+    so the encoded path can rank the population and only the top matches need to
+    be rebuilt as full StudentProfile objects.
+    """
+
+    def __init__(self):
+        self.ids = array('q')
+        self.usernames: List[str] = []
+        self.versions: List[object] = []
+        self.personality_codes = array('i')
+        self.style_codes = array('i')
+        self.environment_codes = array('i')
+        self.slot_masks: List[int] = []
+        self.slot_counts = array('i')
+        self.area_sets: List[frozenset] = []
+        self.index_by_id: Dict[int, int] = {}
+
+        self.personality_vocab = Vocabulary()
+        self.style_vocab = Vocabulary()
+        self.environment_vocab = Vocabulary()
+        self.slot_vocab = Vocabulary()
+        self.area_vocab = Vocabulary()
+        # Identical area sets share one frozenset object
+        self._interned_areas: Dict[frozenset, frozenset] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable) -> "EncodedPopulation":
+        """
+        Build a population from profile rows
+
+        Rows only need the attributes StudentProfile.from_db_profile reads, so Core
+        result rows streamed with yield_per work without building ORM objects.
+        """
+        population = cls()
+        for row in rows:
+            population.add(StudentProfile.from_db_profile(row))
+        return population
+
+    def encode_areas(self, academic_focus_areas) -> frozenset:
+        """Interned code set for focus areas, normalized like the engine"""
+        codes = frozenset(
+            self.area_vocab.encode(str(area).upper().strip())
+            for area in (academic_focus_areas or [])
+            if area and str(area).strip()
+        )
+        return self._interned_areas.setdefault(codes, codes)
+
+    def encode_availability(self, availability) -> Tuple[int, int]:
+        """(slot bitmask, slot count) where the count includes duplicates like the engine"""
+        mask = 0
+        count = 0
+        if isinstance(availability, dict):
+            for day, time_slots in availability.items():
+                count += len(time_slots)
+                for slot in set(time_slots):
+                    mask |= 1 << self.slot_vocab.encode((day, slot))
+        return mask, count
+
+    def add(self, profile: StudentProfile) -> int:
+        """Encode and append a profile, replacing any existing entry with the same id"""
+        if profile.id in self.index_by_id:
+            return self.update(profile)
+
+        mask, count = self.encode_availability(profile.availability)
+        index = len(self.ids)
+        self.ids.append(profile.id)
+        self.usernames.append(profile.username)
+        self.versions.append(profile.version)
+        self.personality_codes.append(self.personality_vocab.encode(_normalize(profile.personality_type)))
+        self.style_codes.append(self.style_vocab.encode(_normalize(profile.study_style)))
+        self.environment_codes.append(self.environment_vocab.encode(_normalize(profile.preferred_environment)))
+        self.slot_masks.append(mask)
+        self.slot_counts.append(count)
+        self.area_sets.append(self.encode_areas(profile.academic_focus_areas))
+        self.index_by_id[profile.id] = index
+        return index
+
+    def update(self, profile: StudentProfile) -> int:
+        """Re-encode an existing profile in place"""
+        index = self.index_by_id[profile.id]
+        mask, count = self.encode_availability(profile.availability)
+        self.usernames[index] = profile.username
+        self.versions[index] = profile.version
+        self.personality_codes[index] = self.personality_vocab.encode(_normalize(profile.personality_type))
+        self.style_codes[index] = self.style_vocab.encode(_normalize(profile.study_style))
+        self.environment_codes[index] = self.environment_vocab.encode(_normalize(profile.preferred_environment))
+        self.slot_masks[index] = mask
+        self.slot_counts[index] = count
+        self.area_sets[index] = self.encode_areas(profile.academic_focus_areas)
+        return index
+
+    def remove(self, student_id: int) -> bool:
+        """
+        Remove a profile, keeping the remaining students in their original order
+
+        Order matters because ties are ranked by population order, as in the engine.
+        Removal is O(n), which is fine for occasional deletes.
+        """
+        index = self.index_by_id.pop(student_id, None)
+        if index is None:
+            return False
+
+        for column in self._columns():
+            del column[index]
+        for position in range(index, len(self.ids)):
+            self.index_by_id[self.ids[position]] = position
+        return True
+
+    def _columns(self) -> Tuple:
+        """Every per-student column, in a fixed order"""
+        return (self.ids, self.usernames, self.versions, self.personality_codes, self.style_codes,
+                self.environment_codes, self.slot_masks, self.slot_counts, self.area_sets)
+
+    def indexes_of(self, student_ids: Iterable[int]) -> List[int]:
+        """Population indexes of the given students, in population order; unknown ids are skipped"""
+        index_by_id = self.index_by_id
+        return sorted(index for index in (index_by_id.get(student_id) for student_id in student_ids)
+                      if index is not None)
+
+    def copy(self) -> "EncodedPopulation":
+        """Private copy of the population that later changes to this one leave alone"""
+        population = EncodedPopulation()
+        for name in ("personality_vocab", "style_vocab", "environment_vocab", "slot_vocab", "area_vocab"):
+            vocab = getattr(self, name)
+            copy = getattr(population, name)
+            copy.values = list(vocab.values)
+            copy.codes = dict(vocab.codes)
+        population._interned_areas = dict(self._interned_areas)
+        for name in ("ids", "personality_codes", "style_codes", "environment_codes", "slot_counts"):
+            setattr(population, name, array(getattr(self, name).typecode, getattr(self, name)))
+        population.slot_masks = list(self.slot_masks)
+        population.area_sets = list(self.area_sets)
+        population.versions = list(self.versions)
+        population.usernames = list(self.usernames)
+        population.index_by_id = dict(self.index_by_id)
+        return population
+
+    def iter_scores(self, engine: CompatibilityEngine, student: StudentProfile,
+                    indexes: Optional[Iterable[int]] = None) -> Iterator[Tuple[int, float]]:
+        """
+        Yield (index, total_score) for every other student, in population order
+
+        Args:
+            engine: Engine whose weights and scoring rules are applied
+            student: The student looking for matches (need not be in the population)
+            indexes: Only score these students, given in population order (everyone if omitted)
+        """
+        personality_row = self._score_row(self.personality_vocab, student.personality_type,
+                                          engine._compute_personality_type_score)
+        style_row = self._score_row(self.style_vocab, student.study_style,
+                                    engine._compute_study_style_score)
+        environment_row = self._score_row(self.environment_vocab, student.preferred_environment,
+                                          engine._compute_environment_score)
+        # Look codes up without growing the vocabularies; unseen values match nobody
+        query_area_names = {str(area).upper().strip() for area in (student.academic_focus_areas or [])
+                            if area and str(area).strip()}
+        query_areas = frozenset(self.area_vocab.codes[name] for name in query_area_names
+                                if name in self.area_vocab.codes)
+        query_mask, query_count = 0, 0
+        if isinstance(student.availability, dict):
+            for day, time_slots in student.availability.items():
+                query_count += len(time_slots)
+                for slot in set(time_slots):
+                    code = self.slot_vocab.codes.get((day, slot))
+                    if code is not None:
+                        query_mask |= 1 << code
+        return self._iter_scores(engine, student.id, (personality_row, style_row, environment_row),
+                                 query_areas, len(query_area_names), query_mask, query_count, indexes)
+
+    def iter_member_scores(self, engine: CompatibilityEngine, student_id: int,
+                           indexes: Optional[Iterable[int]] = None) -> Iterator[Tuple[int, float]]:
+        """
+        iter_scores for a student of the population, read from its encoded columns
+
+        The scores equal those of the student's full profile, so members can be ranked
+        without going back to the database.
+        """
+        index = self.index_by_id[student_id]
+        rows = tuple(
+            self._score_row(vocab, vocab.values[codes[index]], score_fn)
+            for vocab, codes, score_fn in (
+                (self.personality_vocab, self.personality_codes, engine._compute_personality_type_score),
+                (self.style_vocab, self.style_codes, engine._compute_study_style_score),
+                (self.environment_vocab, self.environment_codes, engine._compute_environment_score)
+            )
+        )
+        areas = self.area_sets[index]
+        return self._iter_scores(engine, student_id, rows, areas, len(areas), self.slot_masks[index],
+                                 self.slot_counts[index], indexes)
+
+    def _iter_scores(self, engine: CompatibilityEngine, student_id: int, rows: Tuple, query_areas: frozenset,
+                     query_area_count: int, query_mask: int, query_count: int,
+                     indexes: Optional[Iterable[int]]) -> Iterator[Tuple[int, float]]:
+        """Scores of one encoded query: its component score rows, area codes and slot mask"""
+        personality_row, style_row, environment_row = rows
+        personality_weight = engine.personality_weight
+        study_preferences_weight = engine.study_preferences_weight
+        academic_goals_weight = engine.academic_goals_weight
+        availability_weight = engine.availability_weight
+
+        ids = self.ids
+        personality_codes, style_codes, environment_codes = \
+            self.personality_codes, self.style_codes, self.environment_codes
+        slot_masks, area_sets = self.slot_masks, self.area_sets
+
+        for index in (range(len(ids)) if indexes is None else indexes):
+            if ids[index] == student_id:
+                continue
+
+            areas = area_sets[index]
+            if not query_area_count or not areas:
+                academic_score = 50.0
+            else:
+                shared_areas = len(query_areas & areas)
+                academic_score = 30.0 + 70.0 * (shared_areas / (query_area_count + len(areas) - shared_areas))
+
+            shared_slots = (query_mask & slot_masks[index]).bit_count() if query_count else 0
+            if shared_slots == 0:
+                availability_score = 0.0
+            else:
+                availability_score = min(100.0, (shared_slots / query_count) * 100 + min(20.0, shared_slots * 3))
+
+            study_preferences_score = (style_row[style_codes[index]] + environment_row[environment_codes[index]]) / 2.0
+
+            yield index, (
+                personality_row[personality_codes[index]] * personality_weight +
+                study_preferences_score * study_preferences_weight +
+                academic_score * academic_goals_weight +
+                availability_score * availability_weight
+            )
+
+    def top_matches(self, engine: CompatibilityEngine, student: StudentProfile,
+                    min_score: float = 50.0, max_results: int = 10,
+                    indexes: Optional[Iterable[int]] = None) -> List[Tuple[int, float]]:
+        """
+        Best (student_id, total_score) pairs, ordered exactly like CompatibilityEngine.find_matches
+
+        Only max_results candidates are held at a time instead of the full scored list.
+        Restricted to indexes (in population order), the order is that of the full
+        ranking with every other student left out.
+        """
+        return self._top(self.iter_scores(engine, student, indexes), min_score, max_results)
+
+    def member_top_matches(self, engine: CompatibilityEngine, student_id: int, min_score: float = 50.0,
+                           max_results: int = 10, indexes: Optional[Iterable[int]] = None) -> List[Tuple[int, float]]:
+        """top_matches for a student of the population, ranked from its encoded columns"""
+        return self._top(self.iter_member_scores(engine, student_id, indexes), min_score, max_results)
+
+    def _top(self, scores: Iterator[Tuple[int, float]], min_score: float,
+             max_results: int) -> List[Tuple[int, float]]:
+        ranked = heapq.nlargest(max_results, ((index, score) for index, score in scores if score >= min_score),
+                                key=itemgetter(1))
+        return [(self.ids[index], score) for index, score in ranked]
+
+    def matches_after(self, engine: CompatibilityEngine, student: StudentProfile, min_score: float = 50.0,
+                      max_results: int = 10, after: Optional[Tuple[float, int]] = None) -> List[Tuple[int, float]]:
+        """
+        Next (student_id, total_score) pairs in a stable order: score descending, then id
+
+        Unlike top_matches, ties are broken by id rather than population order, so the
+        order survives refreshes and pages can resume where the last one ended. Each
+        page is one scoring pass holding max_results candidates, however deep it is.
+
+        Args:
+            engine: Engine whose weights and scoring rules are applied
+            student: The student looking for matches
+            min_score: Minimum total score
+            max_results: Pairs to return
+            after: (score, student_id) of the last pair already returned, if any
+        """
+        ids = self.ids
+        candidates = ((-score, ids[index]) for index, score in self.iter_scores(engine, student)
+                      if score >= min_score)
+        if after is not None:
+            last = (-after[0], after[1])
+            candidates = (candidate for candidate in candidates if candidate > last)
+        return [(student_id, -negated_score)
+                for negated_score, student_id in heapq.nsmallest(max_results, candidates)]
+
+    @staticmethod
+    def _score_row(vocab: Vocabulary, value, score_fn) -> List[float]:
+        """Component scores of value against every code in a vocabulary"""
+        return [score_fn(value, other) for other in vocab.values]
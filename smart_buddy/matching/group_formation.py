@@ -0,0 +1,261 @@
+"""
+Study group formation for large cohorts
+Partitions a cohort into groups of a target size using greedy agglomeration over
+bounded candidate pools, so the full N x N compatibility matrix is never built
+"""
+from typing import Dict, List, Tuple, Set, Optional, Iterable
+from dataclasses import dataclass, field
+from smart_buddy.matching.compatibility_engine import CompatibilityEngine, StudentProfile
+
+
+@dataclass
+class StudyGroup:
+    """A group of students formed for studying together"""
+    member_ids: List[int]
+    member_usernames: List[str]
+    average_compatibility: float
+    common_time_slots: List[Tuple[str, str]] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        """Convert to dictionary for API responses"""
+        return {
+            'member_ids': self.member_ids,
+            'member_usernames': self.member_usernames,
+            'group_size': len(self.member_ids),
+            'average_compatibility': round(self.average_compatibility, 2),
+            'common_time_slots': self.common_time_slots
+        }
+
+
+class GroupFormationEngine:
+    """Greedy agglomerative group formation over the compatibility structure"""
+
+    def __init__(self,
+                 compatibility_engine: Optional[CompatibilityEngine] = None,
+                 group_size: int = 4,
+                 candidate_pool_size: int = 24,
+                 common_availability_weight: float = 0.3):
+        """
+        Initialize the group formation engine
+
+        Args:
+            compatibility_engine: Engine used for pairwise compatibility scores
+            group_size: Target number of students per group. One group may get one
+                extra member when a single student would otherwise be left over.
+            candidate_pool_size: Maximum candidates considered when growing a group.
+                Bounds the pairwise scores kept in memory to group_size * pool size.
+            common_availability_weight: Share of a candidate's fit (0-1) that comes from
+                preserving the group's common availability rather than pairwise scores
+        """
+        if group_size < 2:
+            raise ValueError("group_size must be at least 2")
+
+        self.compatibility_engine = compatibility_engine or CompatibilityEngine()
+        self.group_size = group_size
+        self.candidate_pool_size = max(1, candidate_pool_size)
+        self.common_availability_weight = min(1.0, max(0.0, common_availability_weight))
+
+    @staticmethod
+    def _slots_of(student: StudentProfile) -> Set[Tuple[str, str]]:
+        """Set of (day, time_slot) pairs a student is available for"""
+        availability = student.availability if isinstance(student.availability, dict) else {}
+        return {(day, slot) for day, time_slots in availability.items() for slot in time_slots}
+
+    @staticmethod
+    def _areas_of(student: StudentProfile) -> Set[str]:
+        """Normalized academic focus areas, matching the engine's normalization"""
+        return {str(area).upper().strip() for area in (student.academic_focus_areas or [])
+                if area and str(area).strip()}
+
+    def form_groups(self, students: List[StudentProfile]) -> List[StudyGroup]:
+        """
+        Partition students into study groups of the target size
+
+        Seeds are taken hardest-first (fewest available slots). Each group grows by
+        adding the pooled candidate with the best blend of average compatibility with
+        the current members and preserved common availability. Candidates are drawn
+        from inverted indexes on time slots and focus areas, so memory stays linear
+        in the cohort size.
+
+        Args:
+            students: Cohort to partition
+
+        Returns:
+            List of StudyGroup objects covering every student exactly once. When the
+            cohort leaves one student over, that student joins the best-fitting group,
+            so exactly one group has group_size + 1 members; any other remainder forms
+            one smaller group.
+        """
+        if not students:
+            return []
+
+        slots = [self._slots_of(student) for student in students]
+        areas = [self._areas_of(student) for student in students]
+
+        # Inverted indexes: key -> student indices (linear memory)
+        slot_index: Dict[Tuple[str, str], List[int]] = {}
+        area_index: Dict[str, List[int]] = {}
+        for idx in range(len(students)):
+            for slot in slots[idx]:
+                slot_index.setdefault(slot, []).append(idx)
+            for area in areas[idx]:
+                area_index.setdefault(area, []).append(idx)
+
+        # Per-list cursors skip entries that were already assigned
+        cursors: Dict[object, int] = {}
+        assigned = [False] * len(students)
+        remaining = len(students)
+        fallback_cursor = 0
+
+        seed_order = sorted(range(len(students)), key=lambda i: (len(slots[i]), students[i].id))
+        groups: List[List[int]] = []
+        group_slots_list: List[Set[Tuple[str, str]]] = []
+
+        for seed in seed_order:
+            if assigned[seed]:
+                continue
+
+            assigned[seed] = True
+            remaining -= 1
+            members = [seed]
+            group_slots = set(slots[seed])
+
+            # candidate index -> sum of compatibility with current members
+            pool: Dict[int, float] = {}
+
+            while len(members) < self.group_size and remaining > 0:
+                keys: List[Tuple[str, object]] = [('slot', slot) for slot in sorted(group_slots)]
+                keys.extend(('area', area) for area in sorted(areas[seed]))
+                for candidate in self._draw_candidates(keys, slot_index, area_index, cursors,
+                                                       assigned, pool):
+                    pool[candidate] = sum(self._pair_score(students[m], students[candidate])
+                                          for m in members)
+
+                if not pool:
+                    # No indexed candidates left; fall back to the next unassigned students
+                    while fallback_cursor < len(students) and len(pool) < self.candidate_pool_size:
+                        if not assigned[fallback_cursor]:
+                            pool[fallback_cursor] = sum(
+                                self._pair_score(students[m], students[fallback_cursor])
+                                for m in members)
+                        fallback_cursor += 1
+                    if not pool:
+                        fallback_cursor = 0
+                        continue
+
+                best = max(pool, key=lambda c: (self._candidate_fit(pool[c], len(members),
+                                                                    group_slots, slots[c]),
+                                                -students[c].id))
+                del pool[best]
+                assigned[best] = True
+                remaining -= 1
+
+                # Fold the new member into every pooled candidate's running sum
+                for candidate in list(pool):
+                    if assigned[candidate]:
+                        del pool[candidate]
+                    else:
+                        pool[candidate] += self._pair_score(students[best], students[candidate])
+
+                members.append(best)
+                group_slots &= slots[best]
+
+            groups.append(members)
+            group_slots_list.append(group_slots)
+
+        self._merge_singletons(groups, group_slots_list, students, slots)
+
+        return [self._build_group(members, group_slots, students)
+                for members, group_slots in zip(groups, group_slots_list)]
+
+    def _draw_candidates(self,
+                         keys: List[Tuple[str, object]],
+                         slot_index: Dict[Tuple[str, str], List[int]],
+                         area_index: Dict[str, List[int]],
+                         cursors: Dict[object, int],
+                         assigned: List[bool],
+                         pool: Dict[int, float]) -> Iterable[int]:
+        """Yield new unassigned candidates from the indexes until the pool is full"""
+        needed = self.candidate_pool_size - len(pool)
+        if needed <= 0:
+            return
+        seen: Set[int] = set()
+        for key in keys:
+            postings = slot_index.get(key[1], []) if key[0] == 'slot' else area_index.get(key[1], [])
+            position = cursors.get(key, 0)
+            while position < len(postings) and assigned[postings[position]]:
+                position += 1
+            cursors[key] = position
+
+            for candidate in postings[position:]:
+                if needed <= 0:
+                    return
+                if assigned[candidate] or candidate in pool or candidate in seen:
+                    continue
+                seen.add(candidate)
+                needed -= 1
+                yield candidate
+
+    def _pair_score(self, student1: StudentProfile, student2: StudentProfile) -> float:
+        """Symmetric compatibility between two students (engine scores are directional)"""
+        engine = self.compatibility_engine
+        forward = engine.compute_compatibility_score(student1, student2)
+
+        # Only the availability component depends on direction, so reuse the rest
+        backward_availability, _ = engine.compute_availability_compatibility(student2, student1)
+        backward_total = forward.total_score + engine.availability_weight * (
+            backward_availability - forward.availability_score)
+        return (forward.total_score + backward_total) / 2.0
+
+    def _candidate_fit(self, score_sum: float, member_count: int,
+                       group_slots: Set[Tuple[str, str]],
+                       candidate_slots: Set[Tuple[str, str]]) -> float:
+        """Blend average compatibility with the share of common availability kept"""
+        average_score = score_sum / member_count
+        if group_slots:
+            kept = len(group_slots & candidate_slots) / len(group_slots) * 100.0
+        else:
+            kept = 0.0
+        return (1.0 - self.common_availability_weight) * average_score + \
+            self.common_availability_weight * kept
+
+    def _merge_singletons(self, groups: List[List[int]],
+                          group_slots_list: List[Set[Tuple[str, str]]],
+                          students: List[StudentProfile],
+                          slots: List[Set[Tuple[str, str]]]) -> None:
+        """
+        Fold a trailing single-student group into the group where it fits best
+
+        Every earlier group is already full, so the chosen group ends up one over
+        the target size; a group of one is not a study group, a group of
+        group_size + 1 still is.
+        """
+        if len(groups) < 2 or len(groups[-1]) > 1:
+            return
+
+        loner = groups.pop()[0]
+        group_slots_list.pop()
+
+        # Every group is scored against the loner: O(groups * group_size) pair scores
+        best_index = max(
+            range(len(groups)),
+            key=lambda g: self._candidate_fit(
+                sum(self._pair_score(students[m], students[loner]) for m in groups[g]),
+                len(groups[g]), group_slots_list[g], slots[loner])
+        )
+        groups[best_index].append(loner)
+        group_slots_list[best_index] &= slots[loner]
+
+    def _build_group(self, members: List[int], group_slots: Set[Tuple[str, str]],
+                     students: List[StudentProfile]) -> StudyGroup:
+        """Create the StudyGroup summary for a finished group"""
+        pair_scores = [self._pair_score(students[a], students[b])
+                       for i, a in enumerate(members) for b in members[i + 1:]]
+        average = sum(pair_scores) / len(pair_scores) if pair_scores else 0.0
+
+        return StudyGroup(
+            member_ids=[students[m].id for m in members],
+            member_usernames=[students[m].username for m in members],
+            average_compatibility=average,
+            common_time_slots=sorted(group_slots)
+        )
@@ -0,0 +1,261 @@
+"""
+Continuous-time scheduler for study sessions
+Intersects real availability intervals with a sweep line and places sessions of the
+preferred length while enforcing breaks and the CSP solver's session limits
+"""
+from typing import Dict, List, Tuple, Optional, Iterable
+from datetime import date, time
+import bisect
+from smart_buddy.matching.csp_solver import ScheduleSlot, StudySession, SchedulingConstraints, DayOfWeek
+
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# Interval in minutes from the start of the week (Monday 00:00), half-open [start, end)
+Interval = Tuple[int, int]
+
+DAY_NAMES = [day.value for day in DayOfWeek]
+
+
+def _minutes(value: time) -> int:
+    """Minutes since midnight for a time value"""
+    return value.hour * 60 + value.minute
+
+
+def format_minute_of_week(minute: int) -> Tuple[str, str]:
+    """Convert a minute-of-week offset into (day name, HH:MM)"""
+    day_index, minute_of_day = divmod(minute, MINUTES_PER_DAY)
+    return DAY_NAMES[day_index % 7], f"{minute_of_day // 60:02d}:{minute_of_day % 60:02d}"
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """Sort intervals and merge the overlapping or touching ones"""
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def intersect_intervals(interval_lists: List[List[Interval]]) -> List[Interval]:
+    """
+    Find the time covered by every interval list
+
+    Each list must already be merged (sorted and non-overlapping). A sweep line over
+    all endpoints tracks how many students are available; spans where everyone is
+    available are emitted. Runs in O(M log M) for M total intervals.
+
+    Args:
+        interval_lists: One merged interval list per student
+
+    Returns:
+        Merged list of intervals where all students are available
+    """
+    if not interval_lists or any(not intervals for intervals in interval_lists):
+        return []
+
+    if len(interval_lists) == 1:
+        return list(interval_lists[0])
+
+    events: List[Tuple[int, int]] = []
+    for intervals in interval_lists:
+        for start, end in intervals:
+            events.append((start, 1))
+            events.append((end, -1))
+    # Ends sort before starts at the same instant, so touching intervals don't count
+    events.sort()
+
+    required = len(interval_lists)
+    common: List[Interval] = []
+    active = 0
+    open_at = None
+    for point, delta in events:
+        active += delta
+        if active == required and open_at is None:
+            open_at = point
+        elif active < required and open_at is not None:
+            if point > open_at:
+                common.append((open_at, point))
+            open_at = None
+    return common
+
+
+def availability_rows_to_intervals(rows: Iterable, week_start: Optional[date] = None) -> List[Interval]:
+    """
+    Convert Availability rows into merged minute-of-week intervals
+
+    Recurring rows use day_of_week (0=Monday). One-time rows are included only when
+    their date falls inside the week starting at week_start.
+
+    Args:
+        rows: Objects with day_of_week, date, start_time, end_time and is_active
+        week_start: Monday of the week being scheduled (one-time rows ignored if omitted)
+
+    Returns:
+        Merged list of intervals for the student
+    """
+    intervals: List[Interval] = []
+    for row in rows:
+        if getattr(row, 'is_active', True) is False:
+            continue
+
+        day_index = None
+        if row.date is not None:
+            if week_start is not None:
+                offset = (row.date - week_start).days
+                if 0 <= offset < 7:
+                    day_index = offset
+        elif row.day_of_week is not None:
+            day_index = row.day_of_week
+
+        if day_index is None:
+            continue
+
+        day_offset = day_index * MINUTES_PER_DAY
+        intervals.append((day_offset + _minutes(row.start_time), day_offset + _minutes(row.end_time)))
+
+    return merge_intervals(intervals)
+
+
+class IntervalScheduler:
+    """Schedules study sessions over continuous availability intervals"""
+
+    def __init__(self, constraints: Optional[SchedulingConstraints] = None):
+        self.constraints = constraints or SchedulingConstraints()
+
+    @property
+    def session_minutes(self) -> int:
+        return int(round(self.constraints.preferred_session_length * 60))
+
+    @property
+    def break_minutes(self) -> int:
+        return int(round(self.constraints.min_break_between_sessions * 60))
+
+    def solve_schedule(self,
+                       student_intervals: Dict[int, List[Interval]],
+                       compatibility_pairs: List[Tuple[int, int, float]],
+                       max_sessions_to_schedule: int = 20) -> List[StudySession]:
+        """
+        Place one session per compatible pair inside their common availability
+
+        Args:
+            student_intervals: Dict mapping student_id -> merged availability intervals
+            compatibility_pairs: List of (student1_id, student2_id, compatibility_score) tuples
+            max_sessions_to_schedule: Maximum number of sessions to schedule
+
+        Returns:
+            List of StudySession objects whose slot time is the session start (HH:MM)
+        """
+        sorted_pairs = sorted(compatibility_pairs, key=lambda x: x[2], reverse=True)
+
+        # Per-student state: sorted busy starts/ends, daily counts, weekly count, partners
+        busy_starts: Dict[int, List[int]] = {}
+        busy_ends: Dict[int, List[int]] = {}
+        daily_counts: Dict[Tuple[int, int], int] = {}
+        weekly_counts: Dict[int, int] = {}
+        partners: Dict[int, set] = {}
+
+        scheduled_sessions: List[StudySession] = []
+
+        for student1_id, student2_id, score in sorted_pairs:
+            if len(scheduled_sessions) >= max_sessions_to_schedule:
+                break
+
+            if student1_id not in student_intervals or student2_id not in student_intervals:
+                continue
+
+            if not self._within_limits(student1_id, student2_id, weekly_counts, partners):
+                continue
+
+            common = intersect_intervals([student_intervals[student1_id], student_intervals[student2_id]])
+            start = self._find_start(common, (student1_id, student2_id),
+                                     busy_starts, busy_ends, daily_counts)
+            if start is None:
+                continue
+
+            end = start + self.session_minutes
+            day_index = start // MINUTES_PER_DAY
+            for student_id, other_id in ((student1_id, student2_id), (student2_id, student1_id)):
+                position = bisect.bisect_left(busy_starts.setdefault(student_id, []), start)
+                busy_starts[student_id].insert(position, start)
+                busy_ends.setdefault(student_id, []).insert(position, end)
+                daily_counts[(student_id, day_index)] = daily_counts.get((student_id, day_index), 0) + 1
+                weekly_counts[student_id] = weekly_counts.get(student_id, 0) + 1
+                partners.setdefault(student_id, set()).add(other_id)
+
+            day_name, start_label = format_minute_of_week(start)
+            scheduled_sessions.append(StudySession(
+                partner1_id=student1_id,
+                partner2_id=student2_id,
+                schedule_slot=ScheduleSlot(day=day_name, time=start_label),
+                duration_hours=self.constraints.preferred_session_length
+            ))
+
+        return scheduled_sessions
+
+    def _within_limits(self, student1_id: int, student2_id: int,
+                       weekly_counts: Dict[int, int], partners: Dict[int, set]) -> bool:
+        """Check weekly session and partner limits for both students"""
+        for student_id, other_id in ((student1_id, student2_id), (student2_id, student1_id)):
+            if weekly_counts.get(student_id, 0) >= self.constraints.max_sessions_per_week:
+                return False
+            current_partners = partners.get(student_id, set())
+            if other_id not in current_partners and \
+                    len(current_partners) >= self.constraints.max_partners_per_student:
+                return False
+        return True
+
+    def _find_start(self, common: List[Interval], student_ids: Tuple[int, int],
+                    busy_starts: Dict[int, List[int]], busy_ends: Dict[int, List[int]],
+                    daily_counts: Dict[Tuple[int, int], int]) -> Optional[int]:
+        """Earliest session start inside the common intervals that respects breaks"""
+        length = self.session_minutes
+        gap = self.break_minutes
+
+        for interval_start, interval_end in common:
+            start = interval_start
+            while start + length <= interval_end:
+                day_index = start // MINUTES_PER_DAY
+                if any(daily_counts.get((student_id, day_index), 0) >= self.constraints.max_sessions_per_day
+                       for student_id in student_ids):
+                    # Skip to the next day
+                    start = (day_index + 1) * MINUTES_PER_DAY
+                    continue
+
+                blocked_until = None
+                for student_id in student_ids:
+                    conflict_end = self._conflict_end(busy_starts.get(student_id, []),
+                                                      busy_ends.get(student_id, []),
+                                                      start, start + length, gap)
+                    if conflict_end is not None:
+                        blocked_until = max(blocked_until or conflict_end, conflict_end)
+
+                if blocked_until is None:
+                    return start
+                start = blocked_until + gap
+
+        return None
+
+    @staticmethod
+    def _conflict_end(starts: List[int], ends: List[int],
+                      start: int, end: int, gap: int) -> Optional[int]:
+        """
+        End of the latest existing session that is too close to [start, end)
+
+        Existing sessions never overlap each other, so only the neighbours found by
+        binary search can conflict.
+        """
+        position = bisect.bisect_left(starts, start)
+        conflict_end = None
+        if position > 0 and ends[position - 1] + gap > start:
+            conflict_end = ends[position - 1]
+        if position < len(starts) and end + gap > starts[position]:
+            conflict_end = max(conflict_end or ends[position], ends[position])
+        return conflict_end
+
@@ -0,0 +1,78 @@
+"""
+Opaque cursors for paginated match results
+A cursor records where the last page ended, (score, partner_id), and the population version
+it was ranked on, so the next page resumes the same ranking instead of recomputing it
+"""
+from typing import Dict, Optional
+from dataclasses import dataclass
+import base64
+import hashlib
+import json
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a cursor is malformed or was issued for a different query"""
+
+
+class StaleCursorError(InvalidCursorError):
+    """Raised when the population changed since the cursor was issued"""
+
+
+@dataclass(frozen=True)
+class MatchCursor:
+    """Position after the last match of a page"""
+    population_version: Optional[int]
+    score: float
+    partner_id: int
+    query: str
+
+
+def query_fingerprint(student_id: int, min_score: float, weights: Dict[str, float]) -> str:
+    """Short digest of everything that decides the ranking a cursor belongs to"""
+    key = json.dumps([student_id, float(min_score), sorted(weights.items())])
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def encode_cursor(cursor: MatchCursor) -> str:
+    """URL-safe token for a cursor; scores round-trip exactly through JSON"""
+    payload = json.dumps([cursor.population_version, cursor.score, cursor.partner_id, cursor.query],
+                         separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> MatchCursor:
+    """
+    Cursor from a token produced by encode_cursor
+
+    Raises:
+        InvalidCursorError: The token is not a cursor
+    """
+    try:
+        payload = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        population_version, score, partner_id, query = json.loads(payload)
+        return MatchCursor(
+            population_version=None if population_version is None else int(population_version),
+            score=float(score),
+            partner_id=int(partner_id),
+            query=str(query)
+        )
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError("Malformed cursor") from e
+
+
+def resume_after(token: Optional[str], query: str, population_version: Optional[int]) -> Optional[MatchCursor]:
+    """
+    Validated cursor to resume from, or None for the first page
+
+    Raises:
+        InvalidCursorError: The token is malformed or belongs to another query
+        StaleCursorError: The population version moved on; the ranking must restart
+    """
+    if not token:
+        return None
+    cursor = decode_cursor(token)
+    if cursor.query != query:
+        raise InvalidCursorError("Cursor was issued for a different query")
+    if cursor.population_version != population_version:
+        raise StaleCursorError("Matches changed since this cursor was issued; start again from the first page")
+    return cursor
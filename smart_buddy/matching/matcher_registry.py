@@ -0,0 +1,149 @@
+"""
+Registry of long-lived matchers and the rankings they cache
+Matchers are kept per normalized weights and constraints, bounded and evicted LRU, so
+what a matcher caches survives from one request to the next
+"""
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+from collections import OrderedDict
+import os
+import threading
+
+
+def matcher_key(weights: Tuple[float, float, float, float], constraints: Optional[Dict[str, float]] = None,
+                cached_schedules: bool = False) -> Tuple:
+    """
+    Identity of a matcher configuration
+
+    Weights are normalized exactly as CompatibilityEngine normalizes them, so weights
+    that score identically (e.g. all 1.0 and all 0.25) share one matcher.
+
+    Args:
+        weights: (personality, study_preferences, academic_goals, availability) weights
+        constraints: Scheduling constraint values by name (defaults if omitted)
+        cached_schedules: Whether the matcher uses the shared schedule result cache
+    """
+    personality, study_preferences, academic_goals, availability = weights
+    total = personality + study_preferences + academic_goals + availability
+    normalized = tuple(weight / total for weight in weights) if total else tuple(weights)
+    return (
+        normalized,
+        tuple(sorted(constraints.items())) if constraints else None,
+        bool(cached_schedules)
+    )
+
+
+class MatcherRegistry:
+    """Thread-safe LRU of matchers keyed by matcher_key"""
+
+    def __init__(self, max_size: int = 16):
+        """
+        Args:
+            max_size: Matchers kept at once; the least recently used is dropped beyond it
+        """
+        self.max_size = max(1, max_size)
+        self._matchers: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, build: Callable[[], object]):
+        """
+        The matcher for key, built with build() the first time it is asked for
+
+        Matchers are shared by concurrent requests, so they must not keep per-request state.
+        """
+        with self._lock:
+            matcher = self._matchers.get(key)
+            if matcher is not None:
+                self._matchers.move_to_end(key)
+                self.hits += 1
+                return matcher
+            self.misses += 1
+            matcher = self._matchers[key] = build()
+            while len(self._matchers) > self.max_size:
+                self._matchers.popitem(last=False)
+                self.evictions += 1
+            return matcher
+
+    def clear(self) -> None:
+        """Drop every matcher"""
+        with self._lock:
+            self._matchers.clear()
+
+    def stats(self) -> Dict:
+        """Size, hit/miss counters and the ranking caches of the live matchers"""
+        with self._lock:
+            matchers = list(self._matchers.values())
+            stats = {
+                "matchers": len(matchers),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+        ranking_caches = [matcher.ranking_cache.stats() for matcher in matchers
+                          if getattr(matcher, "ranking_cache", None) is not None]
+        stats["ranking_cache"] = {
+            name: sum(cache[name] for cache in ranking_caches) for name in ("entries", "hits", "misses")
+        }
+        return stats
+
+    def __len__(self) -> int:
+        return len(self._matchers)
+
+
+class RankingCache:
+    """
+    Thread-safe LRU of one matcher's rankings over the current population version
+
+    Entries are only valid for the population version they were ranked on; seeing a
+    newer version drops them all.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple]" = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version: int, key: Hashable) -> Optional[Tuple[int, List[Tuple[int, float]]]]:
+        """(total potential partners, ranked pairs) cached for key, or None"""
+        with self._lock:
+            self._advance(version)
+            entry = self._entries.get(key) if version == self._version else None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            total, ranked = entry
+            return total, list(ranked)
+
+    def put(self, version: int, key: Hashable, ranking: Tuple[int, List[Tuple[int, float]]]) -> None:
+        """Cache a ranking made on population version; rankings of older versions are ignored"""
+        with self._lock:
+            self._advance(version)
+            if version != self._version:
+                return
+            total, ranked = ranking
+            self._entries[key] = (total, tuple(ranked))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _advance(self, version: int) -> None:
+        """Move to a newer population version, dropping every entry (lock must be held)"""
+        if self._version is None or version > self._version:
+            self._entries.clear()
+            self._version = version
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# Matchers shared by every request the API serves
+matcher_registry = MatcherRegistry(max_size=int(os.getenv("MATCHER_REGISTRY_SIZE", "16")))
@@ -2,11 +2,104 @@
 Study buddy matching service
 Integrates compatibility engine with CSP solver for optimal partner matching
 """
-from typing import Dict, List, Optional, Tuple
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from array import array
+from collections import deque
+from dataclasses import replace
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+import asyncio
+import math
+import os
+import threading
+from sqlalchemy import select, func, table, column, Integer, Date, Time, Boolean
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from smart_buddy.models.sqlalchemy_models import Profile
 from smart_buddy.matching.compatibility_engine import CompatibilityEngine, StudentProfile, CompatibilityScore
-from smart_buddy.matching.csp_solver import CSPSolver, StudySession, SchedulingConstraints
+from smart_buddy.matching.csp_solver import CSPSolver, StudySession, ScheduleSlot, SchedulingConstraints, PairOverlapCache, \
+    SolverTrace
+from smart_buddy.matching.group_formation import GroupFormationEngine
+from smart_buddy.matching.interval_scheduler import IntervalScheduler, Interval, availability_rows_to_intervals
+from smart_buddy.matching.result_cache import ScheduleResultCache, schedule_cache_key, \
+    schedule_result_cache, register_profile_invalidation
+from smart_buddy.matching.metrics import record_solver_trace
+from smart_buddy.matching.encoded_population import EncodedPopulation
+from smart_buddy.matching.population_snapshot import MappedPopulation
+from smart_buddy.matching.compute_pool import ComputePool
+from smart_buddy.matching.match_cursor import MatchCursor, encode_cursor, query_fingerprint, resume_after
+from smart_buddy.matching.matcher_registry import RankingCache
+from smart_buddy.matching.mutual_index import MutualMatchIndex, MutualMatch
+from smart_buddy.matching.diversity import DIVERSITY_POOL_SIZE, rerank_diverse
+from smart_buddy.matching.matrix_format import MatrixSummary, MATRIX_FIELDS, MATRIX_COMPONENTS
+from smart_buddy.matching.candidate_prefilter import viable_partner_filter
+from smart_buddy.matching.profile_cache import RequestProfileCache
+from smart_buddy.matching.profile_store import ProfileStore, register_profile_store_events
+from smart_buddy.matching.profile_normalization import register_profile_normalization
+
+
+# Read-only view of the availability table. Selecting through a table clause avoids
+# configuring the Availability mapper and its UserProfile relationship.
+availability_table = table(
+    "availability",
+    column("user_id", Integer),
+    column("date", Date),
+    column("day_of_week", Integer),
+    column("start_time", Time),
+    column("end_time", Time),
+    column("is_active", Boolean)
+)
+
+# Profile columns used for matching; password and created_at are never loaded
+PROFILE_MATCHING_COLUMNS = (
+    Profile.id,
+    Profile.username,
+    Profile.email,
+    Profile.personality_traits,
+    Profile.study_style,
+    Profile.preferred_environment,
+    Profile.academic_focus_areas,
+    Profile.availability,
+    Profile.updated_at,
+    Profile.profile_format_version
+)
+
+# Rows fetched per round trip when streaming the profiles table
+PROFILE_STREAM_CHUNK_SIZE = 1000
+
+# Rankings over smaller populations finish in-process faster than the round trip to a
+# compute pool worker
+COMPUTE_POOL_MIN_POPULATION = int(os.getenv("COMPUTE_POOL_MIN_POPULATION", "20000"))
+
+# Rows scored per step while streaming a compatibility matrix
+MATRIX_STREAM_BLOCK_ROWS = 64
+
+# Students ranked per task by batch find-matches
+BATCH_RANK_BLOCK_STUDENTS = 32
+
+# Partitions are kept by the profile store, so batches without one cannot be partitioned
+PARTITIONED_NEEDS_STORE = "Partitioned search needs the profile store"
+
+# Length of every student's list in the mutual match index; mutual matches are found
+# among each student's top MUTUAL_MATCH_K partners
+MUTUAL_MATCH_K = int(os.getenv("MUTUAL_MATCH_K", "20"))
+
+# Matching fields are canonicalized on every ORM write, so loads skip parsing
+register_profile_normalization(Profile)
+
+# Cached group schedules are dropped whenever a member profile is written
+register_profile_invalidation(Profile, schedule_result_cache)
+
+# Resident encoded population shared by every matcher in this process. Setting
+# PROFILE_SNAPSHOT_PATH shares one memory-mapped copy between all worker processes.
+profile_store = ProfileStore(PROFILE_MATCHING_COLUMNS, Profile.id, Profile.updated_at,
+                             snapshot_path=os.getenv("PROFILE_SNAPSHOT_PATH"))
+register_profile_store_events(Profile, profile_store)
+
+
+# Snapshots mapped by this process when it is a compute pool worker, kept until a
+# task asks for a newer generation
+_worker_snapshots: Dict[str, MappedPopulation] = {}
 
 
 class StudyBuddyMatcher:
@@ -17,7 +110,10 @@ class StudyBuddyMatcher:
                  study_preferences_weight: float = 0.25,
                  academic_goals_weight: float = 0.25,
                  availability_weight: float = 0.25,
-                 constraints: Optional[SchedulingConstraints] = None):
+                 constraints: Optional[SchedulingConstraints] = None,
+                 result_cache: Optional[ScheduleResultCache] = None,
+                 profile_store: Optional[ProfileStore] = None,
+                 compute_pool: Optional[ComputePool] = None):
         """
         Initialize the study buddy matcher
         
@@ -27,6 +123,10 @@ class StudyBuddyMatcher:
             academic_goals_weight: Weight for academic goals alignment
             availability_weight: Weight for availability overlap
             constraints: Scheduling constraints for CSP solver
+            result_cache: Cache for group schedule results (no caching if omitted)
+            profile_store: Resident population used for ranking (streamed per call if omitted)
+            compute_pool: Process pool for scoring, solving and large rankings (run in the
+                calling thread if omitted)
         """
         self.compatibility_engine = CompatibilityEngine(
             personality_weight=personality_weight,
@@ -35,22 +135,102 @@ class StudyBuddyMatcher:
             availability_weight=availability_weight
         )
         self.csp_solver = CSPSolver(constraints)
+        self.interval_scheduler = IntervalScheduler(self.csp_solver.constraints)
+        self.result_cache = result_cache
+        self.profile_store = profile_store
+        self.compute_pool = compute_pool
+        # Rankings of the store's current population under these weights; matchers
+        # kept in the matcher registry reuse them across requests
+        self.ranking_cache = RankingCache()
+        # Reciprocal top-K lists of the store's population, updated as profiles change
+        self.mutual_index: Optional[MutualMatchIndex] = None
+        self._mutual_lock = threading.Lock()
     
-    def get_student_profiles(self, db: Session, exclude_student_id: Optional[int] = None) -> List[StudentProfile]:
-        """Get all student profiles from database"""
-        query = db.query(Profile)
+    def __getstate__(self):
+        # Copies sent to compute pool workers leave the process-local caches behind
+        state = self.__dict__.copy()
+        state.update(result_cache=None, profile_store=None, compute_pool=None, ranking_cache=None,
+                     mutual_index=None, _mutual_lock=None)
+        return state
+    
+    def _compute(self, function, *args):
+        """Run CPU-bound work in the compute pool, blocking this thread until it finishes"""
+        if self.compute_pool is None:
+            return function(*args)
+        return self.compute_pool.call(function, *args)
+    
+    async def _compute_async(self, function, *args):
+        """Await CPU-bound work in the compute pool, or in a worker thread without one"""
+        if self.compute_pool is None:
+            return await asyncio.to_thread(function, *args)
+        return await self.compute_pool.run(function, *args)
+    
+    def stream_profile_rows(self, db: Session, exclude_student_id: Optional[int] = None,
+                            chunk_size: int = PROFILE_STREAM_CHUNK_SIZE, where=None):
+        """
+        Stream matching columns of every profile without building ORM objects
+        
+        Rows are fetched chunk_size at a time (server-side cursors where the driver
+        supports them), so only one chunk of raw rows is held in memory.
+        """
+        query = self._profile_rows_query(exclude_student_id, where)
+        return db.execute(query.execution_options(yield_per=chunk_size))
+    
+    def _profile_rows_query(self, exclude_student_id: Optional[int] = None, where=None):
+        query = select(*PROFILE_MATCHING_COLUMNS)
         if exclude_student_id:
-            query = query.filter(Profile.id != exclude_student_id)
+            query = query.where(Profile.id != exclude_student_id)
+        if where is not None:
+            # Keep the table's order so score ties rank as they do without the condition
+            query = query.where(where).order_by(Profile.id)
+        return query
+    
+    def _candidate_filter(self, student_profile: StudentProfile, min_score: float):
+        """WHERE condition dropping profiles that cannot reach min_score, or None"""
+        return viable_partner_filter(self.compatibility_engine, student_profile, min_score, Profile.__table__)
+    
+    def _partner_count_query(self, student_id: int):
+        """Every profile but the student's, including those the candidate filter drops"""
+        return select(func.count()).select_from(Profile).where(Profile.id != student_id)
+    
+    def create_profile_cache(self, db: Session) -> RequestProfileCache:
+        """Profile cache for one request; each profile is loaded and parsed at most once"""
+        def load(student_ids: List[int]):
+            return db.execute(select(*PROFILE_MATCHING_COLUMNS).where(Profile.id.in_(student_ids))).all()
+        return RequestProfileCache(load)
+    
+    def create_async_profile_cache(self, db: AsyncSession) -> RequestProfileCache:
+        """
+        Profile cache for one async request
         
-        profiles = query.all()
-        return [StudentProfile.from_db_profile(profile) for profile in profiles]
+        Profiles are loaded with aget_many on the event loop; afterwards the cache
+        serves them to synchronous code running in a worker thread.
+        """
+        async def load(student_ids: List[int]):
+            return (await db.execute(select(*PROFILE_MATCHING_COLUMNS).where(Profile.id.in_(student_ids)))).all()
+        return RequestProfileCache(async_loader=load)
+    
+    def get_student_profiles(self, db: Session, exclude_student_id: Optional[int] = None) -> List[StudentProfile]:
+        """Get all student profiles from database"""
+        return [StudentProfile.from_db_profile(row)
+                for row in self.stream_profile_rows(db, exclude_student_id)]
+    
+    def load_encoded_population(self, db: Session, exclude_student_id: Optional[int] = None,
+                                chunk_size: int = PROFILE_STREAM_CHUNK_SIZE, where=None) -> EncodedPopulation:
+        """Stream every profile (or those matching where) straight into the compact encoded representation"""
+        return EncodedPopulation.from_rows(self.stream_profile_rows(db, exclude_student_id, chunk_size, where))
     
     def find_matches_for_student(self, 
                                 student_id: int, 
                                 db: Session,
                                 min_score: float = 50.0,
                                 max_results: int = 10,
-                                include_scheduling: bool = True) -> Dict:
+                                include_scheduling: bool = True,
+                                profile_cache: Optional[RequestProfileCache] = None,
+                                partitioned: bool = False,
+                                global_sample: int = 0,
+                                diversity: float = 0.0,
+                                diversity_pool: int = DIVERSITY_POOL_SIZE) -> Dict:
         """
         Find compatible study partners for a specific student
         
@@ -60,35 +240,804 @@ class StudyBuddyMatcher:
             min_score: Minimum compatibility score threshold
             max_results: Maximum number of matches to return
             include_scheduling: Whether to include scheduling analysis
+            profile_cache: Profiles already loaded in this request (created if omitted)
+            partitioned: Only search students sharing a course or department partition with
+                this student (needs the profile store; the whole table is searched without it)
+            global_sample: Students from across the population added to a partitioned search
+            diversity: Weight (0-1) of partner variety when re-ranking the top diversity_pool
+                candidates by maximal marginal relevance; 0 keeps the plain ranking
+            diversity_pool: Candidates ranked by score before re-ranking for diversity
             
         Returns:
             Dictionary with matches and optional scheduling information
         """
+        if profile_cache is None:
+            profile_cache = self.create_profile_cache(db)
+        
         # Get the student's profile
-        student_profile_db = db.query(Profile).filter(Profile.id == student_id).first()
-        if not student_profile_db:
+        student_profile = profile_cache.get(student_id)
+        if not student_profile:
             return {"error": "Student not found"}
         
-        student_profile = StudentProfile.from_db_profile(student_profile_db)
+        # Rank the whole population on the encoded representation
+        if self.profile_store is not None:
+            self.profile_store.ensure_fresh(db)
+            total_potential_partners, ranked = self._rank_top([student_profile], min_score, max_results,
+                                                              partitioned, global_sample, diversity, diversity_pool)[0]
+        else:
+            # Only candidates that can reach min_score are loaded; the rest are just counted
+            candidate_filter = self._candidate_filter(student_profile, min_score)
+            population = self.load_encoded_population(db, exclude_student_id=student_id, where=candidate_filter)
+            total_potential_partners, ranked = self._rank_population(
+                population, student_profile, min_score, max_results,
+                diversity=diversity, diversity_pool=diversity_pool
+            )
+            if candidate_filter is not None:
+                total_potential_partners = db.execute(self._partner_count_query(student_id)).scalar_one()
+        
+        if not total_potential_partners:
+            return {"matches": [], "message": "No other students found in the system"}
+        
+        return self._build_match_results(student_profile, ranked, total_potential_partners,
+                                         include_scheduling, db, profile_cache)
+    
+    async def find_matches_for_student_async(self,
+                                             student_id: int,
+                                             db: AsyncSession,
+                                             min_score: float = 50.0,
+                                             max_results: int = 10,
+                                             include_scheduling: bool = True,
+                                             partitioned: bool = False,
+                                             global_sample: int = 0,
+                                             diversity: float = 0.0,
+                                             diversity_pool: int = DIVERSITY_POOL_SIZE) -> Dict:
+        """
+        Async variant of find_matches_for_student
+        
+        Database reads are awaited on the event loop, while ranking, scoring and
+        scheduling run in a worker thread, so other requests are served meanwhile.
+        """
+        profile_cache = self.create_async_profile_cache(db)
+        student_profile = await profile_cache.aget(student_id)
+        if not student_profile:
+            return {"error": "Student not found"}
         
-        # Get potential partners (all other students)
-        potential_partners = self.get_student_profiles(db, exclude_student_id=student_id)
+        if self.profile_store is not None:
+            await self.profile_store.ensure_fresh_async(db)
+            total_potential_partners, ranked = (await self._rank_top_async([student_profile], min_score, max_results,
+                                                                           partitioned, global_sample, diversity,
+                                                                           diversity_pool))[0]
+        else:
+            candidate_filter = self._candidate_filter(student_profile, min_score)
+            rows = (await db.execute(self._profile_rows_query(student_id, candidate_filter))).all()
+            total_potential_partners, ranked = await asyncio.to_thread(
+                lambda: self._rank_population(EncodedPopulation.from_rows(rows), student_profile,
+                                              min_score, max_results, diversity=diversity,
+                                              diversity_pool=diversity_pool)
+            )
+            if candidate_filter is not None:
+                total_potential_partners = (await db.execute(self._partner_count_query(student_id))).scalar_one()
         
-        if not potential_partners:
+        if not total_potential_partners:
             return {"matches": [], "message": "No other students found in the system"}
         
-        # Find compatible matches
-        matches = self.compatibility_engine.find_matches(
+        await profile_cache.aget_many(partner_id for partner_id, _ in ranked)
+        return await asyncio.to_thread(self._build_match_results, student_profile, ranked,
+                                       total_potential_partners, include_scheduling, None, profile_cache)
+    
+    def _rank_store(self, rank, *args):
+        """
+        rank(population, *args) on the resident population as it is, without refreshing it
+        
+        rank is _rank_population or _page_population.
+        """
+        pooled_snapshot = self._pooled_snapshot()
+        if pooled_snapshot is not None:
+            return self._compute(self._rank_snapshot, *pooled_snapshot, rank, *args)
+        with self.profile_store.current() as population:
+            return rank(population, *args)
+    
+    async def _rank_store_async(self, rank, *args):
+        """Await _rank_store in the compute pool, or in a worker thread"""
+        pooled_snapshot = self._pooled_snapshot()
+        if pooled_snapshot is not None:
+            return await self._compute_async(self._rank_snapshot, *pooled_snapshot, rank, *args)
+        return await asyncio.to_thread(self._rank_store, rank, *args)
+    
+    def _rank_top(self, student_profiles: List[StudentProfile], min_score: float, max_results: int,
+                  partitioned: bool = False, global_sample: int = 0, diversity: float = 0.0,
+                  diversity_pool: int = DIVERSITY_POOL_SIZE) -> List[Tuple[int, List[Tuple[int, float]]]]:
+        """
+        _rank_batch on the store, answering repeated rankings from the ranking cache
+        
+        Cached rankings are keyed by the student's profile version and only served for
+        the population version they were made on.
+        """
+        scope = global_sample if partitioned else None
+        cache_scope = (scope, diversity, diversity_pool) if diversity > 0 else scope
+        version, rankings, misses = self._cached_rankings(student_profiles, min_score, max_results, cache_scope)
+        if misses:
+            ranked = self._rank_store(self._rank_batch, misses, min_score, max_results,
+                                      self._partition_candidates(misses, scope), diversity, diversity_pool)
+            self._fill_rankings(version, rankings, misses, ranked, min_score, max_results, cache_scope)
+        return rankings
+    
+    async def _rank_top_async(self, student_profiles: List[StudentProfile], min_score: float, max_results: int,
+                              partitioned: bool = False, global_sample: int = 0, diversity: float = 0.0,
+                              diversity_pool: int = DIVERSITY_POOL_SIZE) -> List[Tuple[int, List[Tuple[int, float]]]]:
+        """Async variant of _rank_top"""
+        scope = global_sample if partitioned else None
+        cache_scope = (scope, diversity, diversity_pool) if diversity > 0 else scope
+        version, rankings, misses = self._cached_rankings(student_profiles, min_score, max_results, cache_scope)
+        if misses:
+            candidates = None if scope is None else \
+                await asyncio.to_thread(self._partition_candidates, misses, scope)
+            ranked = await self._rank_store_async(self._rank_batch, misses, min_score, max_results, candidates,
+                                                  diversity, diversity_pool)
+            self._fill_rankings(version, rankings, misses, ranked, min_score, max_results, cache_scope)
+        return rankings
+    
+    def _partition_candidates(self, student_profiles: List[StudentProfile],
+                              scope: Optional[int]) -> Optional[List[Optional[List[int]]]]:
+        """Candidate ids per student for a partitioned search with a global sample of scope (None: search everyone)"""
+        if scope is None:
+            return None
+        with self.profile_store.current() as population:
+            partitions = self.profile_store.current_partitions()
+            return [partitions.candidate_ids(population, student, scope) for student in student_profiles]
+    
+    def _cached_rankings(self, student_profiles: List[StudentProfile], min_score: float, max_results: int,
+                         scope=None):
+        """(population version, cached ranking or None per student, students still to rank)"""
+        version = self.profile_store.version
+        rankings = [self.ranking_cache.get(version, (student.id, student.version, min_score, max_results, scope))
+                    for student in student_profiles]
+        misses = [student for student, ranking in zip(student_profiles, rankings) if ranking is None]
+        return version, rankings, misses
+    
+    def _fill_rankings(self, version: int, rankings: List, misses: List[StudentProfile], ranked: List,
+                       min_score: float, max_results: int, scope=None) -> None:
+        fresh = iter(zip(misses, ranked))
+        for position, ranking in enumerate(rankings):
+            if ranking is None:
+                student, ranking = next(fresh)
+                self.ranking_cache.put(version, (student.id, student.version, min_score, max_results, scope),
+                                       ranking)
+                rankings[position] = ranking
+    
+    def _pooled_snapshot(self) -> Optional[Tuple[str, int]]:
+        """
+        (snapshot path, generation) when ranking the store should go to the compute pool
+        
+        Only a snapshot-backed store is ranked in the pool: workers map the same file
+        instead of receiving a pickled copy of the population with every task.
+        """
+        if self.compute_pool is None or not self.compute_pool.running:
+            return None
+        # Read without the store lock, so the event loop never waits behind a ranking;
+        # a published snapshot is never changed in place
+        population = self.profile_store.population
+        if isinstance(population, MappedPopulation) and len(population) >= COMPUTE_POOL_MIN_POPULATION:
+            return self.profile_store.snapshot_path, population.generation
+        return None
+    
+    def _rank_snapshot(self, snapshot_path: str, generation: int, rank, *args):
+        """rank(population, *args) on a published snapshot; runs in a compute pool worker"""
+        population = _worker_snapshots.get(snapshot_path)
+        if population is None or population.generation < generation:
+            population = _worker_snapshots[snapshot_path] = MappedPopulation(snapshot_path)
+        return rank(population, *args)
+    
+    def _rank_population(self, population: EncodedPopulation, student_profile: StudentProfile,
+                         min_score: float, max_results: int, candidate_ids: Optional[List[int]] = None,
+                         diversity: float = 0.0,
+                         diversity_pool: int = DIVERSITY_POOL_SIZE) -> Tuple[int, List[Tuple[int, float]]]:
+        """
+        (number of potential partners, top (partner_id, score) pairs) for a student
+        
+        With candidate_ids only those students are scored; the number of potential
+        partners still counts the whole population. With diversity, the top
+        diversity_pool pairs are re-ranked by maximal marginal relevance.
+        """
+        total_potential_partners = len(population) - (1 if student_profile.id in population.index_by_id else 0)
+        ranked = population.top_matches(
+            engine=self.compatibility_engine,
+            student=student_profile,
+            min_score=min_score,
+            max_results=max(max_results, diversity_pool) if diversity > 0 else max_results,
+            indexes=population.indexes_of(candidate_ids) if candidate_ids is not None else None
+        )
+        if diversity > 0:
+            ranked = rerank_diverse(population, ranked, max_results, diversity)
+        return total_potential_partners, ranked
+    
+    def find_matches_batch(self,
+                           student_ids: List[int],
+                           db: Session,
+                           min_score: float = 50.0,
+                           max_results: int = 10,
+                           include_scheduling: bool = False,
+                           profile_cache: Optional[RequestProfileCache] = None,
+                           partitioned: bool = False,
+                           global_sample: int = 0) -> Dict:
+        """
+        Find matches for many students against one load of the population
+        
+        Args:
+            student_ids: IDs of the students looking for matches
+            db: Database session
+            min_score: Minimum compatibility score threshold
+            max_results: Maximum number of matches per student
+            include_scheduling: Whether to include scheduling analysis
+            profile_cache: Profiles already loaded in this request (created if omitted)
+            partitioned: Only search each student's course or department partitions (needs the profile store)
+            global_sample: Students from across the population added to a partitioned search
+            
+        Returns:
+            Dictionary with one find_matches_for_student result per student, in request order,
+            or an "error" when a partitioned search is asked of a matcher without a profile store
+        """
+        if partitioned and self.profile_store is None:
+            return {"error": PARTITIONED_NEEDS_STORE}
+        results = list(self.iter_find_matches_batch(student_ids, db, min_score, max_results,
+                                                    include_scheduling, profile_cache, partitioned, global_sample))
+        return self._batch_summary(results, min_score, max_results)
+    
+    async def find_matches_batch_async(self,
+                                       student_ids: List[int],
+                                       db: AsyncSession,
+                                       min_score: float = 50.0,
+                                       max_results: int = 10,
+                                       include_scheduling: bool = False,
+                                       partitioned: bool = False,
+                                       global_sample: int = 0) -> Dict:
+        """Async variant of find_matches_batch"""
+        if partitioned and self.profile_store is None:
+            return {"error": PARTITIONED_NEEDS_STORE}
+        results = [result async for result in self.aiter_find_matches_batch(student_ids, db, min_score, max_results,
+                                                                            include_scheduling, partitioned,
+                                                                            global_sample)]
+        return self._batch_summary(results, min_score, max_results)
+    
+    def iter_find_matches_batch(self,
+                                student_ids: List[int],
+                                db: Session,
+                                min_score: float = 50.0,
+                                max_results: int = 10,
+                                include_scheduling: bool = False,
+                                profile_cache: Optional[RequestProfileCache] = None,
+                                partitioned: bool = False,
+                                global_sample: int = 0) -> Iterator[Dict]:
+        """
+        Yield each student's matches as its block of students is ranked
+        
+        The students are loaded in one query and the population is refreshed or
+        loaded once; blocks of BATCH_RANK_BLOCK_STUDENTS students are then ranked
+        against it and their partners loaded together. Unknown students yield an
+        "error" result.
+        
+        Raises:
+            ValueError: If partitioned is set and the matcher has no profile store
+        """
+        if partitioned and self.profile_store is None:
+            raise ValueError(PARTITIONED_NEEDS_STORE)
+        if profile_cache is None:
+            profile_cache = self.create_profile_cache(db)
+        student_ids = list(dict.fromkeys(student_ids))
+        profile_cache.get_many(student_ids)
+        
+        if self.profile_store is not None:
+            self.profile_store.ensure_fresh(db)
+            population = None
+        else:
+            population = self.load_encoded_population(db)
+        
+        for block_ids in self._batch_blocks(student_ids):
+            students = [profile_cache.get(student_id) for student_id in block_ids]
+            found = [student for student in students if student is not None]
+            if population is None:
+                ranked = self._rank_top(found, min_score, max_results, partitioned, global_sample)
+            else:
+                ranked = self._rank_batch(population, found, min_score, max_results)
+            profile_cache.get_many(partner_id for _, pairs in ranked for partner_id, _ in pairs)
+            yield from self._batch_results(block_ids, students, ranked, include_scheduling, db, profile_cache)
+    
+    async def aiter_find_matches_batch(self,
+                                       student_ids: List[int],
+                                       db: AsyncSession,
+                                       min_score: float = 50.0,
+                                       max_results: int = 10,
+                                       include_scheduling: bool = False,
+                                       partitioned: bool = False,
+                                       global_sample: int = 0) -> AsyncIterator[Dict]:
+        """
+        Async variant of iter_find_matches_batch
+        
+        Blocks are ranked concurrently, one per compute pool worker, while earlier
+        blocks' results are built and sent.
+        """
+        if partitioned and self.profile_store is None:
+            raise ValueError(PARTITIONED_NEEDS_STORE)
+        profile_cache = self.create_async_profile_cache(db)
+        student_ids = list(dict.fromkeys(student_ids))
+        await profile_cache.aget_many(student_ids)
+        
+        if self.profile_store is not None:
+            await self.profile_store.ensure_fresh_async(db)
+            
+            def rank(found):
+                return self._rank_top_async(found, min_score, max_results, partitioned, global_sample)
+        else:
+            rows = (await db.execute(self._profile_rows_query())).all()
+            population = await asyncio.to_thread(EncodedPopulation.from_rows, rows)
+            
+            def rank(found):
+                return asyncio.to_thread(self._rank_batch, population, found, min_score, max_results)
+        
+        blocks = iter(self._batch_blocks(student_ids))
+        in_flight = deque()
+        
+        def launch():
+            block_ids = next(blocks, None)
+            if block_ids is not None:
+                students = [profile_cache.get(student_id) for student_id in block_ids]
+                found = [student for student in students if student is not None]
+                in_flight.append((block_ids, students, asyncio.ensure_future(rank(found))))
+        
+        parallel_blocks = max(self.compute_pool.max_workers, 1) \
+            if self.compute_pool is not None and self.compute_pool.running else 1
+        try:
+            for _ in range(parallel_blocks):
+                launch()
+            while in_flight:
+                block_ids, students, ranking = in_flight.popleft()
+                ranked = await ranking
+                launch()
+                await profile_cache.aget_many(partner_id for _, pairs in ranked for partner_id, _ in pairs)
+                results = await asyncio.to_thread(
+                    lambda: list(self._batch_results(block_ids, students, ranked, include_scheduling, None,
+                                                     profile_cache))
+                )
+                for result in results:
+                    yield result
+        finally:
+            # A client that stops reading leaves nothing running
+            for _, _, ranking in in_flight:
+                ranking.cancel()
+    
+    def _batch_blocks(self, students: List) -> List[List]:
+        return [students[start:start + BATCH_RANK_BLOCK_STUDENTS]
+                for start in range(0, len(students), BATCH_RANK_BLOCK_STUDENTS)]
+    
+    def _rank_batch(self, population: EncodedPopulation, student_profiles: List[StudentProfile],
+                    min_score: float, max_results: int,
+                    candidates: Optional[List[Optional[List[int]]]] = None, diversity: float = 0.0,
+                    diversity_pool: int = DIVERSITY_POOL_SIZE) -> List[Tuple[int, List[Tuple[int, float]]]]:
+        """_rank_population for a block of students against one population, with optional candidate ids per student"""
+        if candidates is None:
+            candidates = [None] * len(student_profiles)
+        return [self._rank_population(population, student_profile, min_score, max_results, candidate_ids,
+                                      diversity, diversity_pool)
+                for student_profile, candidate_ids in zip(student_profiles, candidates)]
+    
+    def _batch_results(self, student_ids: List[int], students: List[Optional[StudentProfile]],
+                       ranked: List[Tuple[int, List[Tuple[int, float]]]], include_scheduling: bool,
+                       db: Optional[Session], profile_cache: RequestProfileCache) -> Iterator[Dict]:
+        """Per-student results of a ranked block, shaped like find_matches_for_student"""
+        block_ranked = iter(ranked)
+        for student_id, student_profile in zip(student_ids, students):
+            if student_profile is None:
+                yield {"student_id": student_id, "error": "Student not found"}
+                continue
+            total_potential_partners, pairs = next(block_ranked)
+            if not total_potential_partners:
+                yield {"student_id": student_id, "matches": [], "message": "No other students found in the system"}
+                continue
+            yield self._build_match_results(student_profile, pairs, total_potential_partners,
+                                            include_scheduling, db, profile_cache)
+    
+    def _batch_summary(self, results: List[Dict], min_score: float, max_results: int) -> Dict:
+        return {
+            "students_requested": len(results),
+            "students_found": sum(1 for result in results if "error" not in result),
+            "min_score": min_score,
+            "max_results": max_results,
+            "results": results
+        }
+    
+    def find_matches_page(self,
+                          student_id: int,
+                          db: Session,
+                          page_size: int = 20,
+                          min_score: float = 50.0,
+                          cursor: Optional[str] = None,
+                          profile_cache: Optional[RequestProfileCache] = None) -> Dict:
+        """
+        One page of a student's matches, in an order that is stable across pages
+        
+        Matches are ordered by score descending, then partner id. A page resumes
+        selection after its cursor's (score, partner_id) instead of ranking and sorting
+        every candidate again, so deep pages cost no more than the first one.
+        
+        Args:
+            student_id: ID of the student looking for matches
+            db: Database session
+            page_size: Matches per page
+            min_score: Minimum compatibility score threshold
+            cursor: next_cursor of the previous page (first page if omitted)
+            profile_cache: Profiles already loaded in this request (created if omitted)
+            
+        Returns:
+            Dictionary with the page of matches and the cursor of the next page
+            
+        Raises:
+            InvalidCursorError: The cursor is malformed or belongs to another query
+            StaleCursorError: Profiles changed since the cursor was issued
+        """
+        if profile_cache is None:
+            profile_cache = self.create_profile_cache(db)
+        
+        student_profile = profile_cache.get(student_id)
+        if not student_profile:
+            return {"error": "Student not found"}
+        
+        if self.profile_store is not None:
+            self.profile_store.ensure_fresh(db)
+            population_version, ranked = self._page_store(student_profile, min_score, page_size, cursor)
+        else:
+            # Without a store there is no version to detect changes between pages
+            population_version = None
+            after = self._resume_page(student_profile, min_score, cursor, population_version)
+            population = self.load_encoded_population(db, exclude_student_id=student_id,
+                                                      where=self._candidate_filter(student_profile, min_score))
+            ranked = self._page_population(population, student_profile, min_score, page_size, after)
+        
+        return self._build_match_page(student_profile, ranked, page_size, min_score, population_version,
+                                      profile_cache)
+    
+    async def find_matches_page_async(self,
+                                      student_id: int,
+                                      db: AsyncSession,
+                                      page_size: int = 20,
+                                      min_score: float = 50.0,
+                                      cursor: Optional[str] = None) -> Dict:
+        """Async variant of find_matches_page; selection runs off the event loop"""
+        profile_cache = self.create_async_profile_cache(db)
+        student_profile = await profile_cache.aget(student_id)
+        if not student_profile:
+            return {"error": "Student not found"}
+        
+        if self.profile_store is not None:
+            await self.profile_store.ensure_fresh_async(db)
+            population_version, ranked = await self._page_store_async(student_profile, min_score, page_size, cursor)
+        else:
+            population_version = None
+            after = self._resume_page(student_profile, min_score, cursor, population_version)
+            rows = (await db.execute(self._profile_rows_query(
+                student_id, self._candidate_filter(student_profile, min_score)
+            ))).all()
+            ranked = await asyncio.to_thread(
+                lambda: self._page_population(EncodedPopulation.from_rows(rows), student_profile,
+                                              min_score, page_size, after)
+            )
+        
+        await profile_cache.aget_many(partner_id for partner_id, _ in ranked)
+        return await asyncio.to_thread(self._build_match_page, student_profile, ranked, page_size, min_score,
+                                       population_version, profile_cache)
+    
+    def _page_store(self, student_profile: StudentProfile, min_score: float, page_size: int,
+                    cursor: Optional[str]) -> Tuple[int, List[Tuple[int, float]]]:
+        """(population version, page) of the resident population, without refreshing it"""
+        population_version, after, pooled_snapshot, ranked = self._page_start(student_profile, min_score,
+                                                                             page_size, cursor)
+        if ranked is None:
+            ranked = self._compute(self._rank_snapshot, *pooled_snapshot, self._page_population,
+                                   student_profile, min_score, page_size, after)
+        return population_version, ranked
+    
+    async def _page_store_async(self, student_profile: StudentProfile, min_score: float, page_size: int,
+                                cursor: Optional[str]) -> Tuple[int, List[Tuple[int, float]]]:
+        """Await _page_store in the compute pool, or in a worker thread"""
+        population_version, after, pooled_snapshot, ranked = await asyncio.to_thread(
+            self._page_start, student_profile, min_score, page_size, cursor)
+        if ranked is None:
+            ranked = await self._compute_async(self._rank_snapshot, *pooled_snapshot, self._page_population,
+                                               student_profile, min_score, page_size, after)
+        return population_version, ranked
+    
+    def _page_start(self, student_profile: StudentProfile, min_score: float, page_size: int,
+                    cursor: Optional[str]) -> Tuple[int, Optional[Tuple[float, int]], Optional[Tuple[str, int]],
+                                                    Optional[List[Tuple[int, float]]]]:
+        """
+        (population version, resume position, pooled snapshot, page or None) of the store
+        
+        The version is read in the same current() block that ranks the page, or that
+        picks the snapshot the compute pool ranks, so a refresh in between cannot pair
+        a newer population with an older version in the cursor.
+        """
+        with self.profile_store.current() as population:
+            population_version = self.profile_store.version
+            after = self._resume_page(student_profile, min_score, cursor, population_version)
+            pooled_snapshot = self._pooled_snapshot()
+            if pooled_snapshot is not None:
+                return population_version, after, pooled_snapshot, None
+            return population_version, after, None, self._page_population(population, student_profile, min_score,
+                                                                           page_size, after)
+    
+    def _page_query(self, student_profile: StudentProfile, min_score: float) -> str:
+        """Fingerprint of the ranking a page belongs to"""
+        engine = self.compatibility_engine
+        return query_fingerprint(student_profile.id, min_score, {
+            "personality": engine.personality_weight,
+            "study_preferences": engine.study_preferences_weight,
+            "academic_goals": engine.academic_goals_weight,
+            "availability": engine.availability_weight
+        })
+    
+    def _resume_page(self, student_profile: StudentProfile, min_score: float, cursor: Optional[str],
+                     population_version: Optional[int]) -> Optional[Tuple[float, int]]:
+        """(score, partner_id) to resume after, validated against this query and version"""
+        resumed = resume_after(cursor, self._page_query(student_profile, min_score), population_version)
+        return (resumed.score, resumed.partner_id) if resumed is not None else None
+    
+    def _page_population(self, population: EncodedPopulation, student_profile: StudentProfile,
+                         min_score: float, page_size: int,
+                         after: Optional[Tuple[float, int]]) -> List[Tuple[int, float]]:
+        """The page after a position, plus one more pair to tell whether another page follows"""
+        return population.matches_after(
+            engine=self.compatibility_engine,
             student=student_profile,
-            potential_partners=potential_partners,
             min_score=min_score,
-            max_results=max_results
+            max_results=page_size + 1,
+            after=after
         )
+    
+    def _build_match_page(self,
+                          student_profile: StudentProfile,
+                          ranked: List[Tuple[int, float]],
+                          page_size: int,
+                          min_score: float,
+                          population_version: Optional[int],
+                          profile_cache: RequestProfileCache) -> Dict:
+        """Detailed scores for a page of ranked partners and the cursor of the next page"""
+        page = ranked[:page_size]
+        partners = {profile.id: profile
+                    for profile in profile_cache.get_many(partner_id for partner_id, _ in page)}
+        matches = [
+            self.compatibility_engine.compute_compatibility_score(student_profile, partners[partner_id]).to_dict()
+            for partner_id, _ in page if partner_id in partners
+        ]
+        
+        next_cursor = None
+        if len(ranked) > page_size:
+            last_partner_id, last_score = page[-1]
+            next_cursor = encode_cursor(MatchCursor(
+                population_version=population_version,
+                score=last_score,
+                partner_id=last_partner_id,
+                query=self._page_query(student_profile, min_score)
+            ))
+        
+        return {
+            "student_id": student_profile.id,
+            "student_username": student_profile.username,
+            "population_version": population_version,
+            "page_size": page_size,
+            "matches_returned": len(matches),
+            "matches": matches,
+            "next_cursor": next_cursor
+        }
+    
+    def find_mutual_matches(self,
+                            student_id: int,
+                            db: Session,
+                            min_score: float = 50.0,
+                            max_results: int = 10,
+                            profile_cache: Optional[RequestProfileCache] = None) -> Dict:
+        """
+        Partners in the student's top MUTUAL_MATCH_K who also have the student in theirs
+        
+        With the profile store, every student's top K is ranked from the resident
+        population and kept with the reverse lists, so each call is an O(K) lookup;
+        profile changes only re-rank the lists they can affect. Without it the index
+        is built for this call only.
+        
+        Args:
+            student_id: ID of the student looking for mutual matches
+            db: Database session
+            min_score: Minimum compatibility score, in both directions
+            max_results: Maximum number of mutual matches to return
+            profile_cache: Profiles already loaded in this request (created if omitted)
+            
+        Returns:
+            Dictionary with the mutual matches, best first by the student's own score
+        """
+        if profile_cache is None:
+            profile_cache = self.create_profile_cache(db)
+        student_profile = profile_cache.get(student_id)
+        if not student_profile:
+            return {"error": "Student not found"}
+        
+        if self.profile_store is not None:
+            self.profile_store.ensure_fresh(db)
+            index = self._current_mutual_index()
+        else:
+            index = self._local_mutual_index(self.load_encoded_population(db))
+        
+        mutual = index.mutual(student_id, min_score, max_results)
+        profile_cache.get_many(match.partner_id for match in mutual)
+        return self._build_mutual_results(student_profile, index, mutual, profile_cache)
+    
+    async def find_mutual_matches_async(self,
+                                        student_id: int,
+                                        db: AsyncSession,
+                                        min_score: float = 50.0,
+                                        max_results: int = 10) -> Dict:
+        """
+        Async variant of find_mutual_matches
+        
+        With the profile store no profiles are read; a stale index is brought up to
+        date in a worker thread, ranking blocks of students on the compute pool.
+        """
+        profile_cache = self.create_async_profile_cache(db)
+        student_profile = await profile_cache.aget(student_id)
+        if not student_profile:
+            return {"error": "Student not found"}
+        
+        if self.profile_store is not None:
+            await self.profile_store.ensure_fresh_async(db)
+            index = await asyncio.to_thread(self._current_mutual_index)
+        else:
+            rows = (await db.execute(self._profile_rows_query())).all()
+            index = await asyncio.to_thread(lambda: self._local_mutual_index(EncodedPopulation.from_rows(rows)))
+        
+        mutual = index.mutual(student_id, min_score, max_results)
+        await profile_cache.aget_many(match.partner_id for match in mutual)
+        return await asyncio.to_thread(self._build_mutual_results, student_profile, index, mutual, profile_cache)
+    
+    def _current_mutual_index(self) -> MutualMatchIndex:
+        """
+        The mutual index of the store's population, brought up to date if it is stale
+        
+        One caller at a time updates the index while the others keep getting the
+        previous one; only the first build is waited for.
+        """
+        index = self.mutual_index
+        if index is not None and index.version == self.profile_store.version:
+            return index
+        if not self._mutual_lock.acquire(blocking=index is None):
+            return index
+        try:
+            index = self.mutual_index
+            if index is None or index.version != self.profile_store.version:
+                index = self.mutual_index = self._updated_mutual_index(index)
+            return index
+        finally:
+            self._mutual_lock.release()
+    
+    def _updated_mutual_index(self, index: Optional[MutualMatchIndex]) -> MutualMatchIndex:
+        """
+        The mutual index for the store's current population, from the resident population
+        
+        When the profile store knows which ids changed since index was built, only
+        students whose list held a changed id, and the changed students themselves, are
+        ranked again; everyone else just has the changed students merged into their list.
+        """
+        with self.profile_store.current() as population:
+            version = self.profile_store.version
+            changed = None if index is None else self.profile_store.changed_since(index.version)
+            # Refreshes change a private population in place; mapped snapshots never change
+            if not isinstance(population, MappedPopulation):
+                population = population.copy()
+        
+        # Past half the population, merging costs more than ranking everyone again
+        if changed is None or len(changed) * 2 > len(population):
+            return MutualMatchIndex(MUTUAL_MATCH_K, version,
+                                    self._mutual_forward(population, list(population.ids)))
+        
+        position = population.index_by_id
+        present = [student_id for student_id in changed if student_id in position]
+        rerank = set(present)
+        for student_id in changed:
+            rerank.update(lister_id for lister_id in index.reverse.get(student_id, ()) if lister_id in position)
+        lists = self._mutual_forward(population, sorted(rerank))
+        
+        others = [student_id for student_id in population.ids if student_id not in rerank]
+        for student_id, scored in self._mutual_forward(population, others, present).items():
+            if not scored:
+                continue
+            # Ties rank in population order, as in a full ranking
+            merged = sorted(index.forward.get(student_id, []) + scored,
+                            key=lambda pair: (-pair[1], position[pair[0]]))[:MUTUAL_MATCH_K]
+            if merged != index.forward.get(student_id):
+                lists[student_id] = merged
+        return index.updated(version, lists, [student_id for student_id in changed if student_id not in position])
+    
+    def _local_mutual_index(self, population: EncodedPopulation) -> MutualMatchIndex:
+        """Mutual index over the given population, for matchers without a profile store"""
+        return MutualMatchIndex(MUTUAL_MATCH_K, None, self._mutual_forward(population, list(population.ids)))
+    
+    def _mutual_forward(self, population: EncodedPopulation, student_ids: List[int],
+                        partner_ids: Optional[List[int]] = None) -> Dict[int, List[Tuple[int, float]]]:
+        """
+        Top MUTUAL_MATCH_K of each student among partner_ids (everyone if omitted)
+        
+        Blocks of students are ranked in parallel on the compute pool; a mapped snapshot
+        is ranked by the pool workers themselves.
+        """
+        pooled = self.compute_pool is not None and self.compute_pool.running
+        if pooled and isinstance(population, MappedPopulation) and len(population) >= COMPUTE_POOL_MIN_POPULATION:
+            def rank(block):
+                return self._compute(self._rank_snapshot, population.path, population.generation,
+                                     self._rank_members, block, MUTUAL_MATCH_K, partner_ids)
+        else:
+            def rank(block):
+                return self._rank_members(population, block, MUTUAL_MATCH_K, partner_ids)
+        
+        blocks = self._batch_blocks(student_ids)
+        if pooled and self.compute_pool.max_workers > 1:
+            with ThreadPoolExecutor(max_workers=self.compute_pool.max_workers) as executor:
+                ranked_blocks = list(executor.map(rank, blocks))
+        else:
+            ranked_blocks = map(rank, blocks)
+        forward = {}
+        for block, ranked in zip(blocks, ranked_blocks):
+            forward.update(zip(block, ranked))
+        return forward
+    
+    def _rank_members(self, population: EncodedPopulation, student_ids: List[int], max_results: int,
+                      partner_ids: Optional[List[int]] = None) -> List[List[Tuple[int, float]]]:
+        """Top (partner_id, score) pairs of students of the population, among partner_ids if given"""
+        indexes = None if partner_ids is None else population.indexes_of(partner_ids)
+        return [population.member_top_matches(self.compatibility_engine, student_id, 0.0, max_results, indexes)
+                for student_id in student_ids]
+    
+    def _build_mutual_results(self, student_profile: StudentProfile, index: MutualMatchIndex,
+                              mutual: List[MutualMatch], profile_cache: RequestProfileCache) -> Dict:
+        """Compatibility details of each mutual match, with both sides' score and rank"""
+        partners = {profile.id: profile
+                    for profile in profile_cache.get_many(match.partner_id for match in mutual)}
+        matches = []
+        for match in mutual:
+            if match.partner_id not in partners:
+                continue
+            details = self.compatibility_engine.compute_compatibility_score(student_profile,
+                                                                            partners[match.partner_id])
+            matches.append({
+                **details.to_dict(),
+                "rank": match.rank,
+                "their_score": round(match.their_score, 2),
+                "their_rank": match.their_rank
+            })
+        return {
+            "student_id": student_profile.id,
+            "student_username": student_profile.username,
+            "k": index.k,
+            "listed_by": index.listed_by_count(student_profile.id),
+            "mutual_matches_found": len(matches),
+            "mutual_matches": matches
+        }
+    
+    def _build_match_results(self,
+                             student_profile: StudentProfile,
+                             ranked: List[Tuple[int, float]],
+                             total_potential_partners: int,
+                             include_scheduling: bool,
+                             db: Optional[Session],
+                             profile_cache: RequestProfileCache) -> Dict:
+        """Detailed results for the ranked partners, with optional scheduling analysis"""
+        # Only the top matches are rebuilt as full profiles for the detailed breakdown
+        partners = {profile.id: profile
+                    for profile in profile_cache.get_many(partner_id for partner_id, _ in ranked)}
+        matches = [
+            self.compatibility_engine.compute_compatibility_score(student_profile, partners[partner_id])
+            for partner_id, _ in ranked if partner_id in partners
+        ]
         
         result = {
-            "student_id": student_id,
+            "student_id": student_profile.id,
             "student_username": student_profile.username,
-            "total_potential_partners": len(potential_partners),
+            "total_potential_partners": total_potential_partners,
             "matches_found": len(matches),
             "matches": [match.to_dict() for match in matches]
         }
@@ -98,7 +1047,8 @@ class StudyBuddyMatcher:
             scheduling_analysis = self._analyze_scheduling_feasibility(
                 student_profile=student_profile,
                 matches=matches,
-                db=db
+                db=db,
+                profile_cache=profile_cache
             )
             result["scheduling_analysis"] = scheduling_analysis
         
@@ -107,19 +1057,26 @@ class StudyBuddyMatcher:
     def _analyze_scheduling_feasibility(self, 
                                       student_profile: StudentProfile, 
                                       matches: List[CompatibilityScore],
-                                      db: Session) -> Dict:
+                                      db: Session,
+                                      profile_cache: Optional[RequestProfileCache] = None) -> Dict:
         """Analyze scheduling feasibility for matches"""
+        if profile_cache is None:
+            profile_cache = self.create_profile_cache(db)
         
         # Create availability mapping
         student_availabilities = {student_profile.id: student_profile.availability}
+        student_versions = {student_profile.id: student_profile.version}
         
-        # Add partner availabilities
+        # Add partner availabilities (already loaded while ranking matches)
         partner_ids = [match.partner_id for match in matches]
-        partner_profiles = db.query(Profile).filter(Profile.id.in_(partner_ids)).all()
+        for partner_profile in profile_cache.get_many(partner_ids):
+            student_availabilities[partner_profile.id] = partner_profile.availability
+            student_versions[partner_profile.id] = partner_profile.version
         
-        for profile in partner_profiles:
-            partner_student_profile = StudentProfile.from_db_profile(profile)
-            student_availabilities[profile.id] = partner_student_profile.availability
+        # The engine already found each pair's overlap; reuse it instead of recomputing
+        overlap_cache = PairOverlapCache(student_versions)
+        for match in matches:
+            overlap_cache.seed(student_profile.id, match.partner_id, match.shared_time_slots)
         
         # Create compatibility pairs for CSP solver
         compatibility_pairs = [
@@ -131,7 +1088,8 @@ class StudyBuddyMatcher:
         proposed_schedule = self.csp_solver.solve_schedule(
             student_availabilities=student_availabilities,
             compatibility_pairs=compatibility_pairs,
-            max_sessions_to_schedule=len(matches)
+            max_sessions_to_schedule=len(matches),
+            overlap_cache=overlap_cache
         )
         
         # Validate schedule
@@ -160,7 +1118,9 @@ class StudyBuddyMatcher:
     def create_study_group_schedule(self, 
                                   student_ids: List[int], 
                                   db: Session,
-                                  optimize: bool = True) -> Dict:
+                                  optimize: bool = True,
+                                  include_trace: bool = False,
+                                  profile_cache: Optional[RequestProfileCache] = None) -> Dict:
         """
         Create an optimal study schedule for a group of students
         
@@ -168,51 +1128,137 @@ class StudyBuddyMatcher:
             student_ids: List of student IDs to include in scheduling
             db: Database session
             optimize: Whether to optimize the initial schedule
+            include_trace: Whether to return the solver's search statistics
+                (bypasses the result cache lookup, since a hit runs no solver)
+            profile_cache: Profiles already loaded in this request (created if omitted)
             
         Returns:
             Dictionary with complete schedule and analysis
         """
+        if self.result_cache is not None and not include_trace:
+            # Only ids and versions are needed to look up a previous result
+            versions = db.query(Profile.id, Profile.updated_at).filter(Profile.id.in_(student_ids)).all()
+            cached = self._cached_group_schedule(student_ids, versions, optimize)
+            if cached is not None:
+                return cached
+        
+        if profile_cache is None:
+            profile_cache = self.create_profile_cache(db)
+        return self._solve_group_schedule(student_ids, optimize, include_trace, profile_cache)
+    
+    async def create_study_group_schedule_async(self,
+                                                student_ids: List[int],
+                                                db: AsyncSession,
+                                                optimize: bool = True,
+                                                include_trace: bool = False) -> Dict:
+        """
+        Async variant of create_study_group_schedule
+        
+        Profiles are loaded on the event loop; scoring and solving run in a worker thread.
+        """
+        if self.result_cache is not None and not include_trace:
+            versions = (await db.execute(
+                select(Profile.id, Profile.updated_at).where(Profile.id.in_(student_ids))
+            )).all()
+            cached = self._cached_group_schedule(student_ids, versions, optimize)
+            if cached is not None:
+                return cached
+        
+        profile_cache = self.create_async_profile_cache(db)
+        await profile_cache.aget_many(student_ids)
+        trace = SolverTrace()
+        with trace.phase("load_profiles"):
+            student_profiles = profile_cache.get_many(student_ids)
+        
+        if len(student_profiles) < 2:
+            return {"error": "At least 2 students required for scheduling"}
+        
+        results, trace = await self._compute_async(self._schedule_group, student_ids, student_profiles,
+                                                   optimize, trace)
+        return self._finish_group_schedule(results, trace, student_profiles, optimize, include_trace)
+    
+    def _cached_group_schedule(self, student_ids: List[int], versions: List[Tuple[int, object]],
+                               optimize: bool) -> Optional[Dict]:
+        """A previous result for exactly these profile versions, if one is cached"""
+        if len(versions) < 2:
+            return None
+        cached = self.result_cache.get(self._schedule_cache_key(versions, optimize))
+        if cached is not None:
+            cached["student_ids"] = student_ids
+            cached["cache_hit"] = True
+        return cached
+    
+    def _solve_group_schedule(self, student_ids: List[int], optimize: bool, include_trace: bool,
+                              profile_cache: RequestProfileCache) -> Dict:
+        """Score, solve, optimize and validate a group schedule"""
+        trace = SolverTrace()
+        
         # Get student profiles
-        profiles = db.query(Profile).filter(Profile.id.in_(student_ids)).all()
-        student_profiles = [StudentProfile.from_db_profile(p) for p in profiles]
+        with trace.phase("load_profiles"):
+            student_profiles = profile_cache.get_many(student_ids)
         
         if len(student_profiles) < 2:
             return {"error": "At least 2 students required for scheduling"}
         
+        results, trace = self._compute(self._schedule_group, student_ids, student_profiles, optimize, trace)
+        return self._finish_group_schedule(results, trace, student_profiles, optimize, include_trace)
+    
+    def _schedule_group(self, student_ids: List[int], student_profiles: List[StudentProfile], optimize: bool,
+                        trace: SolverTrace) -> Tuple[Dict, SolverTrace]:
+        """
+        The CPU-bound part of group scheduling; may run in a compute pool worker
+        
+        Returns:
+            Schedule results and the trace, which comes back from the worker as a copy
+        """
         # Create availability mapping
         student_availabilities = {
             profile.id: profile.availability 
             for profile in student_profiles
         }
         
+        # Overlaps found while scoring seed the cache shared by solve and optimize
+        overlap_cache = PairOverlapCache({profile.id: profile.version for profile in student_profiles})
+        
         # Generate all possible pairs and their compatibility scores
         compatibility_pairs = []
-        for i, student1 in enumerate(student_profiles):
-            for student2 in student_profiles[i+1:]:
-                score = self.compatibility_engine.compute_compatibility_score(student1, student2)
-                compatibility_pairs.append((student1.id, student2.id, score.total_score))
+        with trace.phase("scoring"):
+            for i, student1 in enumerate(student_profiles):
+                for student2 in student_profiles[i+1:]:
+                    score = self.compatibility_engine.compute_compatibility_score(student1, student2)
+                    compatibility_pairs.append((student1.id, student2.id, score.total_score))
+                    overlap_cache.seed(student1.id, student2.id, score.shared_time_slots)
         
         # Solve initial schedule
-        initial_schedule = self.csp_solver.solve_schedule(
-            student_availabilities=student_availabilities,
-            compatibility_pairs=compatibility_pairs
-        )
+        with trace.phase("solve"):
+            initial_schedule = self.csp_solver.solve_schedule(
+                student_availabilities=student_availabilities,
+                compatibility_pairs=compatibility_pairs,
+                overlap_cache=overlap_cache,
+                trace=trace
+            )
         
         # Optimize if requested
         final_schedule = initial_schedule
         if optimize and initial_schedule:
-            final_schedule = self.csp_solver.optimize_schedule(
-                initial_schedule=initial_schedule,
-                student_availabilities=student_availabilities
-            )
+            with trace.phase("optimize"):
+                final_schedule = self.csp_solver.optimize_schedule(
+                    initial_schedule=initial_schedule,
+                    student_availabilities=student_availabilities,
+                    overlap_cache=overlap_cache,
+                    trace=trace
+                )
         
         # Validate final schedule
-        is_valid, violations = self.csp_solver.validate_full_schedule(final_schedule)
+        with trace.phase("validate"):
+            is_valid, violations = self.csp_solver.validate_full_schedule(final_schedule)
         
         # Create detailed schedule summary
         schedule_summary = self._create_schedule_summary(final_schedule, student_profiles)
         
-        return {
+        trace.record_cache(overlap_cache)
+        
+        results = {
             "student_ids": student_ids,
             "total_students": len(student_profiles),
             "total_possible_pairs": len(compatibility_pairs),
@@ -222,6 +1268,343 @@ class StudyBuddyMatcher:
             "schedule": schedule_summary,
             "optimization_applied": optimize
         }
+        return results, trace
+    
+    def _finish_group_schedule(self, results: Dict, trace: SolverTrace, student_profiles: List[StudentProfile],
+                               optimize: bool, include_trace: bool) -> Dict:
+        """Record the solver metrics and cache the results in this process"""
+        record_solver_trace(trace)
+        
+        if self.result_cache is not None:
+            # Key on the versions actually scored, even if a profile changed since the lookup
+            key = self._schedule_cache_key([(p.id, p.version) for p in student_profiles], optimize)
+            self.result_cache.put(key, [p.id for p in student_profiles], results)
+            results["cache_hit"] = False
+        
+        if include_trace:
+            results["solver_trace"] = trace.to_dict()
+        
+        return results
+    
+    def _schedule_cache_key(self, profile_versions: List[Tuple[int, object]], optimize: bool) -> str:
+        """Cache key for a group schedule under this matcher's weights and constraints"""
+        engine = self.compatibility_engine
+        return schedule_cache_key(
+            profile_versions=profile_versions,
+            weights={
+                "personality": engine.personality_weight,
+                "study_preferences": engine.study_preferences_weight,
+                "academic_goals": engine.academic_goals_weight,
+                "availability": engine.availability_weight
+            },
+            constraints=vars(self.csp_solver.constraints),
+            optimize=optimize
+        )
+    
+    def repair_group_schedule(self,
+                              sessions: List[Dict],
+                              student_id: int,
+                              new_availability: Dict[str, List[str]],
+                              db: Session,
+                              neighborhood_size: int = 5,
+                              profile_cache: Optional[RequestProfileCache] = None) -> Dict:
+        """
+        Repair an existing group schedule after one student's availability changes
+        
+        Args:
+            sessions: Existing sessions as dicts with partner1_id, partner2_id, day, time
+                and optional duration_hours
+            student_id: Student whose availability changed
+            new_availability: The student's new availability dict
+            db: Database session
+            neighborhood_size: Maximum number of other sessions that may be moved
+            profile_cache: Profiles already loaded in this request (created if omitted)
+            
+        Returns:
+            Dictionary with the repaired schedule and a repair report
+        """
+        schedule = [
+            StudySession(
+                partner1_id=session["partner1_id"],
+                partner2_id=session["partner2_id"],
+                schedule_slot=ScheduleSlot(day=session["day"], time=session["time"]),
+                duration_hours=session.get("duration_hours", 2.0)
+            )
+            for session in sessions
+        ]
+        
+        involved_ids = {student_id}
+        for session in schedule:
+            involved_ids.update((session.partner1_id, session.partner2_id))
+        
+        if profile_cache is None:
+            profile_cache = self.create_profile_cache(db)
+        student_profiles = {p.id: p for p in profile_cache.get_many(involved_ids)}
+        
+        if student_id not in student_profiles:
+            return {"error": "Student not found"}
+        
+        student_availabilities = {
+            profile_id: profile.availability for profile_id, profile in student_profiles.items()
+        }
+        
+        # Score the changed student as they are now, not as stored
+        changed_profile = replace(student_profiles[student_id], availability=new_availability)
+        student_profiles[student_id] = changed_profile
+        
+        # Only the changed student's pairs need scores; the rest of the group is untouched
+        compatibility_pairs = [
+            (student_id, other.id,
+             self.compatibility_engine.compute_compatibility_score(changed_profile, other).total_score)
+            for other in student_profiles.values() if other.id != student_id
+        ]
+        
+        repaired_schedule, repair_report = self.csp_solver.repair_schedule(
+            schedule=schedule,
+            changed_student_id=student_id,
+            new_availability=new_availability,
+            student_availabilities=student_availabilities,
+            compatibility_pairs=compatibility_pairs,
+            neighborhood_size=neighborhood_size,
+            overlap_cache=PairOverlapCache({p.id: p.version for p in student_profiles.values()})
+        )
+        
+        is_valid, violations = self.csp_solver.validate_full_schedule(repaired_schedule)
+        
+        return {
+            "student_id": student_id,
+            "scheduled_sessions": len(repaired_schedule),
+            "schedule_valid": is_valid,
+            "constraint_violations": violations,
+            "repair": repair_report,
+            "sessions": [
+                {
+                    "partner1_id": session.partner1_id,
+                    "partner2_id": session.partner2_id,
+                    "day": session.schedule_slot.day,
+                    "time": session.schedule_slot.time,
+                    "duration_hours": session.duration_hours
+                }
+                for session in repaired_schedule
+            ],
+            "schedule": self._create_schedule_summary(repaired_schedule, list(student_profiles.values()))
+        }
+    
+    async def repair_group_schedule_async(self,
+                                          sessions: List[Dict],
+                                          student_id: int,
+                                          new_availability: Dict[str, List[str]],
+                                          db: AsyncSession,
+                                          neighborhood_size: int = 5) -> Dict:
+        """Async variant of repair_group_schedule; the repair itself runs in a worker thread"""
+        involved_ids = {student_id}
+        for session in sessions:
+            involved_ids.update((session["partner1_id"], session["partner2_id"]))
+        
+        profile_cache = self.create_async_profile_cache(db)
+        await profile_cache.aget_many(involved_ids)
+        return await asyncio.to_thread(self.repair_group_schedule, sessions, student_id, new_availability,
+                                       None, neighborhood_size, profile_cache)
+    
+    def load_availability_intervals(self,
+                                    student_ids: List[int],
+                                    db: Session,
+                                    week_start: Optional[date] = None) -> Dict[int, List[Interval]]:
+        """
+        Load active Availability rows as merged minute-of-week intervals
+        
+        Args:
+            student_ids: Students whose availability should be loaded
+            db: Database session
+            week_start: Monday of the week being scheduled (for one-time rows)
+            
+        Returns:
+            Dict mapping student_id -> merged availability intervals
+        """
+        rows = db.execute(self._availability_query(student_ids)).all()
+        return self._availability_rows_to_intervals(rows, week_start)
+    
+    async def load_availability_intervals_async(self,
+                                                student_ids: List[int],
+                                                db: AsyncSession,
+                                                week_start: Optional[date] = None) -> Dict[int, List[Interval]]:
+        """Async variant of load_availability_intervals"""
+        rows = (await db.execute(self._availability_query(student_ids))).all()
+        return self._availability_rows_to_intervals(rows, week_start)
+    
+    def _availability_query(self, student_ids: List[int]):
+        # Core select over the needed columns only; no ORM objects are built
+        return select(
+            availability_table.c.user_id,
+            availability_table.c.date,
+            availability_table.c.day_of_week,
+            availability_table.c.start_time,
+            availability_table.c.end_time
+        ).where(
+            availability_table.c.user_id.in_(student_ids),
+            availability_table.c.is_active == True
+        )
+    
+    def _availability_rows_to_intervals(self, rows, week_start: Optional[date]) -> Dict[int, List[Interval]]:
+        """Merged intervals per student from availability rows"""
+        rows_by_student = {}
+        for row in rows:
+            rows_by_student.setdefault(row.user_id, []).append(row)
+        
+        return {
+            student_id: availability_rows_to_intervals(student_rows, week_start)
+            for student_id, student_rows in rows_by_student.items()
+        }
+    
+    def create_interval_schedule(self,
+                                 student_ids: List[int],
+                                 db: Session,
+                                 week_start: Optional[date] = None,
+                                 profile_cache: Optional[RequestProfileCache] = None) -> Dict:
+        """
+        Create a study schedule from real availability intervals
+        
+        Unlike create_study_group_schedule, sessions are placed at concrete start
+        times with the preferred length and the minimum break between sessions.
+        
+        Args:
+            student_ids: List of student IDs to include in scheduling
+            db: Database session
+            week_start: Monday of the week being scheduled (for one-time rows)
+            profile_cache: Profiles already loaded in this request (created if omitted)
+            
+        Returns:
+            Dictionary with complete schedule and analysis
+        """
+        if profile_cache is None:
+            profile_cache = self.create_profile_cache(db)
+        student_profiles = profile_cache.get_many(student_ids)
+        
+        if len(student_profiles) < 2:
+            return {"error": "At least 2 students required for scheduling"}
+        
+        student_intervals = self.load_availability_intervals(
+            [profile.id for profile in student_profiles], db, week_start
+        )
+        return self._solve_interval_schedule(student_ids, student_profiles, student_intervals)
+    
+    async def create_interval_schedule_async(self,
+                                             student_ids: List[int],
+                                             db: AsyncSession,
+                                             week_start: Optional[date] = None) -> Dict:
+        """Async variant of create_interval_schedule; scoring and solving run in a worker thread"""
+        profile_cache = self.create_async_profile_cache(db)
+        student_profiles = await profile_cache.aget_many(student_ids)
+        
+        if len(student_profiles) < 2:
+            return {"error": "At least 2 students required for scheduling"}
+        
+        student_intervals = await self.load_availability_intervals_async(
+            [profile.id for profile in student_profiles], db, week_start
+        )
+        return await asyncio.to_thread(self._solve_interval_schedule, student_ids, student_profiles,
+                                       student_intervals)
+    
+    def _solve_interval_schedule(self, student_ids: List[int], student_profiles: List[StudentProfile],
+                                 student_intervals: Dict[int, List[Interval]]) -> Dict:
+        """Score every pair and place sessions in the students' availability intervals"""
+        compatibility_pairs = []
+        for i, student1 in enumerate(student_profiles):
+            for student2 in student_profiles[i+1:]:
+                score = self.compatibility_engine.compute_compatibility_score(student1, student2)
+                compatibility_pairs.append((student1.id, student2.id, score.total_score))
+        
+        final_schedule = self.interval_scheduler.solve_schedule(
+            student_intervals=student_intervals,
+            compatibility_pairs=compatibility_pairs
+        )
+        
+        is_valid, violations = self.csp_solver.validate_full_schedule(final_schedule)
+        schedule_summary = self._create_schedule_summary(final_schedule, student_profiles)
+        
+        return {
+            "student_ids": student_ids,
+            "total_students": len(student_profiles),
+            "students_with_availability": len(student_intervals),
+            "total_possible_pairs": len(compatibility_pairs),
+            "scheduled_sessions": len(final_schedule),
+            "schedule_valid": is_valid,
+            "constraint_violations": violations,
+            "schedule": schedule_summary,
+            "session_length_hours": self.csp_solver.constraints.preferred_session_length,
+            "min_break_hours": self.csp_solver.constraints.min_break_between_sessions
+        }
+    
+    def form_study_groups(self,
+                          db: Session,
+                          student_ids: Optional[List[int]] = None,
+                          group_size: int = 4,
+                          candidate_pool_size: int = 24,
+                          profile_cache: Optional[RequestProfileCache] = None) -> Dict:
+        """
+        Partition a cohort into study groups of a target size
+        
+        Args:
+            db: Database session
+            student_ids: Cohort to partition (all students if omitted)
+            group_size: Target number of students per group
+            candidate_pool_size: Candidates considered when growing each group
+            profile_cache: Profiles already loaded in this request (created if omitted)
+            
+        Returns:
+            Dictionary with the formed groups and summary statistics
+        """
+        if student_ids:
+            if profile_cache is None:
+                profile_cache = self.create_profile_cache(db)
+            student_profiles = profile_cache.get_many(student_ids)
+        else:
+            student_profiles = self.get_student_profiles(db)
+        
+        return self._form_groups(student_profiles, group_size, candidate_pool_size)
+    
+    async def form_study_groups_async(self,
+                                      db: AsyncSession,
+                                      student_ids: Optional[List[int]] = None,
+                                      group_size: int = 4,
+                                      candidate_pool_size: int = 24) -> Dict:
+        """Async variant of form_study_groups; parsing and group formation run in a worker thread"""
+        if student_ids:
+            profile_cache = self.create_async_profile_cache(db)
+            student_profiles = await profile_cache.aget_many(student_ids)
+        else:
+            rows = (await db.execute(self._profile_rows_query())).all()
+            student_profiles = await asyncio.to_thread(
+                lambda: [StudentProfile.from_db_profile(row) for row in rows]
+            )
+        
+        return await asyncio.to_thread(self._form_groups, student_profiles, group_size, candidate_pool_size)
+    
+    def _form_groups(self, student_profiles: List[StudentProfile], group_size: int,
+                     candidate_pool_size: int) -> Dict:
+        """Partition already loaded profiles into groups"""
+        if len(student_profiles) < group_size:
+            return {"error": f"At least {group_size} students required to form groups"}
+        
+        group_engine = GroupFormationEngine(
+            compatibility_engine=self.compatibility_engine,
+            group_size=group_size,
+            candidate_pool_size=candidate_pool_size
+        )
+        groups = group_engine.form_groups(student_profiles)
+        
+        average_scores = [group.average_compatibility for group in groups]
+        
+        return {
+            "total_students": len(student_profiles),
+            "group_size": group_size,
+            "groups_formed": len(groups),
+            "groups": [group.to_dict() for group in groups],
+            "statistics": {
+                "average_group_compatibility": round(sum(average_scores) / len(average_scores), 2) if average_scores else 0,
+                "groups_with_common_availability": sum(1 for group in groups if group.common_time_slots)
+            }
+        }
     
     def _create_schedule_summary(self, 
                                sessions: List[StudySession], 
@@ -251,10 +1634,10 @@ class StudyBuddyMatcher:
                 "duration_hours": session.duration_hours
             })
         
-        # Sort sessions within each day by time
+        # Sort sessions within each day by time (coarse slots first, then HH:MM starts)
         time_order = {"Morning": 1, "Afternoon": 2, "Evening": 3}
         for day in schedule_by_day:
-            schedule_by_day[day].sort(key=lambda x: time_order.get(x["time"], 4))
+            schedule_by_day[day].sort(key=lambda x: (time_order.get(x["time"], 4), x["time"]))
         
         # Calculate statistics
         total_study_hours = sum(session.duration_hours for session in sessions)
@@ -278,24 +1661,40 @@ class StudyBuddyMatcher:
             }
         }
     
-    def get_compatibility_matrix(self, student_ids: List[int], db: Session) -> Dict:
+    def get_compatibility_matrix(self, student_ids: List[int], db: Session,
+                                 profile_cache: Optional[RequestProfileCache] = None,
+                                 fields: Tuple[str, ...] = MATRIX_FIELDS) -> Dict:
         """
         Generate a compatibility matrix for a group of students
         
         Args:
             student_ids: List of student IDs to analyze
             db: Database session
+            profile_cache: Profiles already loaded in this request (created if omitted)
+            fields: Subset of MATRIX_FIELDS to include; without "components",
+                detailed_scores is neither computed nor returned
             
         Returns:
             Dictionary with compatibility matrix and analysis
         """
+        if profile_cache is None:
+            profile_cache = self.create_profile_cache(db)
+        
         # Get student profiles
-        profiles = db.query(Profile).filter(Profile.id.in_(student_ids)).all()
-        student_profiles = [StudentProfile.from_db_profile(p) for p in profiles]
+        student_profiles = profile_cache.get_many(student_ids)
         
         if len(student_profiles) < 2:
             return {"error": "At least 2 students required for compatibility analysis"}
         
+        return self._compute(self._compatibility_matrix, student_profiles, tuple(fields))
+    
+    def _compatibility_matrix(self, student_profiles: List[StudentProfile],
+                              fields: Tuple[str, ...] = MATRIX_FIELDS) -> Dict:
+        """Score every pair of loaded profiles; may run in a compute pool worker"""
+        include_details = "components" in fields
+        # Without breakdowns, the encoded population scores each row in one pass
+        population = None if include_details else self._group_population(student_profiles)
+        
         # Create compatibility matrix
         matrix = {}
         detailed_scores = {}
@@ -304,8 +1703,10 @@ class StudyBuddyMatcher:
             student1_key = f"{student1.id}_{student1.username}"
             matrix[student1_key] = {}
             detailed_scores[student1_key] = {}
+            row_scores = dict(population.iter_scores(self.compatibility_engine, student1)) \
+                if population is not None else None
             
-            for student2 in student_profiles:
+            for j, student2 in enumerate(student_profiles):
                 student2_key = f"{student2.id}_{student2.username}"
                 
                 if student1.id == student2.id:
@@ -314,6 +1715,8 @@ class StudyBuddyMatcher:
                         "total_score": 100.0,
                         "note": "Self-match"
                     }
+                elif row_scores is not None:
+                    matrix[student1_key][student2_key] = round(row_scores[j], 2)
                 else:
                     score = self.compatibility_engine.compute_compatibility_score(student1, student2)
                     matrix[student1_key][student2_key] = round(score.total_score, 2)
@@ -336,9 +1739,184 @@ class StudyBuddyMatcher:
             "pairs_above_90": sum(1 for score in all_scores if score >= 90)
         }
         
-        return {
-            "student_count": len(student_profiles),
-            "compatibility_matrix": matrix,
-            "detailed_scores": detailed_scores,
-            "summary_statistics": summary_stats
+        result = {"student_count": len(student_profiles)}
+        if "scores" in fields:
+            result["compatibility_matrix"] = matrix
+        if include_details:
+            result["detailed_scores"] = detailed_scores
+        if "summary" in fields:
+            result["summary_statistics"] = summary_stats
+        return result
+    
+    async def get_compatibility_matrix_async(self, student_ids: List[int], db: AsyncSession,
+                                             fields: Tuple[str, ...] = MATRIX_FIELDS) -> Dict:
+        """Async variant of get_compatibility_matrix; pair scoring is awaited off the event loop"""
+        profile_cache = self.create_async_profile_cache(db)
+        student_profiles = await profile_cache.aget_many(student_ids)
+        
+        if len(student_profiles) < 2:
+            return {"error": "At least 2 students required for compatibility analysis"}
+        
+        return await self._compute_async(self._compatibility_matrix, student_profiles, tuple(fields))
+    
+    def load_group_profiles(self, student_ids: List[int], db: Session,
+                            profile_cache: Optional[RequestProfileCache] = None) -> List[StudentProfile]:
+        """Profiles of a group, ordered by id, for callers that score them later"""
+        if profile_cache is None:
+            profile_cache = self.create_profile_cache(db)
+        return profile_cache.get_many(student_ids)
+    
+    async def load_group_profiles_async(self, student_ids: List[int], db: AsyncSession) -> List[StudentProfile]:
+        """Async variant of load_group_profiles"""
+        return await self.create_async_profile_cache(db).aget_many(student_ids)
+    
+    def iter_compatibility_matrix(self, student_profiles: List[StudentProfile],
+                                  include_details: bool = False) -> Iterator[Dict]:
+        """
+        Stream the compatibility matrix of a group one row at a time
+        
+        Yields a "students" record with the row and column keys, one "row" record per
+        student as soon as it is scored, and a final "summary" record with the same
+        statistics as get_compatibility_matrix, accumulated while the rows go out.
+        Only one block of rows is held at a time instead of the whole N x N result.
+        
+        Args:
+            student_profiles: Loaded profiles of the group (at least 2)
+            include_details: Add the full score breakdown of every pair to each row
+        """
+        keys = [f"{profile.id}_{profile.username}" for profile in student_profiles]
+        yield {"type": "students", "student_count": len(student_profiles), "students": keys}
+        
+        summary = MatrixSummary()
+        for start in range(0, len(student_profiles), MATRIX_STREAM_BLOCK_ROWS):
+            stop = min(start + MATRIX_STREAM_BLOCK_ROWS, len(student_profiles))
+            for row in self._compute(self._matrix_rows, student_profiles, start, stop, include_details):
+                for key, score in row["scores"].items():
+                    if key != row["student"]:
+                        summary.add(score)
+                yield row
+        
+        yield {"type": "summary", "summary_statistics": summary.to_dict()}
+    
+    def _matrix_rows(self, student_profiles: List[StudentProfile], start: int, stop: int,
+                     include_details: bool) -> List[Dict]:
+        """Matrix rows for student_profiles[start:stop]; may run in a compute pool worker"""
+        keys = [f"{profile.id}_{profile.username}" for profile in student_profiles]
+        rows = []
+        if include_details:
+            for index in range(start, stop):
+                student1 = student_profiles[index]
+                scores, details = {}, {}
+                for key, student2 in zip(keys, student_profiles):
+                    if student1.id == student2.id:
+                        scores[key] = 100.0
+                        details[key] = {"total_score": 100.0, "note": "Self-match"}
+                    else:
+                        score = self.compatibility_engine.compute_compatibility_score(student1, student2)
+                        scores[key] = round(score.total_score, 2)
+                        details[key] = score.to_dict()
+                rows.append({"type": "row", "student": keys[index], "scores": scores, "detailed_scores": details})
+            return rows
+        
+        # Totals only: the encoded population scores a whole row without building breakdowns
+        population = self._group_population(student_profiles)
+        for index in range(start, stop):
+            scores = dict.fromkeys(keys, 100.0)
+            for column, score in population.iter_scores(self.compatibility_engine, student_profiles[index]):
+                scores[keys[column]] = round(score, 2)
+            rows.append({"type": "row", "student": keys[index], "scores": scores})
+        return rows
+    
+    def _group_population(self, student_profiles: List[StudentProfile]) -> EncodedPopulation:
+        """Encoded group whose indexes are the positions in student_profiles"""
+        population = EncodedPopulation()
+        for profile in student_profiles:
+            population.add(profile)
+        return population
+    
+    def get_compatibility_matrix_columns(self, student_ids: List[int], db: Session,
+                                         profile_cache: Optional[RequestProfileCache] = None,
+                                         fields: Tuple[str, ...] = MATRIX_FIELDS) -> Dict:
+        """
+        Compatibility matrix of a group as dense columns
+        
+        Cell [i][j] of every array is at i * n + j, in the order of student_ids with
+        unknown ids left out and repeated ids kept once; the result's student_ids lists
+        that order. Scores are float32 and unrounded; component scores are NaN on the
+        diagonal, where nobody is compared with anyone. Encode the result with
+        matrix_format.columnar_json or columnar_binary.
+        
+        Args:
+            student_ids: List of student IDs to analyze
+            db: Database session
+            profile_cache: Profiles already loaded in this request (created if omitted)
+            fields: Subset of MATRIX_FIELDS: "scores" adds total_score, "components" the
+                four component arrays, "summary" the summary statistics
+            
+        Returns:
+            Dictionary with student_ids, usernames, shape, arrays and the requested summary
+        """
+        student_profiles = self._in_request_order(student_ids,
+                                                  self.load_group_profiles(student_ids, db, profile_cache))
+        if len(student_profiles) < 2:
+            return {"error": "At least 2 students required for compatibility analysis"}
+        
+        return self._compute(self._matrix_columns, student_profiles, tuple(fields))
+    
+    async def get_compatibility_matrix_columns_async(self, student_ids: List[int], db: AsyncSession,
+                                                     fields: Tuple[str, ...] = MATRIX_FIELDS) -> Dict:
+        """Async variant of get_compatibility_matrix_columns"""
+        student_profiles = self._in_request_order(student_ids,
+                                                  await self.load_group_profiles_async(student_ids, db))
+        if len(student_profiles) < 2:
+            return {"error": "At least 2 students required for compatibility analysis"}
+        
+        return await self._compute_async(self._matrix_columns, student_profiles, tuple(fields))
+    
+    @staticmethod
+    def _in_request_order(student_ids: List[int], student_profiles: List[StudentProfile]) -> List[StudentProfile]:
+        """Loaded profiles (which come ordered by id) in the order they were asked for"""
+        by_id = {profile.id: profile for profile in student_profiles}
+        return [by_id[student_id] for student_id in dict.fromkeys(student_ids) if student_id in by_id]
+    
+    def _matrix_columns(self, student_profiles: List[StudentProfile], fields: Tuple[str, ...]) -> Dict:
+        """Score the group into dense arrays; may run in a compute pool worker"""
+        size = len(student_profiles)
+        total_score = array('f', [100.0]) * (size * size)
+        components = {name: array('f', [math.nan]) * (size * size) for name in MATRIX_COMPONENTS} \
+            if "components" in fields else None
+        summary = MatrixSummary()
+        
+        if components is not None:
+            for row, student1 in enumerate(student_profiles):
+                for column, student2 in enumerate(student_profiles):
+                    if student1.id == student2.id:
+                        continue
+                    score = self.compatibility_engine.compute_compatibility_score(student1, student2)
+                    cell = row * size + column
+                    total_score[cell] = score.total_score
+                    components["personality"][cell] = score.personality_score
+                    components["study_preferences"][cell] = score.study_preferences_score
+                    components["academic_goals"][cell] = score.academic_goals_score
+                    components["availability"][cell] = score.availability_score
+                    summary.add(round(score.total_score, 2))
+        else:
+            population = self._group_population(student_profiles)
+            for row, student in enumerate(student_profiles):
+                for column, score in population.iter_scores(self.compatibility_engine, student):
+                    total_score[row * size + column] = score
+                    summary.add(round(score, 2))
+        
+        columns = {
+            "student_ids": [profile.id for profile in student_profiles],
+            "usernames": [profile.username for profile in student_profiles],
+            "shape": [size, size],
+            "arrays": {}
         }
+        if "scores" in fields:
+            columns["arrays"]["total_score"] = total_score
+        if components is not None:
+            columns["arrays"].update(components)
+        if "summary" in fields:
+            columns["summary_statistics"] = summary.to_dict()
+        return columns
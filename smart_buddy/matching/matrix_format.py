@@ -0,0 +1,143 @@
+"""
+Compact encodings of the compatibility matrix
+One id array plus dense row-major float32 arrays per score, sent as base64 JSON or as a
+binary payload, instead of nested dicts keyed by "{id}_{username}" strings
+"""
+from typing import Dict, Optional, Tuple
+from array import array
+import base64
+import json
+import struct
+import sys
+
+
+# Parts of a matrix response a client can select
+MATRIX_FIELDS = ("scores", "components", "summary")
+
+# Component scores, in the order their arrays are written
+MATRIX_COMPONENTS = ("personality", "study_preferences", "academic_goals", "availability")
+
+MATRIX_BINARY_MAGIC = b"SBMATRIX"
+MATRIX_BINARY_VERSION = 1
+# magic, format version, metadata length
+_HEADER = struct.Struct("<8sII")
+
+
+class MatrixSummary:
+    """Summary statistics of a matrix, accumulated one off-diagonal score at a time"""
+
+    def __init__(self):
+        self.total_pairs = 0
+        self.score_sum = 0.0
+        self.highest: Optional[float] = None
+        self.lowest: Optional[float] = None
+        self.above = {70: 0, 80: 0, 90: 0}
+
+    def add(self, score: float) -> None:
+        """Count one pair's score, rounded like the matrix cells"""
+        self.total_pairs += 1
+        self.score_sum += score
+        self.highest = score if self.highest is None else max(self.highest, score)
+        self.lowest = score if self.lowest is None else min(self.lowest, score)
+        for threshold in self.above:
+            if score >= threshold:
+                self.above[threshold] += 1
+
+    def to_dict(self) -> Dict:
+        """Same statistics get_compatibility_matrix reports"""
+        return {
+            "total_pairs": self.total_pairs,
+            "average_compatibility": round(self.score_sum / self.total_pairs, 2) if self.total_pairs else 0,
+            "highest_compatibility": self.highest if self.total_pairs else 0,
+            "lowest_compatibility": self.lowest if self.total_pairs else 0,
+            "pairs_above_70": self.above[70],
+            "pairs_above_80": self.above[80],
+            "pairs_above_90": self.above[90]
+        }
+
+
+def parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """
+    Selected matrix fields from a comma-separated list (all of them if omitted)
+
+    Raises:
+        ValueError: A field is not one of MATRIX_FIELDS
+    """
+    if not fields:
+        return MATRIX_FIELDS
+    selected = tuple(field.strip() for field in fields.split(",") if field.strip())
+    unknown = [field for field in selected if field not in MATRIX_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown matrix fields {unknown}; choose from {list(MATRIX_FIELDS)}")
+    return selected
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _metadata(columns: Dict) -> Dict:
+    """Everything but the arrays themselves"""
+    return {key: value for key, value in columns.items() if key != "arrays"}
+
+
+def columnar_json(columns: Dict) -> Dict:
+    """
+    JSON-ready columnar matrix with every array as base64 little-endian float32
+
+    Args:
+        columns: Result of StudyBuddyMatcher.compatibility_matrix_columns
+    """
+    return {
+        **_metadata(columns),
+        "format": "columnar",
+        "dtype": "float32",
+        "byteorder": "little",
+        "arrays": {name: base64.b64encode(_little_endian(values)).decode("ascii")
+                   for name, values in columns["arrays"].items()}
+    }
+
+
+def columnar_binary(columns: Dict) -> bytes:
+    """
+    Binary columnar matrix for application/octet-stream responses
+
+    Layout: header (magic, format version, metadata length), UTF-8 JSON metadata
+    padded to a multiple of 4 bytes, then each array in metadata["arrays"] order as
+    little-endian float32.
+    """
+    names = list(columns["arrays"])
+    metadata = json.dumps({**_metadata(columns), "dtype": "float32", "byteorder": "little", "arrays": names},
+                          separators=(",", ":")).encode()
+    metadata += b" " * (-(len(metadata) + _HEADER.size) % 4)
+    return b"".join([_HEADER.pack(MATRIX_BINARY_MAGIC, MATRIX_BINARY_VERSION, len(metadata)), metadata,
+                     *(_little_endian(columns["arrays"][name]) for name in names)])
+
+
+def read_columnar_binary(payload: bytes) -> Dict:
+    """
+    Decode a payload written by columnar_binary
+
+    Raises:
+        ValueError: The payload is not a matrix in a known format
+    """
+    if len(payload) < _HEADER.size:
+        raise ValueError("Payload too short for a matrix header")
+    magic, version, metadata_length = _HEADER.unpack_from(payload)
+    if magic != MATRIX_BINARY_MAGIC or version != MATRIX_BINARY_VERSION:
+        raise ValueError("Not a matrix payload in a known format")
+    offset = _HEADER.size + metadata_length
+    metadata = json.loads(payload[_HEADER.size:offset])
+    cells = metadata["shape"][0] * metadata["shape"][1]
+    arrays = {}
+    for name in metadata["arrays"]:
+        values = array("f")
+        values.frombytes(payload[offset:offset + 4 * cells])
+        if sys.byteorder == "big":
+            values.byteswap()
+        arrays[name] = values
+        offset += 4 * cells
+    return {**metadata, "arrays": arrays}
@@ -0,0 +1,69 @@
+"""
+In-process metrics for the matching system
+Counters and timing summaries that solver runs and caches report to, exposed by the API
+"""
+from typing import Dict, Optional
+import threading
+from smart_buddy.matching.csp_solver import SolverTrace
+
+
+class MetricsRegistry:
+    """Thread-safe counters and timing summaries keyed by dotted metric names"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._timings: Dict[str, Dict[str, float]] = {}
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """Add value to a counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record one duration in a timing summary"""
+        with self._lock:
+            timing = self._timings.setdefault(name, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            timing["count"] += 1
+            timing["total_seconds"] += seconds
+            timing["max_seconds"] = max(timing["max_seconds"], seconds)
+
+    def snapshot(self) -> Dict:
+        """Copy of all counters and timings, with mean durations"""
+        with self._lock:
+            timings = {
+                name: {
+                    **timing,
+                    "mean_seconds": timing["total_seconds"] / timing["count"] if timing["count"] else 0.0
+                }
+                for name, timing in self._timings.items()
+            }
+            return {"counters": dict(self._counters), "timings": timings}
+
+    def reset(self) -> None:
+        """Clear every metric"""
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+
+def record_solver_trace(trace: SolverTrace, registry: Optional[MetricsRegistry] = None) -> None:
+    """Emit the statistics of one solver run to the metrics registry"""
+    registry = registry or metrics
+    registry.increment("csp.runs")
+    registry.increment("csp.pairs_considered", trace.pairs_considered)
+    registry.increment("csp.pairs_skipped_missing_availability", trace.pairs_skipped_missing_availability)
+    registry.increment("csp.pairs_skipped_no_overlap", trace.pairs_skipped_no_overlap)
+    registry.increment("csp.pairs_scheduled", trace.pairs_scheduled)
+    registry.increment("csp.pairs_blocked_by_constraints", trace.pairs_blocked_by_constraints)
+    registry.increment("csp.slots_tried", trace.slots_tried)
+    registry.increment("csp.optimize_slots_tried", trace.optimize_slots_tried)
+    registry.increment("csp.optimize_sessions_moved", trace.optimize_sessions_moved)
+    for rule, count in trace.rejections.items():
+        registry.increment(f"csp.rejections.{rule}", count)
+    for phase, seconds in trace.phase_seconds.items():
+        registry.observe(f"csp.phase.{phase}", seconds)
+
+
+# Process-wide registry reported by GET /matching/metrics
+metrics = MetricsRegistry()
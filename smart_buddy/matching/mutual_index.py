@@ -0,0 +1,117 @@
+"""
+Reciprocal top-K index of the student population
+Every student's top-K partners are kept together with the reverse lists of who ranks
+each student in their top K, so mutual matches are one O(K) intersection
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class MutualMatch:
+    """A partner that appears in the student's top K while the student appears in theirs"""
+
+    def __init__(self, partner_id: int, score: float, rank: int, their_score: float, their_rank: int):
+        self.partner_id = partner_id
+        self.score = score
+        self.rank = rank
+        self.their_score = their_score
+        self.their_rank = their_rank
+
+
+class MutualMatchIndex:
+    """
+    Forward and reverse top-K lists for one population version
+
+    Compatibility is not symmetric (availability is relative to the querying student's
+    slots), so both directions keep their own scores.
+    """
+
+    def __init__(self, k: int, version, forward: Dict[int, List[Tuple[int, float]]],
+                 reverse: Optional[Dict[int, Dict[int, Tuple[int, float]]]] = None):
+        """
+        Args:
+            k: Length of every forward list
+            version: Population version the lists were ranked on
+            forward: Each student's top k (partner_id, score) pairs, best first
+            reverse: Reverse lists matching forward (built from it if omitted)
+        """
+        self.k = k
+        self.version = version
+        self.forward = forward
+        # partner_id -> {student_id: (rank, score)} for every student listing the partner
+        if reverse is None:
+            reverse = {}
+            for student_id, ranked in forward.items():
+                for rank, (partner_id, score) in enumerate(ranked, 1):
+                    reverse.setdefault(partner_id, {})[student_id] = (rank, score)
+        self.reverse = reverse
+
+    def updated(self, version, changed: Dict[int, List[Tuple[int, float]]],
+                removed_ids: Iterable[int] = ()) -> "MutualMatchIndex":
+        """
+        A new index with some forward lists replaced or dropped, leaving this one as it is
+
+        Only the reverse lists of partners entering or leaving a replaced list are
+        copied, so readers of this index are never affected.
+
+        Args:
+            version: Population version of the new index
+            changed: New forward lists of students added or re-ranked
+            removed_ids: Students no longer in the population
+        """
+        forward = dict(self.forward)
+        reverse = dict(self.reverse)
+        copied = set()
+
+        def listed_by(partner_id: int) -> Dict[int, Tuple[int, float]]:
+            if partner_id not in copied:
+                copied.add(partner_id)
+                reverse[partner_id] = dict(reverse.get(partner_id, ()))
+            return reverse[partner_id]
+
+        removed_ids = set(removed_ids)
+        for student_id in removed_ids | changed.keys():
+            for partner_id, _ in forward.pop(student_id, ()):
+                del listed_by(partner_id)[student_id]
+        for student_id, ranked in changed.items():
+            forward[student_id] = ranked
+            for rank, (partner_id, score) in enumerate(ranked, 1):
+                listed_by(partner_id)[student_id] = (rank, score)
+        for partner_id in copied | removed_ids:
+            if not reverse.get(partner_id):
+                reverse.pop(partner_id, None)
+        return MutualMatchIndex(self.k, version, forward, reverse)
+
+    def mutual(self, student_id: int, min_score: float = 0.0,
+               max_results: Optional[int] = None) -> List[MutualMatch]:
+        """
+        Mutual matches of a student, in the order of its own top K
+
+        Both directions must reach min_score. Runs in O(K): the forward list is walked
+        once and each partner is looked up in the student's reverse list.
+        """
+        listed_by = self.reverse.get(student_id, {})
+        matches = []
+        for rank, (partner_id, score) in enumerate(self.forward.get(student_id, ()), 1):
+            theirs = listed_by.get(partner_id)
+            if theirs is None or score < min_score or theirs[1] < min_score:
+                continue
+            matches.append(MutualMatch(partner_id, score, rank, theirs[1], theirs[0]))
+            if max_results is not None and len(matches) >= max_results:
+                break
+        return matches
+
+    def listed_by_count(self, student_id: int) -> int:
+        """How many students have this student in their top K"""
+        return len(self.reverse.get(student_id, ()))
+
+    def __contains__(self, student_id: int) -> bool:
+        return student_id in self.forward
+
+    def stats(self) -> Dict:
+        return {
+            "version": self.version,
+            "k": self.k,
+            "students": len(self.forward),
+            "mutual_pairs": sum(1 for student_id, ranked in self.forward.items()
+                                for partner_id, _ in ranked if partner_id in self.reverse.get(student_id, ())) // 2
+        }
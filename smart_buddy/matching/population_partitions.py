@@ -0,0 +1,120 @@
+"""
+Partitions of the resident population by course or department
+Students are indexed under a shard key per academic focus area (one student can sit in
+several partitions), so a search can score only the partitions a student shares
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Set
+import re
+import zlib
+from smart_buddy.matching.compatibility_engine import StudentProfile
+from smart_buddy.matching.encoded_population import EncodedPopulation
+
+
+# Course codes like "ITSC 4155" or "MATH-1241" are partitioned by department
+COURSE_CODE = re.compile(r"^([A-Z]{2,5})[\s-]*\d{3,4}[A-Z]?$")
+
+
+def shard_key(area) -> Optional[str]:
+    """Partition a focus area belongs to: the department of a course code, otherwise the subject itself"""
+    name = str(area).upper().strip() if area else ""
+    if not name:
+        return None
+    course = COURSE_CODE.match(name)
+    return course.group(1) if course else name
+
+
+def shard_keys(academic_focus_areas) -> frozenset:
+    """Every partition a student with these focus areas belongs to"""
+    keys = (shard_key(area) for area in (academic_focus_areas or []))
+    return frozenset(key for key in keys if key)
+
+
+def shard_of(key: str, shard_count: int) -> int:
+    """Stable shard number of a partition, the same in every process"""
+    return zlib.crc32(key.encode("utf-8")) % shard_count
+
+
+class PopulationPartitions:
+    """
+    Student ids per shard key for one version of a population
+
+    Ids rather than population indexes are kept, so removals that shift indexes leave
+    the partitions valid and a compute pool worker can resolve them on its own copy.
+    """
+
+    def __init__(self, owns: Optional[Callable[[str], bool]] = None):
+        """
+        Args:
+            owns: Keys this process serves, e.g. lambda key: shard_of(key, 4) == 1; partitions
+                of other keys are never built (all of them if omitted)
+        """
+        self.owns = owns
+        self.members: Dict[str, Set[int]] = {}
+        # Population version the partitions reflect; None until first built
+        self.version = None
+
+    def rebuild(self, population: EncodedPopulation, version, keys: Optional[Iterable[str]] = None) -> None:
+        """
+        Rebuild partitions from the population in one pass
+
+        Args:
+            population: Population to index
+            version: Population version the rebuilt partitions reflect
+            keys: Partitions to rebuild, leaving the others as they are (all of them if omitted)
+        """
+        if keys is None:
+            self.members = {}
+            wanted = None
+        else:
+            wanted = {key for key in keys if self.owns is None or self.owns(key)}
+            for key in wanted:
+                self.members.pop(key, None)
+        area_keys = [shard_key(area) for area in population.area_vocab.values]
+        ids, area_sets = population.ids, population.area_sets
+        for index in range(len(ids)):
+            for code in area_sets[index]:
+                key = area_keys[code]
+                if key is None or (wanted is not None and key not in wanted) or \
+                        (wanted is None and self.owns is not None and not self.owns(key)):
+                    continue
+                self.members.setdefault(key, set()).add(ids[index])
+        self.version = version
+
+    def population_keys(self, population: EncodedPopulation, student_id: int) -> frozenset:
+        """Shard keys of a student as currently encoded in the population"""
+        index = population.index_by_id.get(student_id)
+        if index is None:
+            return frozenset()
+        values = population.area_vocab.values
+        return frozenset(key for key in (shard_key(values[code]) for code in population.area_sets[index]) if key)
+
+    def candidate_ids(self, population: EncodedPopulation, student: StudentProfile,
+                      global_sample: int = 0) -> Optional[List[int]]:
+        """
+        Ids to score for a student: its partitions plus an evenly spaced global sample
+
+        The sample keeps some partners from outside the student's courses in view.
+
+        Returns:
+            Candidate ids, or None when the student has no shard keys and the whole
+            population has to be searched
+        """
+        keys = shard_keys(student.academic_focus_areas)
+        if not keys:
+            return None
+        candidates = set()
+        for key in keys:
+            candidates.update(self.members.get(key, ()))
+        if global_sample > 0 and len(population):
+            step = max(1, len(population) // global_sample)
+            candidates.update(population.ids[index] for index in range(0, len(population), step)[:global_sample])
+        return list(candidates)
+
+    def stats(self) -> Dict:
+        sizes = [len(members) for members in self.members.values()]
+        return {
+            "version": self.version,
+            "partitions": len(sizes),
+            "largest": max(sizes, default=0),
+            "memberships": sum(sizes)
+        }
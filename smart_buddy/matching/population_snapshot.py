@@ -0,0 +1,383 @@
+"""
+Memory-mapped snapshot of the encoded student population
+The encoded columns are written to one binary file that every worker process maps read-only,
+so the operating system shares a single copy of the population between workers
+"""
+from typing import Dict, Optional, Tuple
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from smart_buddy.matching.encoded_population import EncodedPopulation, Vocabulary
+
+
+SNAPSHOT_MAGIC = b"SBPOPSNP"
+SNAPSHOT_FORMAT_VERSION = 1
+
+# magic, format version, reserved, generation, metadata length
+_HEADER = struct.Struct("<8sIIQQ")
+
+_EPOCH = datetime(1970, 1, 1)
+# Stored in place of a missing updated_at
+_NO_VERSION = -(1 << 63)
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is missing, corrupt or in an unsupported format"""
+
+
+def _encode_version(version) -> int:
+    """Microseconds since the epoch for a naive updated_at, or the missing marker"""
+    if not isinstance(version, datetime) or version.tzinfo is not None:
+        return _NO_VERSION
+    delta = version - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def _decode_version(value: int):
+    return None if value == _NO_VERSION else _EPOCH + timedelta(microseconds=value)
+
+
+def _mask_words(population: EncodedPopulation) -> int:
+    """64-bit words needed per availability bitmask"""
+    return max(1, (len(population.slot_vocab) + 63) // 64)
+
+
+def write_snapshot(population: EncodedPopulation, path: str, generation: int, last_seen=None) -> int:
+    """
+    Write a population snapshot and atomically publish it at path
+
+    The file is written next to path and renamed over it, so processes that still map
+    the previous generation keep reading it until they remap.
+
+    Args:
+        population: Population to publish
+        path: Snapshot file path
+        generation: Counter that readers compare to detect a newer snapshot
+        last_seen: Newest updated_at applied, so readers can resume polling from it
+
+    Returns:
+        Size of the snapshot in bytes
+    """
+    count = len(population)
+    mask_words = _mask_words(population)
+
+    # Equal focus area sets are already interned, so each distinct set is written once
+    area_table = []
+    area_set_index: Dict[int, int] = {}
+    area_set_ids = array('i')
+    for areas in population.area_sets:
+        set_index = area_set_index.get(id(areas))
+        if set_index is None:
+            set_index = area_set_index[id(areas)] = len(area_table)
+            area_table.append(sorted(areas))
+        area_set_ids.append(set_index)
+
+    slot_masks = array('Q')
+    word_mask = (1 << 64) - 1
+    for mask in population.slot_masks:
+        for word in range(mask_words):
+            slot_masks.append((mask >> (64 * word)) & word_mask)
+
+    username_offsets = array('q', [0])
+    usernames = bytearray()
+    for username in population.usernames:
+        usernames += (username or "").encode("utf-8")
+        username_offsets.append(len(usernames))
+
+    order = sorted(range(count), key=population.ids.__getitem__)
+    sections = {
+        "ids": population.ids,
+        "personality_codes": population.personality_codes,
+        "style_codes": population.style_codes,
+        "environment_codes": population.environment_codes,
+        "slot_counts": population.slot_counts,
+        "slot_masks": slot_masks,
+        "area_set_ids": area_set_ids,
+        "versions": array('q', (_encode_version(version) for version in population.versions)),
+        "username_offsets": username_offsets,
+        "usernames": array('B', usernames),
+        "sorted_ids": array('q', (population.ids[index] for index in order)),
+        "sorted_index": array('i', order),
+    }
+
+    metadata = {
+        "byteorder": sys.byteorder,
+        "count": count,
+        "mask_words": mask_words,
+        "published_at": time.time(),
+        "last_seen": last_seen.isoformat() if isinstance(last_seen, datetime) else None,
+        "vocabularies": {
+            "personality": population.personality_vocab.values,
+            "style": population.style_vocab.values,
+            "environment": population.environment_vocab.values,
+            "slot": [list(value) for value in population.slot_vocab.values],
+            "area": population.area_vocab.values,
+        },
+        "area_table": area_table,
+        "sections": {},
+    }
+
+    # Section offsets are stored in the metadata, so lay the sections out after a
+    # first pass over the metadata size, padding every section to 8 bytes
+    def layout(metadata_length):
+        offset = _HEADER.size + metadata_length
+        for name, values in sections.items():
+            offset += -offset % 8
+            metadata["sections"][name] = [offset, values.typecode, len(values)]
+            offset += len(values) * values.itemsize
+
+    metadata_length = 0
+    while True:
+        layout(metadata_length)
+        encoded_metadata = json.dumps(metadata).encode("utf-8")
+        if len(encoded_metadata) <= metadata_length:
+            break
+        metadata_length = len(encoded_metadata) + 64
+    encoded_metadata = encoded_metadata.ljust(metadata_length)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as snapshot_file:
+        snapshot_file.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, 0, generation, metadata_length))
+        snapshot_file.write(encoded_metadata)
+        for name, values in sections.items():
+            snapshot_file.write(b"\0" * (metadata["sections"][name][0] - snapshot_file.tell()))
+            values.tofile(snapshot_file)
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+        size = snapshot_file.tell()
+    os.replace(temporary_path, path)
+    return size
+
+
+def read_generation(path: str) -> Optional[int]:
+    """Generation of the snapshot at path, or None if there is no readable snapshot"""
+    try:
+        with open(path, "rb") as snapshot_file:
+            header = snapshot_file.read(_HEADER.size)
+    except OSError:
+        return None
+    if len(header) < _HEADER.size:
+        return None
+    magic, format_version, _, generation, _ = _HEADER.unpack(header)
+    if magic != SNAPSHOT_MAGIC or format_version != SNAPSHOT_FORMAT_VERSION:
+        return None
+    return generation
+
+
+class _AreaSetColumn:
+    """Per-student focus area sets, stored as indexes into a small table of distinct sets"""
+
+    def __init__(self, set_ids, table):
+        self._set_ids = set_ids
+        self._table = table
+
+    def __getitem__(self, index: int) -> frozenset:
+        return self._table[self._set_ids[index]]
+
+    def __len__(self) -> int:
+        return len(self._set_ids)
+
+
+class _WideMaskColumn:
+    """Availability bitmasks wider than 64 slots, rebuilt from their words on access"""
+
+    def __init__(self, words, mask_words: int):
+        self._bytes = words.cast('B')
+        self._width = mask_words * 8
+
+    def __getitem__(self, index: int) -> int:
+        start = index * self._width
+        return int.from_bytes(self._bytes[start:start + self._width], "little")
+
+    def __len__(self) -> int:
+        return len(self._bytes) // self._width
+
+
+class _StringColumn:
+    """UTF-8 strings decoded from a shared blob on access"""
+
+    def __init__(self, blob, offsets):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __getitem__(self, index: int) -> str:
+        return str(self._blob[self._offsets[index]:self._offsets[index + 1]], "utf-8")
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+
+class _VersionColumn:
+    """updated_at values decoded on access"""
+
+    def __init__(self, values):
+        self._values = values
+
+    def __getitem__(self, index: int):
+        return _decode_version(self._values[index])
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+class _SortedIdIndex:
+    """Read-only id -> population index mapping, backed by a sorted id column"""
+
+    def __init__(self, sorted_ids, sorted_index):
+        self._sorted_ids = sorted_ids
+        self._sorted_index = sorted_index
+
+    def get(self, student_id: int, default=None):
+        position = bisect_left(self._sorted_ids, student_id)
+        if position < len(self._sorted_ids) and self._sorted_ids[position] == student_id:
+            return self._sorted_index[position]
+        return default
+
+    def __getitem__(self, student_id: int) -> int:
+        index = self.get(student_id)
+        if index is None:
+            raise KeyError(student_id)
+        return index
+
+    def __contains__(self, student_id: int) -> bool:
+        return self.get(student_id) is not None
+
+    def __iter__(self):
+        return iter(self._sorted_ids)
+
+    def __len__(self) -> int:
+        return len(self._sorted_ids)
+
+
+def _frozen_vocabulary(values) -> Vocabulary:
+    vocab = Vocabulary()
+    for value in values:
+        vocab.encode(value)
+    return vocab
+
+
+class MappedPopulation(EncodedPopulation):
+    """
+    Read-only EncodedPopulation backed by a memory-mapped snapshot
+
+    Per-student columns are views into the mapping, so they are shared between every
+    process that maps the same file. Only the vocabularies and the table of distinct
+    focus area sets are decoded per process. Scoring is inherited unchanged.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Snapshot file written by write_snapshot
+
+        Raises:
+            SnapshotError: If the file cannot be mapped or was written in another format
+        """
+        super().__init__()
+        self.path = path
+        try:
+            with open(path, "rb") as snapshot_file:
+                self._mmap = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise SnapshotError(f"Cannot map snapshot {path}: {e}")
+
+        buffer = memoryview(self._mmap)
+        if len(buffer) < _HEADER.size:
+            raise SnapshotError(f"Snapshot {path} is truncated")
+        magic, format_version, _, self.generation, metadata_length = _HEADER.unpack_from(buffer)
+        if magic != SNAPSHOT_MAGIC:
+            raise SnapshotError(f"{path} is not a population snapshot")
+        if format_version != SNAPSHOT_FORMAT_VERSION:
+            raise SnapshotError(f"Snapshot {path} has format version {format_version}, "
+                                f"expected {SNAPSHOT_FORMAT_VERSION}")
+        try:
+            metadata = json.loads(bytes(buffer[_HEADER.size:_HEADER.size + metadata_length]))
+        except ValueError as e:
+            raise SnapshotError(f"Snapshot {path} has corrupt metadata: {e}")
+        if metadata["byteorder"] != sys.byteorder:
+            raise SnapshotError(f"Snapshot {path} was written on a {metadata['byteorder']}-endian machine")
+
+        self.published_at: float = metadata["published_at"]
+        self.last_seen = datetime.fromisoformat(metadata["last_seen"]) if metadata["last_seen"] else None
+        self.mask_words: int = metadata["mask_words"]
+
+        def section(name):
+            offset, typecode, length = metadata["sections"][name]
+            size = length * array(typecode).itemsize
+            if offset + size > len(buffer):
+                raise SnapshotError(f"Snapshot {path} is truncated")
+            return buffer[offset:offset + size].cast(typecode)
+
+        vocabularies = metadata["vocabularies"]
+        self.personality_vocab = _frozen_vocabulary(vocabularies["personality"])
+        self.style_vocab = _frozen_vocabulary(vocabularies["style"])
+        self.environment_vocab = _frozen_vocabulary(vocabularies["environment"])
+        self.slot_vocab = _frozen_vocabulary(tuple(value) for value in vocabularies["slot"])
+        self.area_vocab = _frozen_vocabulary(vocabularies["area"])
+        area_table = [frozenset(codes) for codes in metadata["area_table"]]
+        self._interned_areas = {areas: areas for areas in area_table}
+
+        self.ids = section("ids")
+        self.personality_codes = section("personality_codes")
+        self.style_codes = section("style_codes")
+        self.environment_codes = section("environment_codes")
+        self.slot_counts = section("slot_counts")
+        slot_masks = section("slot_masks")
+        # Single-word masks index straight to ints; wider ones are joined per access
+        self.slot_masks = slot_masks if self.mask_words == 1 else _WideMaskColumn(slot_masks, self.mask_words)
+        self.area_sets = _AreaSetColumn(section("area_set_ids"), area_table)
+        self.versions = _VersionColumn(section("versions"))
+        self.usernames = _StringColumn(section("usernames"), section("username_offsets"))
+        self.index_by_id = _SortedIdIndex(section("sorted_ids"), section("sorted_index"))
+
+    def add(self, profile):
+        raise TypeError("MappedPopulation is read-only; thaw() it to make changes")
+
+    update = add
+
+    def remove(self, student_id: int):
+        raise TypeError("MappedPopulation is read-only; thaw() it to make changes")
+
+    def thaw(self) -> EncodedPopulation:
+        """
+        Private, writable copy of the population
+
+        Codes are kept as they are, so the copy scores and ranks identically.
+        """
+        population = EncodedPopulation()
+        for name in ("personality_vocab", "style_vocab", "environment_vocab", "slot_vocab", "area_vocab"):
+            vocab = getattr(self, name)
+            copy = getattr(population, name)
+            copy.values = list(vocab.values)
+            copy.codes = dict(vocab.codes)
+        population._interned_areas = dict(self._interned_areas)
+
+        count = len(self)
+        population.ids = array('q', self.ids)
+        population.personality_codes = array('i', self.personality_codes)
+        population.style_codes = array('i', self.style_codes)
+        population.environment_codes = array('i', self.environment_codes)
+        population.slot_counts = array('i', self.slot_counts)
+        population.slot_masks = [self.slot_masks[index] for index in range(count)]
+        population.area_sets = [self.area_sets[index] for index in range(count)]
+        population.versions = [self.versions[index] for index in range(count)]
+        population.usernames = [self.usernames[index] for index in range(count)]
+        population.index_by_id = {student_id: index for index, student_id in enumerate(population.ids)}
+        return population
+
+
+def snapshot_identity(path: str) -> Optional[Tuple[int, int, int]]:
+    """(inode, mtime, size) of the file at path; changes whenever a snapshot is published"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
@@ -0,0 +1,88 @@
+"""
+Request-scoped profile cache for the matching service
+Each profile is fetched and parsed into a StudentProfile at most once per request
+"""
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+from smart_buddy.matching.compatibility_engine import StudentProfile
+
+
+class RequestProfileCache:
+    """Identity map of parsed student profiles for a single request"""
+
+    def __init__(self, loader: Optional[Callable[[List[int]], Iterable]] = None, batch_size: int = 500,
+                 async_loader: Optional[Callable[[List[int]], Awaitable[Iterable]]] = None):
+        """
+        Args:
+            loader: Callable that fetches profile rows for a list of ids in one query
+            batch_size: Maximum ids per loader call, to keep IN lists bounded
+            async_loader: Coroutine function fetching rows like loader, used by aget_many
+        """
+        self._loader = loader
+        self._async_loader = async_loader
+        self.batch_size = batch_size
+        self._profiles: Dict[int, StudentProfile] = {}
+        self._missing: Set[int] = set()
+        self.queries = 0
+
+    def get(self, student_id: int) -> Optional[StudentProfile]:
+        """One profile, or None if it does not exist"""
+        profiles = self.get_many([student_id])
+        return profiles[0] if profiles else None
+
+    def get_many(self, student_ids: Iterable[int]) -> List[StudentProfile]:
+        """
+        Profiles for the given ids, loading only those not seen yet in this request
+
+        Returns:
+            Existing profiles ordered by id, without duplicates
+        """
+        wanted = set(student_ids)
+        unknown = self._unknown(wanted)
+        if unknown and self._loader is None:
+            raise RuntimeError(f"Profiles {unknown} were not loaded with aget_many first")
+        for batch in self._batches(unknown):
+            self._store(batch, self._loader(batch))
+
+        return [self._profiles[student_id] for student_id in sorted(wanted) if student_id in self._profiles]
+
+    async def aget(self, student_id: int) -> Optional[StudentProfile]:
+        """Async variant of get"""
+        profiles = await self.aget_many([student_id])
+        return profiles[0] if profiles else None
+
+    async def aget_many(self, student_ids: Iterable[int]) -> List[StudentProfile]:
+        """
+        Async variant of get_many, loading unseen profiles with the async loader
+
+        Once loaded, the same profiles are served by the synchronous get_many, so
+        code running in a worker thread can use the cache without the database.
+        """
+        wanted = set(student_ids)
+        for batch in self._batches(self._unknown(wanted)):
+            self._store(batch, await self._async_loader(batch))
+        return self.get_many(wanted)
+
+    def _unknown(self, wanted: Set[int]) -> List[int]:
+        return sorted(wanted - self._profiles.keys() - self._missing)
+
+    def _batches(self, student_ids: List[int]):
+        for start in range(0, len(student_ids), self.batch_size):
+            yield student_ids[start:start + self.batch_size]
+
+    def _store(self, batch: List[int], rows: Iterable) -> None:
+        """Parse one loaded batch and remember the ids it did not return"""
+        self.queries += 1
+        for row in rows:
+            self.add(StudentProfile.from_db_profile(row))
+        self._missing.update(student_id for student_id in batch if student_id not in self._profiles)
+
+    def add(self, profile: StudentProfile) -> None:
+        """Store an already parsed profile"""
+        self._profiles[profile.id] = profile
+        self._missing.discard(profile.id)
+
+    def __contains__(self, student_id: int) -> bool:
+        return student_id in self._profiles
+
+    def __len__(self) -> int:
+        return len(self._profiles)
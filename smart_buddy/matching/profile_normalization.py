@@ -0,0 +1,237 @@
+"""
+Write-time normalization of the matching fields of a profile
+Profiles are canonicalized once when they are saved, so matching loads read plain columns
+instead of guessing at JSON strings and raw values on every read
+"""
+from typing import Dict, List
+from itertools import product
+import json
+from sqlalchemy import bindparam, event, or_, select, update
+from sqlalchemy.orm import Session
+
+
+# Stored in profiles.profile_format_version once the matching fields are canonical:
+#   personality_traits   personality type as a plain string
+#   academic_focus_areas list of non-empty strings
+#   availability         dict of day -> list of time slot strings
+# Bump when the canonical form changes; older rows fall back to the parsing read path.
+PROFILE_FORMAT_VERSION = 1
+
+# Day and time slot pairs with a bit in profiles.availability_mask. Slots outside the grid
+# get no bit. Changing it means clearing profiles.personality_key so the backfill
+# recomputes every mask.
+AVAILABILITY_DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+AVAILABILITY_SLOTS = ("Morning", "Afternoon", "Evening")
+AVAILABILITY_BITS = {pair: bit for bit, pair in enumerate(product(AVAILABILITY_DAYS, AVAILABILITY_SLOTS))}
+
+
+class ProfileFormatError(ValueError):
+    """Raised when submitted profile fields cannot be canonicalized"""
+
+
+def _parse_json_string(value):
+    """Decoded JSON for strings that hold it, anything else unchanged"""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+def canonical_personality_type(personality_traits) -> str:
+    """Personality type from a raw string, a JSON string or a {"type": ...} object"""
+    personality = personality_traits
+    if isinstance(personality, str):
+        parsed = _parse_json_string(personality)
+        if parsed is not personality:
+            personality = parsed['type'] if isinstance(parsed, dict) and 'type' in parsed else parsed
+    elif isinstance(personality, dict) and 'type' in personality:
+        personality = personality['type']
+    return str(personality)
+
+
+def canonical_focus_areas(academic_focus_areas) -> List[str]:
+    """Focus areas as a list of strings, read the way the matching engine always has"""
+    areas = academic_focus_areas
+    if isinstance(areas, str):
+        parsed = _parse_json_string(areas)
+        if parsed is areas:
+            areas = [areas] if areas.strip() else []
+        else:
+            areas = parsed if isinstance(parsed, list) else [str(parsed)]
+    elif areas is None:
+        areas = []
+    elif not isinstance(areas, list):
+        areas = [str(areas)]
+    return [str(area) for area in areas if area]
+
+
+def canonical_availability(availability, strict: bool = False) -> Dict[str, List[str]]:
+    """
+    Availability as a dict of day -> time slots
+
+    Args:
+        availability: Raw column or form value
+        strict: Raise ProfileFormatError for values that are not a day -> slots mapping
+            instead of reading them as no availability
+    """
+    availability = _parse_json_string(availability) if availability else {}
+    if not isinstance(availability, dict):
+        if strict:
+            raise ProfileFormatError("availability must map days to lists of time slots")
+        return {}
+
+    canonical = {}
+    for day, time_slots in availability.items():
+        if isinstance(time_slots, str):
+            time_slots = [time_slots]
+        elif not isinstance(time_slots, list):
+            if strict:
+                raise ProfileFormatError(f"availability for {day} must be a list of time slots")
+            continue
+        # Duplicates are kept; the engine counts them when weighing availability
+        canonical[str(day)] = [str(slot) for slot in time_slots]
+    return canonical
+
+
+def form_availability(values: List[str]) -> Dict[str, List[str]]:
+    """
+    Availability submitted as a list of form values, as a dict of day -> time slots
+
+    Each value is either "Day Slot" (e.g. "Monday Morning") or a JSON day -> slots
+    object; slots of the same day are collected in submission order.
+
+    Raises:
+        ProfileFormatError: A value is neither
+    """
+    availability: Dict[str, List[str]] = {}
+    for value in values:
+        parsed = _parse_json_string(value)
+        if isinstance(parsed, dict):
+            for day, time_slots in canonical_availability(parsed, strict=True).items():
+                availability.setdefault(day, []).extend(time_slots)
+            continue
+        parts = str(value).split(None, 1)
+        if len(parts) != 2:
+            raise ProfileFormatError(f"availability entry {value!r} must be a day and a time slot")
+        availability.setdefault(parts[0], []).append(parts[1].strip())
+    return availability
+
+
+def match_key(value) -> str:
+    """Categorical value the way the compatibility engine compares it"""
+    return value.upper() if hasattr(value, 'upper') else str(value).upper()
+
+
+def availability_mask(availability: Dict[str, List[str]]) -> int:
+    """Bits of the grid slots in a canonical availability dict"""
+    mask = 0
+    for day, time_slots in availability.items():
+        for slot in time_slots:
+            bit = AVAILABILITY_BITS.get((day, slot))
+            if bit is not None:
+                mask |= 1 << bit
+    return mask
+
+
+def match_key_fields(personality_type: str, study_style, preferred_environment,
+                     availability: Dict[str, List[str]]) -> Dict:
+    """Indexed columns the SQL candidate prefilter reads, from canonical matching fields"""
+    return {
+        "personality_key": match_key(personality_type),
+        "study_style_key": match_key(study_style),
+        "environment_key": match_key(preferred_environment),
+        "availability_mask": availability_mask(availability)
+    }
+
+
+def normalize_profile_fields(personality_traits, academic_focus_areas, availability,
+                             strict: bool = True) -> Dict:
+    """
+    Canonical matching fields for a profile write
+
+    Args:
+        personality_traits: Raw personality value
+        academic_focus_areas: Raw focus areas value
+        availability: Raw availability value
+        strict: Reject malformed values instead of reading them leniently
+
+    Returns:
+        Column values to store, including profile_format_version
+    """
+    personality_type = canonical_personality_type(personality_traits)
+    if strict and (personality_traits is None or not personality_type.strip()):
+        raise ProfileFormatError("personality_traits must name a personality type")
+    return {
+        "personality_traits": personality_type,
+        "academic_focus_areas": canonical_focus_areas(academic_focus_areas),
+        "availability": canonical_availability(availability, strict=strict),
+        "profile_format_version": PROFILE_FORMAT_VERSION
+    }
+
+
+def normalize_profile(profile, strict: bool = False) -> None:
+    """Canonicalize the matching fields of a profile object in place, with their match keys"""
+    fields = normalize_profile_fields(profile.personality_traits, profile.academic_focus_areas,
+                                      profile.availability, strict=strict)
+    fields.update(match_key_fields(fields["personality_traits"], profile.study_style,
+                                   profile.preferred_environment, fields["availability"]))
+    for name, value in fields.items():
+        if getattr(profile, name) != value:
+            setattr(profile, name, value)
+
+
+def register_profile_normalization(profile_model) -> None:
+    """Canonicalize every profile inserted or updated through the ORM before it is written"""
+
+    def _normalize(mapper, connection, target):
+        normalize_profile(target)
+
+    event.listen(profile_model, "before_insert", _normalize)
+    event.listen(profile_model, "before_update", _normalize)
+
+
+def backfill_profile_format(db: Session, profiles, batch_size: int = 500) -> Dict[str, int]:
+    """
+    Normalize stored profiles written before write-time normalization
+
+    Rows are read leniently, exactly as matching has always read them, and rewritten
+    in id order one committed batch at a time, so an interrupted run can simply be
+    started again. Rows normalized before the match key columns existed get them too.
+
+    Args:
+        db: Database session
+        profiles: The profiles Table
+        batch_size: Profiles rewritten per commit
+
+    Returns:
+        Number of profiles normalized
+    """
+    columns = profiles.c
+    stale = or_(columns.profile_format_version.is_(None), columns.profile_format_version != PROFILE_FORMAT_VERSION,
+                columns.personality_key.is_(None))
+    rewrite = update(profiles).where(columns.id == bindparam("profile_id"))
+    last_id = None
+    normalized = 0
+    while True:
+        query = select(columns.id, columns.personality_traits, columns.academic_focus_areas, columns.availability,
+                       columns.study_style, columns.preferred_environment) \
+            .where(stale).order_by(columns.id).limit(batch_size)
+        if last_id is not None:
+            query = query.where(columns.id > last_id)
+        rows = db.execute(query).all()
+        if not rows:
+            break
+        updates = []
+        for row in rows:
+            fields = normalize_profile_fields(row.personality_traits, row.academic_focus_areas, row.availability,
+                                              strict=False)
+            fields.update(match_key_fields(fields["personality_traits"], row.study_style,
+                                           row.preferred_environment, fields["availability"]))
+            updates.append({"profile_id": row.id, **fields})
+        db.execute(rewrite, updates)
+        db.commit()
+        last_id = rows[-1].id
+        normalized += len(rows)
+    return {"normalized": normalized}
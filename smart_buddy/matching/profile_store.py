@@ -0,0 +1,444 @@
+"""
+Process-wide resident store of the encoded student population
+Loads every profile once, then applies only changed rows: ids committed through the ORM
+in this process are re-read directly, and other writers are picked up by polling updated_at
+"""
+from typing import Deque, Dict, FrozenSet, Iterable, Optional, Set, Tuple
+from collections import deque
+from contextlib import contextmanager
+import asyncio
+import os
+import threading
+import time
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+from smart_buddy.matching.compatibility_engine import StudentProfile
+from smart_buddy.matching.encoded_population import EncodedPopulation
+from smart_buddy.matching.population_partitions import PopulationPartitions, shard_keys
+from smart_buddy.matching.population_snapshot import MappedPopulation, SnapshotError, write_snapshot, \
+    read_generation, snapshot_identity
+
+
+# Refreshes whose changed ids are remembered for changed_since
+CHANGE_HISTORY = 64
+
+try:
+    import fcntl
+except ImportError:  # Windows: snapshot publishing is not serialized between processes
+    fcntl = None
+
+
+class ProfileStore:
+    """Resident EncodedPopulation kept fresh with incremental refreshes"""
+
+    def __init__(self, columns: Iterable, id_column, updated_at_column,
+                 refresh_interval: float = 5.0, chunk_size: int = 1000, snapshot_path: Optional[str] = None,
+                 partitions: Optional[PopulationPartitions] = None):
+        """
+        Args:
+            columns: Profile columns StudentProfile.from_db_profile needs
+            id_column: Primary key column of the profiles table
+            updated_at_column: Column bumped on every profile write
+            refresh_interval: Seconds before polling for changes from other writers
+            chunk_size: Rows per fetch while streaming the full load
+            snapshot_path: Memory-mapped snapshot shared by every worker process. Whichever
+                worker refreshes publishes a new generation that the others remap, so the
+                population is held once per machine instead of once per worker.
+            partitions: Course/department partitions to maintain, e.g. restricted to the
+                shards this process serves (every partition if omitted)
+        """
+        self.columns = tuple(columns)
+        self.id_column = id_column
+        self.updated_at_column = updated_at_column
+        self.refresh_interval = refresh_interval
+        self.chunk_size = chunk_size
+        self.snapshot_path = snapshot_path
+
+        self.population: Optional[EncodedPopulation] = None
+        # Bumped whenever the population changes; callers can detect stale derived data.
+        # With a snapshot this is the snapshot generation, which all workers agree on.
+        self.version = 0
+        self._snapshot_identity = None
+        self._started_at = time.time()
+        self.snapshot_error: Optional[str] = None
+        self.load_stats: Optional[Dict] = None
+        self.last_seen = None
+        self._last_refresh = 0.0
+        self._dirty_ids: Set[int] = set()
+        # (version before, version after, ids added, updated or removed) of recent refreshes
+        self._changes: Deque[Tuple[int, int, FrozenSet[int]]] = deque(maxlen=CHANGE_HISTORY)
+        self._lock = threading.RLock()
+        # Built on first use; refreshes then rebuild only the partitions they touch
+        self.partitions = partitions if partitions is not None else PopulationPartitions()
+
+    @property
+    def loaded(self) -> bool:
+        return self.population is not None
+
+    def load(self, db: Session, from_snapshot: bool = True) -> EncodedPopulation:
+        """
+        Load the population, warm starting from the snapshot when one is configured
+
+        A compatible snapshot is mapped instead of reading the whole table, then caught up
+        with the rows changed since it was written. Without one, the table is streamed in
+        and, when a snapshot path is configured, published as the next generation.
+
+        Args:
+            db: Database session
+            from_snapshot: Set False to rebuild from the database even if a snapshot exists
+        """
+        with self._lock:
+            started = time.perf_counter()
+            caught_up = None
+            snapshot = None
+            if self.snapshot_path is None:
+                self._load(db)
+            else:
+                with self._snapshot_lock():
+                    snapshot = self._open_snapshot() if from_snapshot else None
+                    if snapshot is None:
+                        self._load(db)
+                    else:
+                        self._adopt(snapshot)
+                        self._dirty_ids.clear()
+                        self._last_refresh = time.monotonic()
+                        # Workers started together share what the first one loaded;
+                        # anything older is caught up from updated_at
+                        if snapshot.published_at < self._started_at:
+                            caught_up = self._refresh(db)
+
+            self.load_stats = {
+                "source": "snapshot" if snapshot is not None else "database",
+                "seconds": round(time.perf_counter() - started, 4),
+                "caught_up": caught_up,
+                "snapshot_error": self.snapshot_error
+            }
+            return self.population
+
+    def _load(self, db: Session) -> EncodedPopulation:
+        rows = db.execute(select(*self.columns).execution_options(yield_per=self.chunk_size))
+        population = EncodedPopulation()
+        last_seen = None
+        for row in rows:
+            population.add(StudentProfile.from_db_profile(row))
+            last_seen = self._later(last_seen, getattr(row, self.updated_at_column.key))
+
+        self.last_seen = last_seen
+        self._dirty_ids.clear()
+        self._changes.clear()
+        self._last_refresh = time.monotonic()
+        self._install(population)
+        return self.population
+
+    def _install(self, population: EncodedPopulation) -> None:
+        """Make a changed population current, publishing it when a snapshot is configured"""
+        if self.snapshot_path is None:
+            self.population = population
+            self.version += 1
+            return
+        # Never go back to a generation a long-running worker may still hold
+        current = self.population
+        generation = max(current.generation if isinstance(current, MappedPopulation) else 0,
+                         read_generation(self.snapshot_path) or 0)
+        write_snapshot(population, self.snapshot_path, generation + 1, self.last_seen)
+        self._adopt(MappedPopulation(self.snapshot_path))
+
+    def _adopt(self, snapshot: MappedPopulation) -> None:
+        # Whatever changed since our last generation was applied elsewhere
+        self._changes.clear()
+        self.population = snapshot
+        self.version = snapshot.generation
+        self.last_seen = self._later(self.last_seen, snapshot.last_seen)
+        self._snapshot_identity = snapshot_identity(self.snapshot_path)
+
+    def _open_snapshot(self) -> Optional[MappedPopulation]:
+        """Map the snapshot, or None if there is none or it cannot be used"""
+        self.snapshot_error = None
+        if not os.path.exists(self.snapshot_path):
+            return None
+        try:
+            return MappedPopulation(self.snapshot_path)
+        except SnapshotError as e:
+            # Rebuilt from the database and overwritten by the next publish
+            self.snapshot_error = str(e)
+            return None
+
+    def _sync_snapshot(self) -> None:
+        """Remap the snapshot if another worker published a newer generation"""
+        if snapshot_identity(self.snapshot_path) == self._snapshot_identity:
+            return
+        snapshot = self._open_snapshot()
+        if snapshot is not None and snapshot.generation > self.version:
+            self._adopt(snapshot)
+
+    @contextmanager
+    def _snapshot_lock(self):
+        """Exclusive lock serializing snapshot publishing across worker processes"""
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.snapshot_path)), exist_ok=True)
+        with open(f"{self.snapshot_path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def mark_dirty(self, student_ids: Iterable[int]) -> None:
+        """Force the next read to re-read these profiles"""
+        with self._lock:
+            self._dirty_ids.update(student_ids)
+
+    def refresh(self, db: Session) -> Dict[str, int]:
+        """
+        Apply profile changes since the last load or refresh
+
+        Returns:
+            Counts of profiles updated (or added) and removed
+        """
+        with self._lock:
+            if self.population is None:
+                self.load(db)
+                return {"updated": len(self.population), "removed": 0}
+            if self.snapshot_path is None:
+                return self._refresh(db)
+            with self._snapshot_lock():
+                # Apply changes on top of whatever another worker published last
+                self._sync_snapshot()
+                return self._refresh(db)
+
+    def _refresh(self, db: Session) -> Dict[str, int]:
+        population = self.population
+        changed_rows, removed_ids = self._collect_changes(db, population)
+        if changed_rows or removed_ids:
+            partitions_current = self.partitions.version == self.version
+            changed_keys = set()
+            for student_id in removed_ids | changed_rows.keys():
+                changed_keys |= self.partitions.population_keys(population, student_id)
+            if isinstance(population, MappedPopulation):
+                population = population.thaw()
+            for student_id in removed_ids:
+                population.remove(student_id)
+            for row in changed_rows.values():
+                profile = StudentProfile.from_db_profile(row)
+                changed_keys |= shard_keys(profile.academic_focus_areas)
+                population.add(profile)
+            previous_version = self.version
+            self._install(population)
+            self._changes.append((previous_version, self.version, frozenset(removed_ids | changed_rows.keys())))
+            if partitions_current:
+                self.partitions.rebuild(self.population, self.version, changed_keys)
+        self._last_refresh = time.monotonic()
+        return {"updated": len(changed_rows), "removed": len(removed_ids)}
+
+    def _collect_changes(self, db: Session, population) -> Tuple[Dict[int, object], Set[int]]:
+        """Rows to add or re-encode, keyed by id, and ids to remove"""
+        changed_rows: Dict[int, object] = {}
+        removed_ids: Set[int] = set()
+
+        # Rows written since the newest change already applied. The comparison is
+        # inclusive because updated_at may only have second precision.
+        query = select(*self.columns)
+        if self.last_seen is not None:
+            query = query.where(self.updated_at_column >= self.last_seen)
+        else:
+            query = query.where(self.updated_at_column.isnot(None))
+        # Profiles committed through the ORM in this process are always re-applied,
+        # even if a same-second write left updated_at unchanged
+        dirty_ids = set(self._dirty_ids)
+        self._dirty_ids.clear()
+
+        seen_ids = set()
+        for row in db.execute(query):
+            seen_ids.add(row.id)
+            self._collect(population, changed_rows, row, force=row.id in dirty_ids)
+
+        dirty_ids = sorted(dirty_ids - seen_ids)
+        if dirty_ids:
+            for row in db.execute(select(*self.columns).where(self.id_column.in_(dirty_ids))):
+                self._collect(population, changed_rows, row, force=True)
+            removed_ids.update(student_id for student_id in dirty_ids
+                               if student_id not in changed_rows and student_id in population.index_by_id)
+
+        # Deletes by other writers leave no updated_at behind, so reconcile ids on a count mismatch
+        added = sum(1 for student_id in changed_rows if student_id not in population.index_by_id)
+        expected = len(population) + added - len(removed_ids)
+        if db.execute(select(func.count(self.id_column))).scalar() != expected:
+            stored_ids = set(db.execute(select(self.id_column)).scalars())
+            current_ids = (set(population.index_by_id) | changed_rows.keys()) - removed_ids
+            for student_id in current_ids - stored_ids:
+                changed_rows.pop(student_id, None)
+                if student_id in population.index_by_id:
+                    removed_ids.add(student_id)
+            missing_ids = sorted(stored_ids - current_ids)
+            if missing_ids:
+                for row in db.execute(select(*self.columns).where(self.id_column.in_(missing_ids))):
+                    self._collect(population, changed_rows, row, force=True)
+        return changed_rows, removed_ids
+
+    @contextmanager
+    def read(self, db: Session):
+        """
+        Use the population, refreshing it first if it is due
+
+        The store lock is held while the caller reads, so a concurrent refresh never
+        changes the population mid-scan.
+        """
+        with self._lock:
+            self.ensure_fresh(db)
+            yield self.population
+
+    def ensure_fresh(self, db: Session) -> None:
+        """Load the population, or apply pending and polled changes once they are due"""
+        with self._lock:
+            if self.population is None:
+                self.load(db)
+                return
+            if self.snapshot_path is not None:
+                self._sync_snapshot()
+            if self._refresh_due():
+                self.refresh(db)
+
+    async def ensure_fresh_async(self, db: AsyncSession) -> None:
+        """
+        Async variant of ensure_fresh
+
+        The store lock is taken and the refresh applied in a worker thread, so the event
+        loop never waits behind a ranking that holds the lock; only the queries come
+        back to the loop, where the session awaits them. Nothing is scheduled unless a
+        load or refresh may be due.
+        """
+        if self.population is None or self.snapshot_path is not None or self._refresh_due():
+            await asyncio.to_thread(self.ensure_fresh, _LoopSession(db, asyncio.get_running_loop()))
+
+    @contextmanager
+    def current(self):
+        """
+        Use the population as it is, without touching the database
+
+        For callers that already ran ensure_fresh, e.g. a worker thread that has no session.
+        """
+        with self._lock:
+            if self.population is None:
+                raise RuntimeError("Profile store is not loaded")
+            yield self.population
+
+    def current_partitions(self) -> PopulationPartitions:
+        """
+        Partitions of the population as it is
+
+        They are rebuilt in full only when the population changed in a way this store
+        did not apply itself, such as a snapshot published by another worker.
+        """
+        with self._lock:
+            if self.population is None:
+                raise RuntimeError("Profile store is not loaded")
+            if self.partitions.version != self.version:
+                self.partitions.rebuild(self.population, self.version)
+            return self.partitions
+
+    def changed_since(self, version: int) -> Optional[Set[int]]:
+        """
+        Ids added, updated or removed since the population was at version
+
+        Returns:
+            The ids, or None if the changes are not known, e.g. after a full load or
+            a snapshot published by another worker
+        """
+        with self._lock:
+            changed: Set[int] = set()
+            for version_before, version_after, student_ids in self._changes:
+                if version_before == version:
+                    changed |= student_ids
+                    version = version_after
+            return changed if version == self.version else None
+
+    def _refresh_due(self) -> bool:
+        return bool(self._dirty_ids) or time.monotonic() - self._last_refresh >= self.refresh_interval
+
+    def stats(self) -> Dict:
+        """Size and freshness of the store"""
+        with self._lock:
+            return {
+                "loaded": self.loaded,
+                "profiles": len(self.population) if self.population is not None else 0,
+                "version": self.version,
+                "last_seen_updated_at": str(self.last_seen) if self.last_seen is not None else None,
+                "pending_changes": len(self._dirty_ids),
+                "snapshot_path": self.snapshot_path,
+                "partitions": self.partitions.stats(),
+                "last_load": self.load_stats,
+                "seconds_since_refresh": round(time.monotonic() - self._last_refresh, 3) if self.loaded else None
+            }
+
+    def _collect(self, population, changed_rows: Dict[int, object], row, force: bool = False) -> None:
+        """Keep a row unless it was seen before at the same updated_at and is not forced"""
+        updated_at = getattr(row, self.updated_at_column.key)
+        self.last_seen = self._later(self.last_seen, updated_at)
+
+        index = population.index_by_id.get(row.id)
+        if not force and index is not None and updated_at is not None and \
+                population.versions[index] == updated_at:
+            return
+        changed_rows[row.id] = row
+
+    @staticmethod
+    def _later(current, candidate):
+        """The later of two updated_at values, ignoring missing ones"""
+        if candidate is None:
+            return current
+        if current is None or candidate > current:
+            return candidate
+        return current
+
+
+class _LoopSession:
+    """
+    The execute() of an AsyncSession, callable from a worker thread
+
+    Each statement runs on the event loop that owns the session; its rows are
+    buffered there and handed back as a regular Result.
+    """
+
+    def __init__(self, db: AsyncSession, loop: asyncio.AbstractEventLoop):
+        self._db = db
+        self._loop = loop
+
+    def execute(self, statement):
+        frozen = asyncio.run_coroutine_threadsafe(self._db.run_sync(_execute_frozen, statement), self._loop)
+        return frozen.result()()
+
+
+def _execute_frozen(session: Session, statement):
+    return session.execute(statement).freeze()
+
+
+def register_profile_store_events(profile_model, store: ProfileStore) -> None:
+    """
+    Mark profiles written through the ORM dirty once their transaction commits
+
+    Ids are collected per session at flush time and handed to the store only after
+    commit, so rolled back writes never trigger a re-read.
+    """
+    # Keyed per store so several stores can track the same sessions independently
+    info_key = ("profile_store_changes", id(store))
+
+    def _collect(mapper, connection, target):
+        session = object_session(target)
+        if session is not None and target.id is not None:
+            session.info.setdefault(info_key, set()).add(target.id)
+
+    def _after_commit(session):
+        changes = session.info.pop(info_key, None)
+        if changes:
+            store.mark_dirty(changes)
+
+    def _after_rollback(session, previous_transaction):
+        session.info.pop(info_key, None)
+
+    for event_name in ("after_insert", "after_update", "after_delete"):
+        event.listen(profile_model, event_name, _collect)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_soft_rollback", _after_rollback)
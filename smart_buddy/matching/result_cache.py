@@ -0,0 +1,155 @@
+"""
+Content-addressed cache for group scheduling results
+Keys are a canonical hash of the scheduling inputs; entries are evicted LRU under entry and
+size limits and dropped as soon as any member profile is updated or deleted
+"""
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from collections import OrderedDict
+import copy
+import hashlib
+import json
+import threading
+from sqlalchemy import event
+
+
+def schedule_cache_key(profile_versions: Iterable[Tuple[int, object]],
+                       weights: Dict[str, float],
+                       constraints: Dict[str, float],
+                       optimize: bool) -> str:
+    """
+    Canonical hash of everything a group schedule depends on
+
+    Args:
+        profile_versions: (student_id, updated_at) for every member, in any order
+        weights: Compatibility weights by name
+        constraints: Scheduling constraint values by name
+        optimize: Whether the schedule is optimized after solving
+
+    Returns:
+        Hex SHA-256 digest; equal inputs always give equal keys
+    """
+    canonical = {
+        "profiles": [[student_id, str(version)] for student_id, version in sorted(profile_versions)],
+        "weights": {name: float(value) for name, value in sorted(weights.items())},
+        "constraints": {name: float(value) for name, value in sorted(constraints.items())},
+        "optimize": bool(optimize)
+    }
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ScheduleResultCache:
+    """Thread-safe LRU cache of schedule results with per-student invalidation"""
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 16 * 1024 * 1024):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum number of cached schedules
+            max_bytes: Maximum total size of cached schedules, measured as JSON
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Dict, List[int], int]]" = OrderedDict()
+        self._keys_by_student: Dict[int, Set[str]] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return a copy of the cached result for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[0])
+
+    def put(self, key: str, student_ids: Iterable[int], result: Dict) -> None:
+        """Store a result; results larger than max_bytes are not cached"""
+        size = len(json.dumps(result, default=str))
+        if size > self.max_bytes:
+            return
+
+        members = sorted(set(student_ids))
+        with self._lock:
+            if key in self._entries:
+                self._discard(key)
+            self._entries[key] = (copy.deepcopy(result), members, size)
+            self._total_bytes += size
+            for student_id in members:
+                self._keys_by_student.setdefault(student_id, set()).add(key)
+
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_student(self, student_id: int) -> int:
+        """Drop every cached result that includes the student; returns the count dropped"""
+        with self._lock:
+            keys = self._keys_by_student.pop(student_id, set())
+            for key in keys:
+                self._discard(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self) -> None:
+        """Drop all cached results"""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_student.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict:
+        """Current size and hit/miss counters"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _discard(self, key: str) -> None:
+        """Remove an entry and its reverse-index references (lock must be held)"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        _, members, size = entry
+        self._total_bytes -= size
+        for student_id in members:
+            keys = self._keys_by_student.get(student_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_student[student_id]
+
+
+def register_profile_invalidation(profile_model, cache: ScheduleResultCache) -> None:
+    """
+    Invalidate cached results whenever a profile row is updated or deleted through the ORM
+
+    Profile versions are also part of every key, so writes that bypass the ORM but still
+    bump updated_at never return a stale schedule; they leave an unreachable entry to age out.
+    """
+    def _invalidate(mapper, connection, target):
+        if target.id is not None:
+            cache.invalidate_student(target.id)
+
+    event.listen(profile_model, "after_update", _invalidate)
+    event.listen(profile_model, "after_delete", _invalidate)
+
+
+# Process-wide cache shared by every matcher the API creates
+schedule_result_cache = ScheduleResultCache()
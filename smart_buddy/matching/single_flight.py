@@ -0,0 +1,62 @@
+"""
+Request coalescing for identical matching requests
+Concurrent callers with the same key share one in-flight computation instead of each
+repeating it; the result is fanned out to every waiter
+"""
+from typing import Awaitable, Callable, Dict, Hashable
+import asyncio
+
+
+class SingleFlight:
+    """At most one in-flight call per key; later callers await the same result"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, function: Callable[[], Awaitable]):
+        """
+        Await function(), or the call already in flight for key
+
+        The call runs as its own task, so a waiter that is cancelled (e.g. a closed
+        tab) does not cancel it for the others. Every waiter receives the same result
+        object, or the same exception.
+
+        Args:
+            key: Identity of the request; callers with equal keys share one call
+            function: Zero-argument coroutine function computing the result
+
+        Returns:
+            The shared result, which callers must not modify
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(function())
+            self._calls[key] = task
+            task.add_done_callback(lambda finished: self._finished(key, finished))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task) -> None:
+        # Requests arriving from now on compute a fresh result
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here in case every waiter went away
+
+    def stats(self) -> Dict:
+        """Calls in flight and how many requests shared another's result"""
+        total = self.leaders + self.coalesced
+        return {
+            "in_flight": len(self._calls),
+            "computed": self.leaders,
+            "coalesced": self.coalesced,
+            "coalescing_rate": round(self.coalesced / total, 4) if total else 0.0
+        }
+
+
+# Coalesces concurrent find-matches requests with identical parameters
+find_matches_flights = SingleFlight()
@@ -2,17 +2,105 @@
 API router for study buddy matching functionality
 Provides endpoints for finding matches and scheduling study sessions
 """
-from typing import Optional, List
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional, List, Dict, Iterator, Tuple, Union
+from contextlib import asynccontextmanager
+from datetime import date
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool, iterate_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from smart_buddy.db import get_db
-from smart_buddy.matching.matching_service import StudyBuddyMatcher
+from smart_buddy.db import SessionLocal, USE_ASYNC_DB, get_async_sessionmaker
+from smart_buddy.matching.matching_service import StudyBuddyMatcher, profile_store, MUTUAL_MATCH_K
 from smart_buddy.matching.csp_solver import SchedulingConstraints
+from smart_buddy.matching.result_cache import ScheduleResultCache, schedule_result_cache
+from smart_buddy.matching.metrics import metrics
+from smart_buddy.matching.compute_pool import compute_pool, ComputePoolError, ComputePoolBusy, ComputePoolTimeout
+from smart_buddy.matching.single_flight import find_matches_flights
+from smart_buddy.matching.matcher_registry import matcher_registry, matcher_key
+from smart_buddy.matching.diversity import DIVERSITY_POOL_SIZE
+from smart_buddy.matching.match_cursor import InvalidCursorError, StaleCursorError
+from smart_buddy.matching.matrix_format import parse_fields, columnar_json, columnar_binary
 from pydantic import BaseModel
 
 
 router = APIRouter(prefix="/matching", tags=["matching"])
 
+# Students one find-matches-batch request may ask for
+MAX_BATCH_STUDENTS = 1000
+
+# Largest global sample a partitioned search may add
+MAX_GLOBAL_SAMPLE = 1000
+
+# Most candidates a diversity re-ranking may consider
+MAX_DIVERSITY_POOL = 500
+
+
+@router.on_event("startup")
+def load_profile_store():
+    """Load the resident profile population before the first matching request"""
+    db = SessionLocal()
+    try:
+        profile_store.load(db)
+    finally:
+        db.close()
+
+
+@router.on_event("startup")
+def warm_default_matchers():
+    """Build the default-weight matchers before the first matching request"""
+    create_matcher()
+    create_matcher(result_cache=schedule_result_cache)
+
+
+@asynccontextmanager
+async def matching_session():
+    """
+    Database session for matching work
+    
+    An AsyncSession when USE_ASYNC_DB is set, otherwise a regular Session.
+    """
+    if USE_ASYNC_DB:
+        async with get_async_sessionmaker()() as db_session:
+            yield db_session
+    else:
+        db_session = SessionLocal()
+        try:
+            yield db_session
+        finally:
+            db_session.close()
+
+
+async def get_matching_db():
+    """Database session dependency for the matching endpoints"""
+    async with matching_session() as db_session:
+        yield db_session
+
+
+async def run_matcher(db: Union[Session, AsyncSession], sync_method, async_method, **kwargs) -> Dict:
+    """
+    Run a matcher call without blocking the event loop
+    
+    With an AsyncSession the async variant awaits its queries and the compute pool;
+    with a regular Session the whole call runs in the threadpool, which waits on the
+    compute pool for the CPU-heavy parts.
+    
+    Raises:
+        HTTPException: 503 when the compute pool is at capacity, 504 when a task times out
+    """
+    try:
+        if isinstance(db, AsyncSession):
+            return await async_method(db=db, **kwargs)
+        return await run_in_threadpool(sync_method, db=db, **kwargs)
+    except ComputePoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except ComputePoolTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ComputePoolError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
 
 class MatchingRequest(BaseModel):
     """Request model for finding matches"""
@@ -20,6 +108,10 @@ class MatchingRequest(BaseModel):
     min_score: float = 50.0
     max_results: int = 10
     include_scheduling: bool = True
+    partitioned: bool = False
+    global_sample: int = 0
+    diversity: float = 0.0
+    diversity_pool: int = DIVERSITY_POOL_SIZE
 
 
 class MatchingWeights(BaseModel):
@@ -30,11 +122,52 @@ class MatchingWeights(BaseModel):
     availability_weight: float = 0.25
 
 
+class BatchMatchingRequest(BaseModel):
+    """Request model for finding matches for many students at once"""
+    student_ids: List[int]
+    min_score: float = 50.0
+    max_results: int = 10
+    include_scheduling: bool = False
+    weights: Optional[MatchingWeights] = None
+    partitioned: bool = False
+    global_sample: int = 0
+
+
 class GroupSchedulingRequest(BaseModel):
     """Request model for group scheduling"""
     student_ids: List[int]
     optimize: bool = True
     weights: Optional[MatchingWeights] = None
+    use_availability_intervals: bool = False
+    week_start: Optional[date] = None
+    use_cache: bool = True
+    include_trace: bool = False
+
+
+class GroupFormationRequest(BaseModel):
+    """Request model for partitioning a cohort into study groups"""
+    student_ids: Optional[List[int]] = None
+    group_size: int = 4
+    candidate_pool_size: int = 24
+    weights: Optional[MatchingWeights] = None
+
+
+class ScheduledSession(BaseModel):
+    """A session in an existing schedule"""
+    partner1_id: int
+    partner2_id: int
+    day: str
+    time: str
+    duration_hours: float = 2.0
+
+
+class ScheduleRepairRequest(BaseModel):
+    """Request model for repairing a schedule after an availability change"""
+    student_id: int
+    availability: Dict[str, List[str]]
+    sessions: List[ScheduledSession]
+    neighborhood_size: int = 5
+    weights: Optional[MatchingWeights] = None
 
 
 class ConstraintsRequest(BaseModel):
@@ -42,16 +175,36 @@ class ConstraintsRequest(BaseModel):
     max_sessions_per_day: int = 2
     max_sessions_per_week: int = 6
     max_partners_per_student: int = 3
+    min_break_between_sessions: float = 1.0
+    preferred_session_length: float = 2.0
 
 
 def create_matcher(weights: Optional[MatchingWeights] = None, 
-                  constraints: Optional[ConstraintsRequest] = None) -> StudyBuddyMatcher:
-    """Create a StudyBuddyMatcher with optional custom weights and constraints"""
+                  constraints: Optional[ConstraintsRequest] = None,
+                  result_cache: Optional[ScheduleResultCache] = None) -> StudyBuddyMatcher:
+    """
+    StudyBuddyMatcher for optional custom weights and constraints
     
+    Matchers are long-lived and shared through the matcher registry, so their ranking
+    caches carry over between requests with equivalent weights and constraints.
+    """
     # Use default weights if not provided
     if weights is None:
         weights = MatchingWeights()
     
+    key = matcher_key(
+        (weights.personality_weight, weights.study_preferences_weight,
+         weights.academic_goals_weight, weights.availability_weight),
+        constraints.dict() if constraints else None,
+        cached_schedules=result_cache is not None
+    )
+    return matcher_registry.get(key, lambda: build_matcher(weights, constraints, result_cache))
+
+
+def build_matcher(weights: MatchingWeights,
+                  constraints: Optional[ConstraintsRequest] = None,
+                  result_cache: Optional[ScheduleResultCache] = None) -> StudyBuddyMatcher:
+    """Build a new StudyBuddyMatcher with the given weights and constraints"""
     # Create custom constraints if provided
     scheduling_constraints = None
     if constraints:
@@ -59,13 +212,66 @@ def create_matcher(weights: Optional[MatchingWeights] = None,
         scheduling_constraints.max_sessions_per_day = constraints.max_sessions_per_day
         scheduling_constraints.max_sessions_per_week = constraints.max_sessions_per_week
         scheduling_constraints.max_partners_per_student = constraints.max_partners_per_student
+        scheduling_constraints.min_break_between_sessions = constraints.min_break_between_sessions
+        scheduling_constraints.preferred_session_length = constraints.preferred_session_length
     
     return StudyBuddyMatcher(
         personality_weight=weights.personality_weight,
         study_preferences_weight=weights.study_preferences_weight,
         academic_goals_weight=weights.academic_goals_weight,
         availability_weight=weights.availability_weight,
-        constraints=scheduling_constraints
+        constraints=scheduling_constraints,
+        result_cache=result_cache,
+        profile_store=profile_store,
+        compute_pool=compute_pool
+    )
+
+
+async def coalesced_find_matches(student_id: int, min_score: float, max_results: int, include_scheduling: bool,
+                                 weights: Optional[MatchingWeights] = None,
+                                 constraints: Optional[ConstraintsRequest] = None,
+                                 partitioned: bool = False, global_sample: int = 0,
+                                 diversity: float = 0.0, diversity_pool: int = DIVERSITY_POOL_SIZE) -> Dict:
+    """
+    Find matches, sharing the computation with concurrent identical requests
+    
+    The shared computation opens its own database session, so it is unaffected by
+    whichever of the waiting requests goes away first.
+    """
+    key = find_matches_key(student_id, min_score, max_results, include_scheduling, weights, constraints,
+                           partitioned, global_sample, diversity, diversity_pool)
+    
+    async def compute():
+        matcher = create_matcher(weights=weights, constraints=constraints)
+        async with matching_session() as db:
+            return await run_matcher(
+                db, matcher.find_matches_for_student, matcher.find_matches_for_student_async,
+                student_id=student_id,
+                min_score=min_score,
+                max_results=max_results,
+                include_scheduling=include_scheduling,
+                partitioned=partitioned,
+                global_sample=global_sample,
+                diversity=diversity,
+                diversity_pool=diversity_pool
+            )
+    
+    return await find_matches_flights.do(key, compute)
+
+
+def find_matches_key(student_id: int, min_score: float, max_results: int, include_scheduling: bool,
+                     weights: Optional[MatchingWeights] = None,
+                     constraints: Optional[ConstraintsRequest] = None,
+                     partitioned: bool = False, global_sample: int = 0,
+                     diversity: float = 0.0, diversity_pool: int = DIVERSITY_POOL_SIZE) -> Tuple:
+    """Identity of a find-matches request; omitted weights equal the defaults"""
+    weights = weights or MatchingWeights()
+    return (
+        student_id, float(min_score), max_results, include_scheduling,
+        tuple(sorted(weights.dict().items())),
+        tuple(sorted(constraints.dict().items())) if constraints else None,
+        global_sample if partitioned else None,
+        (float(diversity), diversity_pool) if diversity > 0 else None
     )
 
 
@@ -75,29 +281,42 @@ async def find_matches(
     min_score: float = Query(50.0, ge=0.0, le=100.0, description="Minimum compatibility score"),
     max_results: int = Query(10, ge=1, le=50, description="Maximum number of results"),
     include_scheduling: bool = Query(True, description="Include scheduling analysis"),
-    db: Session = Depends(get_db)
+    partitioned: bool = Query(False, description="Only search students sharing a course or department"),
+    global_sample: int = Query(0, ge=0, le=MAX_GLOBAL_SAMPLE,
+                               description="Students from across the population added to a partitioned search"),
+    diversity: float = Query(0.0, ge=0.0, le=1.0, description="Weight of partner variety when re-ranking"),
+    diversity_pool: int = Query(DIVERSITY_POOL_SIZE, ge=1, le=MAX_DIVERSITY_POOL,
+                                description="Top candidates re-ranked for diversity")
 ):
     """
     Find compatible study partners for a student
     
+    Concurrent identical requests share one computation.
+    
     Args:
         student_id: ID of the student looking for matches
         min_score: Minimum compatibility score (0-100)
         max_results: Maximum number of matches to return
         include_scheduling: Whether to include scheduling feasibility analysis
-        db: Database session
+        partitioned: Only score partners in the student's course or department partitions
+        global_sample: Size of the population-wide sample scored alongside the partitions
+        diversity: 0 keeps the plain ranking; higher values trade score for partners unlike
+            those already listed (maximal marginal relevance)
+        diversity_pool: How many of the best candidates the diversity re-ranking picks from
         
     Returns:
         List of compatible partners with scores and optional scheduling info
     """
     try:
-        matcher = create_matcher()
-        results = matcher.find_matches_for_student(
+        results = await coalesced_find_matches(
             student_id=student_id,
-            db=db,
             min_score=min_score,
             max_results=max_results,
-            include_scheduling=include_scheduling
+            include_scheduling=include_scheduling,
+            partitioned=partitioned,
+            global_sample=global_sample,
+            diversity=diversity,
+            diversity_pool=diversity_pool
         )
         
         if "error" in results:
@@ -105,47 +324,233 @@ async def find_matches(
         
         return results
     
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error finding matches: {str(e)}")
+
+
+@router.post("/find-matches-batch")
+async def find_matches_batch(
+    request: BatchMatchingRequest,
+    stream: bool = Query(False, description="Stream one NDJSON record per student as results are ready"),
+    db: Union[Session, AsyncSession] = Depends(get_matching_db)
+):
+    """
+    Find matches for many students in one request
+    
+    The population is loaded and encoded once and the students are ranked against it
+    in blocks, in parallel on the compute pool workers when it is running. Each result
+    has the shape of GET /find-matches/{student_id}; unknown students get an "error"
+    result instead of failing the batch. With stream=true the response is NDJSON: one
+    record per student, in request order, then a "summary" record.
+    
+    Args:
+        request: Students and the matching parameters they share
+        stream: Stream per-student results as their block finishes
+        db: Database session
+        
+    Returns:
+        Results for every requested student
+    """
+    try:
+        if not request.student_ids:
+            raise HTTPException(status_code=400, detail="At least 1 student required")
+        if len(request.student_ids) > MAX_BATCH_STUDENTS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_STUDENTS} students per batch")
+        if not 1 <= request.max_results <= 50 or not 0.0 <= request.min_score <= 100.0:
+            raise HTTPException(status_code=400, detail="max_results must be 1-50 and min_score 0-100")
+        if not 0 <= request.global_sample <= MAX_GLOBAL_SAMPLE:
+            raise HTTPException(status_code=400, detail=f"global_sample must be 0-{MAX_GLOBAL_SAMPLE}")
+        
+        matcher = create_matcher(weights=request.weights)
+        weights_used = request.weights.dict() if request.weights else MatchingWeights().dict()
+        params = {
+            "student_ids": request.student_ids,
+            "min_score": request.min_score,
+            "max_results": request.max_results,
+            "include_scheduling": request.include_scheduling,
+            "partitioned": request.partitioned,
+            "global_sample": request.global_sample
+        }
+        if stream:
+            return StreamingResponse(batch_ndjson_lines(matcher, params, weights_used),
+                                     media_type="application/x-ndjson")
+        
+        results = await run_matcher(db, matcher.find_matches_batch, matcher.find_matches_batch_async, **params)
+        if "error" in results:
+            raise HTTPException(status_code=400, detail=results["error"])
+        results["weights_used"] = weights_used
+        return results
+    
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error finding matches: {str(e)}")
 
 
+async def batch_ndjson_lines(matcher: StudyBuddyMatcher, params: Dict, weights_used: Dict):
+    """
+    NDJSON lines of a streamed find-matches batch
+    
+    The stream reads through its own database session, which stays open until the
+    last student is sent. A failure mid-stream ends it with an "error" record.
+    """
+    students_requested = students_found = 0
+    try:
+        async with matching_session() as db:
+            if isinstance(db, AsyncSession):
+                results = matcher.aiter_find_matches_batch(db=db, **params)
+            else:
+                results = iterate_in_threadpool(matcher.iter_find_matches_batch(db=db, **params))
+            async for result in results:
+                students_requested += 1
+                students_found += "error" not in result
+                yield json.dumps({"type": "result", **result}) + "\n"
+        yield json.dumps({"type": "summary", "students_requested": students_requested,
+                          "students_found": students_found, "weights_used": weights_used}) + "\n"
+    except Exception as e:
+        yield json.dumps({"type": "error", "detail": f"Error finding matches: {str(e)}"}) + "\n"
+
+
+@router.get("/find-matches/{student_id}/page")
+async def find_matches_page(
+    student_id: int,
+    page_size: int = Query(20, ge=1, le=50, description="Matches per page"),
+    min_score: float = Query(50.0, ge=0.0, le=100.0, description="Minimum compatibility score"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    db: Union[Session, AsyncSession] = Depends(get_matching_db)
+):
+    """
+    Page through all of a student's matches, beyond the top 50
+    
+    Matches are ordered by score, then partner id. Pass each page's next_cursor to get
+    the following page; it is null on the last page.
+    
+    Args:
+        student_id: ID of the student looking for matches
+        page_size: Matches per page
+        min_score: Minimum compatibility score (0-100)
+        cursor: Opaque cursor from the previous page (first page if omitted)
+        db: Database session
+        
+    Returns:
+        A page of matches with scores and the cursor of the next page
+    """
+    try:
+        matcher = create_matcher()
+        results = await run_matcher(
+            db, matcher.find_matches_page, matcher.find_matches_page_async,
+            student_id=student_id,
+            page_size=page_size,
+            min_score=min_score,
+            cursor=cursor
+        )
+        
+        if "error" in results:
+            raise HTTPException(status_code=404, detail=results["error"])
+        
+        return results
+    
+    except StaleCursorError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error finding matches: {str(e)}")
+
+
+@router.get("/mutual-matches/{student_id}")
+async def mutual_matches(
+    student_id: int,
+    min_score: float = Query(50.0, ge=0.0, le=100.0, description="Minimum compatibility score, both ways"),
+    max_results: int = Query(10, ge=1, le=MUTUAL_MATCH_K, description="Maximum number of results"),
+    db: Union[Session, AsyncSession] = Depends(get_matching_db)
+):
+    """
+    Find partners who rank the student in their top matches as well
+    
+    Answered from an index of every student's top MUTUAL_MATCH_K partners and the
+    reverse lists of who ranks whom, rebuilt when the population changes.
+    
+    Args:
+        student_id: ID of the student looking for mutual matches
+        min_score: Minimum compatibility score (0-100) in both directions
+        max_results: Maximum number of mutual matches to return
+        db: Database session
+        
+    Returns:
+        Mutual matches with each side's score and rank
+    """
+    try:
+        matcher = create_matcher()
+        results = await run_matcher(
+            db, matcher.find_mutual_matches, matcher.find_mutual_matches_async,
+            student_id=student_id,
+            min_score=min_score,
+            max_results=max_results
+        )
+        
+        if "error" in results:
+            raise HTTPException(status_code=404, detail=results["error"])
+        
+        return results
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error finding mutual matches: {str(e)}")
+
+
 @router.post("/find-matches-custom")
 async def find_matches_custom(
     request: MatchingRequest,
     weights: Optional[MatchingWeights] = None,
-    constraints: Optional[ConstraintsRequest] = None,
-    db: Session = Depends(get_db)
+    constraints: Optional[ConstraintsRequest] = None
 ):
     """
     Find matches with custom weights and constraints
     
+    Concurrent identical requests share one computation.
+    
     Args:
         request: Matching request parameters
         weights: Custom weights for compatibility scoring
         constraints: Custom scheduling constraints
-        db: Database session
         
     Returns:
         Compatibility results with custom scoring
     """
     try:
-        matcher = create_matcher(weights=weights, constraints=constraints)
-        results = matcher.find_matches_for_student(
+        if not 0.0 <= request.diversity <= 1.0 or not 1 <= request.diversity_pool <= MAX_DIVERSITY_POOL:
+            raise HTTPException(status_code=400,
+                                detail=f"diversity must be 0-1 and diversity_pool 1-{MAX_DIVERSITY_POOL}")
+        
+        results = await coalesced_find_matches(
             student_id=request.student_id,
-            db=db,
             min_score=request.min_score,
             max_results=request.max_results,
-            include_scheduling=request.include_scheduling
+            include_scheduling=request.include_scheduling,
+            weights=weights,
+            constraints=constraints,
+            partitioned=request.partitioned,
+            global_sample=request.global_sample,
+            diversity=request.diversity,
+            diversity_pool=request.diversity_pool
         )
         
         if "error" in results:
             raise HTTPException(status_code=404, detail=results["error"])
         
-        # Include the weights used in the response
-        results["weights_used"] = weights.dict() if weights else MatchingWeights().dict()
+        # Include the weights used in the response (results are shared with coalesced requests)
+        results = {**results, "weights_used": weights.dict() if weights else MatchingWeights().dict()}
         
         return results
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error finding matches: {str(e)}")
 
@@ -154,7 +559,7 @@ async def find_matches_custom(
 async def schedule_group(
     request: GroupSchedulingRequest,
     constraints: Optional[ConstraintsRequest] = None,
-    db: Session = Depends(get_db)
+    db: Union[Session, AsyncSession] = Depends(get_matching_db)
 ):
     """
     Create an optimal study schedule for a group of students
@@ -171,11 +576,105 @@ async def schedule_group(
         if len(request.student_ids) < 2:
             raise HTTPException(status_code=400, detail="At least 2 students required for group scheduling")
         
+        matcher = create_matcher(
+            weights=request.weights,
+            constraints=constraints,
+            result_cache=schedule_result_cache if request.use_cache else None
+        )
+        if request.use_availability_intervals:
+            results = await run_matcher(
+                db, matcher.create_interval_schedule, matcher.create_interval_schedule_async,
+                student_ids=request.student_ids,
+                week_start=request.week_start
+            )
+        else:
+            results = await run_matcher(
+                db, matcher.create_study_group_schedule, matcher.create_study_group_schedule_async,
+                student_ids=request.student_ids,
+                optimize=request.optimize,
+                include_trace=request.include_trace
+            )
+        
+        if "error" in results:
+            raise HTTPException(status_code=400, detail=results["error"])
+        
+        return results
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating group schedule: {str(e)}")
+
+
+@router.post("/repair-schedule")
+async def repair_schedule(
+    request: ScheduleRepairRequest,
+    constraints: Optional[ConstraintsRequest] = None,
+    db: Union[Session, AsyncSession] = Depends(get_matching_db)
+):
+    """
+    Repair an existing schedule after one student's availability changes
+    
+    Only sessions that became infeasible are re-placed (plus a bounded number of
+    neighbouring sessions), so the rest of the group keeps its schedule.
+    
+    Args:
+        request: Existing sessions and the student's new availability
+        constraints: Custom scheduling constraints
+        db: Database session
+        
+    Returns:
+        Repaired schedule with a report of what changed
+    """
+    try:
+        if request.neighborhood_size < 0:
+            raise HTTPException(status_code=400, detail="neighborhood_size cannot be negative")
+        
         matcher = create_matcher(weights=request.weights, constraints=constraints)
-        results = matcher.create_study_group_schedule(
+        results = await run_matcher(
+            db, matcher.repair_group_schedule, matcher.repair_group_schedule_async,
+            sessions=[session.dict() for session in request.sessions],
+            student_id=request.student_id,
+            new_availability=request.availability,
+            neighborhood_size=request.neighborhood_size
+        )
+        
+        if "error" in results:
+            raise HTTPException(status_code=404, detail=results["error"])
+        
+        return results
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error repairing schedule: {str(e)}")
+
+
+@router.post("/form-groups")
+async def form_groups(
+    request: GroupFormationRequest,
+    db: Union[Session, AsyncSession] = Depends(get_matching_db)
+):
+    """
+    Partition a cohort of students into study groups
+    
+    Args:
+        request: Group formation request (omit student_ids to use every student)
+        db: Database session
+        
+    Returns:
+        Formed groups with average compatibility and common availability
+    """
+    try:
+        if request.group_size < 2:
+            raise HTTPException(status_code=400, detail="group_size must be at least 2")
+        
+        matcher = create_matcher(weights=request.weights)
+        results = await run_matcher(
+            db, matcher.form_study_groups, matcher.form_study_groups_async,
             student_ids=request.student_ids,
-            db=db,
-            optimize=request.optimize
+            group_size=request.group_size,
+            candidate_pool_size=request.candidate_pool_size
         )
         
         if "error" in results:
@@ -183,22 +682,42 @@ async def schedule_group(
         
         return results
     
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error creating group schedule: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error forming study groups: {str(e)}")
 
 
 @router.post("/compatibility-matrix")
 async def get_compatibility_matrix(
+    http_request: Request,
     student_ids: List[int],
     weights: Optional[MatchingWeights] = None,
-    db: Session = Depends(get_db)
+    stream: bool = Query(False, description="Stream rows as NDJSON while they are computed"),
+    include_details: bool = Query(False, description="Include per-pair score breakdowns when streaming"),
+    matrix_format: str = Query("json", alias="format", description="json (nested) or columnar (base64 arrays)"),
+    fields: Optional[str] = Query(None, description="Comma-separated subset of scores,components,summary"),
+    db: Union[Session, AsyncSession] = Depends(get_matching_db)
 ):
     """
     Generate a compatibility matrix for a group of students
     
+    With stream=true the response is NDJSON: a "students" record, one "row" record per
+    student as it is scored, then a "summary" record with the statistics and weights.
+    Nothing waits for the whole N x N matrix, so large groups start arriving at once.
+    
+    With format=columnar the matrix is one id array plus a base64 float32 array per
+    score, and an Accept: application/octet-stream header gets the same arrays as a
+    binary payload (see matrix_format.columnar_binary). fields picks what is computed:
+    leaving out "components" skips the per-pair breakdowns (detailed_scores) entirely.
+    
     Args:
         student_ids: List of student IDs to analyze
         weights: Custom weights for compatibility scoring
+        stream: Stream the matrix row by row
+        include_details: Add detailed scores to streamed rows (always included otherwise)
+        matrix_format: Response layout when not streaming
+        fields: Parts of the matrix to compute and return (all by default)
         db: Database session
         
     Returns:
@@ -208,23 +727,78 @@ async def get_compatibility_matrix(
         if len(student_ids) < 2:
             raise HTTPException(status_code=400, detail="At least 2 students required for compatibility matrix")
         
+        if matrix_format not in ("json", "columnar"):
+            raise HTTPException(status_code=400, detail="format must be 'json' or 'columnar'")
+        try:
+            selected_fields = parse_fields(fields)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
         matcher = create_matcher(weights=weights)
-        results = matcher.get_compatibility_matrix(student_ids=student_ids, db=db)
+        weights_used = weights.dict() if weights else MatchingWeights().dict()
+        binary = "application/octet-stream" in http_request.headers.get("accept", "")
+        if binary or matrix_format == "columnar":
+            columns = await run_matcher(
+                db, matcher.get_compatibility_matrix_columns, matcher.get_compatibility_matrix_columns_async,
+                student_ids=student_ids, fields=selected_fields
+            )
+            if "error" in columns:
+                raise HTTPException(status_code=400, detail=columns["error"])
+            columns["weights_used"] = weights_used
+            if binary:
+                return Response(content=columnar_binary(columns), media_type="application/octet-stream")
+            return columnar_json(columns)
+        
+        if stream:
+            student_profiles = await run_matcher(
+                db, matcher.load_group_profiles, matcher.load_group_profiles_async,
+                student_ids=student_ids
+            )
+            if len(student_profiles) < 2:
+                raise HTTPException(status_code=400, detail="At least 2 students required for compatibility analysis")
+            return StreamingResponse(
+                ndjson_lines(matcher.iter_compatibility_matrix(student_profiles, include_details),
+                             {"weights_used": weights_used}),
+                media_type="application/x-ndjson"
+            )
+        
+        results = await run_matcher(
+            db, matcher.get_compatibility_matrix, matcher.get_compatibility_matrix_async,
+            student_ids=student_ids, fields=selected_fields
+        )
         
         if "error" in results:
             raise HTTPException(status_code=400, detail=results["error"])
         
         # Include the weights used in the response
-        results["weights_used"] = weights.dict() if weights else MatchingWeights().dict()
+        results["weights_used"] = weights_used
         
         return results
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating compatibility matrix: {str(e)}")
 
 
+def ndjson_lines(records: Iterator[Dict], summary_fields: Dict) -> Iterator[str]:
+    """
+    Serialize streamed records as NDJSON lines
+    
+    summary_fields are added to the final summary record. The status code is sent
+    before the first row, so a failure mid-stream ends it with an "error" record.
+    """
+    try:
+        for record in records:
+            if record["type"] == "summary":
+                record = {**record, **summary_fields}
+            yield json.dumps(record) + "\n"
+    except Exception as e:
+        yield json.dumps({"type": "error", "detail": f"Error generating compatibility matrix: {str(e)}"}) + "\n"
+
+
 @router.get("/test-matching-system")
-async def test_matching_system(db: Session = Depends(get_db)):
+async def test_matching_system(db: Union[Session, AsyncSession] = Depends(get_matching_db)):
     """
     Test endpoint to verify the matching system works with current database
     
@@ -234,23 +808,26 @@ async def test_matching_system(db: Session = Depends(get_db)):
     try:
         from smart_buddy.models.sqlalchemy_models import Profile
         
-        # Get all profiles
-        profiles = db.query(Profile).all()
+        # Count the profiles and pick the first one, off the event loop
+        query = select(func.count(Profile.id), func.min(Profile.id))
+        if isinstance(db, AsyncSession):
+            profile_count, test_student_id = (await db.execute(query)).one()
+        else:
+            profile_count, test_student_id = (await run_in_threadpool(db.execute, query)).one()
         
-        if len(profiles) < 2:
+        if profile_count < 2:
             return {
                 "status": "insufficient_data",
                 "message": "Need at least 2 profiles to test matching",
-                "profile_count": len(profiles)
+                "profile_count": profile_count
             }
         
         # Test basic matching with first student
-        test_student_id = profiles[0].id
         matcher = create_matcher()
         
-        test_results = matcher.find_matches_for_student(
+        test_results = await run_matcher(
+            db, matcher.find_matches_for_student, matcher.find_matches_for_student_async,
             student_id=test_student_id,
-            db=db,
             min_score=0.0,  # Include all matches for testing
             max_results=5,
             include_scheduling=True
@@ -259,7 +836,7 @@ async def test_matching_system(db: Session = Depends(get_db)):
         return {
             "status": "success",
             "message": "Matching system is working correctly",
-            "profile_count": len(profiles),
+            "profile_count": profile_count,
             "test_student_id": test_student_id,
             "test_results": test_results
         }
@@ -272,6 +849,28 @@ async def test_matching_system(db: Session = Depends(get_db)):
         }
 
 
+@router.get("/metrics")
+async def get_matching_metrics():
+    """
+    Get solver and cache metrics collected by this process
+    
+    Returns:
+        Counters (pairs considered, skips, constraint rejections by rule, cache
+        hits), per-phase timing summaries of CSP solver runs, profile store freshness,
+        compute pool load, how many find-matches requests were coalesced and the
+        reuse of long-lived matchers
+    """
+    return {
+        **metrics.snapshot(),
+        "schedule_cache": schedule_result_cache.stats(),
+        # stats() takes the store lock, which a ranking may hold
+        "profile_store": await run_in_threadpool(profile_store.stats),
+        "compute_pool": compute_pool.stats(),
+        "find_matches_coalescing": find_matches_flights.stats(),
+        "matcher_registry": matcher_registry.stats()
+    }
+
+
 @router.get("/matching-weights-info")
 async def get_matching_weights_info():
     """
@@ -318,7 +917,9 @@ async def get_matching_weights_info():
             "csp_constraints": {
                 "max_sessions_per_day": 2,
                 "max_sessions_per_week": 6,
-                "max_partners_per_student": 3
+                "max_partners_per_student": 3,
+                "min_break_between_sessions_hours": 1,
+                "preferred_session_length_hours": 2
             }
         },
         "customization": {
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Request, Form
 from fastapi.responses import HTMLResponse
-from smart_buddy.sqlalchemy_models import Profile
+from smart_buddy.models.sqlalchemy_models import Profile
 from fastapi.templating import Jinja2Templates
 from smart_buddy.db import SessionLocal
+from smart_buddy.matching.profile_normalization import normalize_profile, form_availability, \
+    ProfileFormatError
 
 
 router = APIRouter()
@@ -32,7 +34,7 @@ async def create_profile(
     password: str = Form(...),
     availability: list[str] = Form(default=[])
 ):
-    db = SessionLocal()
+    # Canonicalize the matching fields and their match keys once here so matching never has to parse them
     try:
         profile = Profile(
             email=email,
@@ -40,10 +42,16 @@ async def create_profile(
             study_style=study_style,
             preferred_environment=preferred_environment,
             personality_traits=personality_traits,
-            academic_focus_areas=academic_focus_areas,
+            academic_focus_areas=[area.strip() for area in academic_focus_areas.split(",")],  # Comma separated on the form
             password=password,
-            availability=availability  # Must be declared as JSON in model
+            availability=form_availability(availability)  # "Day Slot" or JSON entries on the form
         )
+        normalize_profile(profile, strict=True)
+    except ProfileFormatError as e:
+        return HTMLResponse(content="Invalid profile: " + str(e), status_code=400)
+
+    db = SessionLocal()
+    try:
         db.add(profile)
         db.commit()
         return templates.TemplateResponse("success.html", {"request": request, "username": username})
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, JSON, DateTime
+from sqlalchemy import Column, BigInteger, Integer, String, Text, JSON, DateTime
 from smart_buddy.db import Base
 from datetime import datetime  # Needed for DateTime formatting
 
@@ -14,6 +14,12 @@ class Profile(Base):
     academic_focus_areas = Column(JSON)
     password = Column(String(100), nullable=False)
     availability = Column(JSON)
+    profile_format_version = Column(Integer)  # Set once matching fields are normalized on write
+    # Match keys derived on write; the SQL candidate prefilter reads them
+    personality_key = Column(String(100), index=True)
+    study_style_key = Column(String(100), index=True)
+    environment_key = Column(String(100), index=True)
+    availability_mask = Column(BigInteger)
 
 class Session(Base):
     __tablename__ = 'sessions'
@@ -0,0 +1,120 @@
+"""
+Unit tests for the weekly batch scheduling job
+Tests chunked runs, resuming from the checkpoint and reruns after a crash mid-chunk
+"""
+from datetime import date
+import random
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from smart_buddy.models.sqlalchemy_models import Profile, Session as StudySessionRecord, Base
+from smart_buddy.matching.batch_scheduler import WeeklyBatchScheduler, BatchCheckpoint
+from smart_buddy.matching.encoded_population import EncodedPopulation
+
+WEEK_START = date(2026, 10, 26)
+
+
+def make_db(student_count=24):
+    """Session over an in-memory database with varied profiles"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    rng = random.Random(4)
+    for i in range(student_count):
+        db.add(Profile(
+            email=f"student{i}@example.com",
+            username=f"student{i}",
+            study_style=rng.choice(["Group", "Individual", "Mixed"]),
+            preferred_environment=rng.choice(["Quiet", "Collaborative"]),
+            personality_traits={"type": rng.choice(["Introvert", "Extrovert", "Ambivert"])},
+            academic_focus_areas=rng.sample(["CS", "Math", "Physics"], 2),
+            password="testpassword",
+            availability={day: rng.sample(["Morning", "Afternoon", "Evening"], 2)
+                          for day in ("Monday", "Wednesday", "Friday")}
+        ))
+    db.commit()
+    return db
+
+
+def stored_sessions(db):
+    """(student1, student2, datetime) of every stored session"""
+    return sorted(db.query(StudySessionRecord.student1, StudySessionRecord.student2,
+                           StudySessionRecord.datetime).all())
+
+
+@pytest.fixture
+def db():
+    session = make_db()
+    yield session
+    session.close()
+
+
+class TestWeeklyBatchScheduler:
+    """Test the chunked, resumable weekly job"""
+
+    def test_chunks_are_checkpointed(self, db, tmp_path):
+        """Every chunk is committed and recorded; the summary counts the stored sessions"""
+        checkpoint_path = str(tmp_path / "checkpoint.json")
+        summary = WeeklyBatchScheduler(chunk_size=5, checkpoint_path=checkpoint_path).run(db, WEEK_START)
+
+        assert summary["chunks_this_run"] == summary["chunks_completed"] == 5
+        assert summary["completed"] and not summary["resumed"]
+        assert summary["sessions_written"] == len(stored_sessions(db)) > 0
+        assert summary["last_student_id"] == max(profile.id for profile in db.query(Profile))
+        checkpoint = BatchCheckpoint.load(checkpoint_path, WEEK_START)
+        assert checkpoint.completed and checkpoint.chunks_completed == 5
+
+    def test_chunk_pairs_are_engine_top_matches(self, db):
+        """Encoded ranking picks exactly the pairs the compatibility engine ranks first"""
+        scheduler = WeeklyBatchScheduler(matches_per_student=3)
+        population = scheduler.matcher.get_student_profiles(db)
+        encoded = EncodedPopulation()
+        for profile in population:
+            encoded.add(profile)
+
+        expected = []
+        for student in population[:8]:
+            for match in scheduler.matcher.compatibility_engine.find_matches(student, population, 50.0, 3):
+                if frozenset((student.id, match.partner_id)) not in \
+                        {frozenset(pair[:2]) for pair in expected}:
+                    expected.append((student.id, match.partner_id, match.total_score))
+        assert scheduler._chunk_pairs(population[:8], encoded, set()) == expected
+
+    def test_rerun_after_crash_before_checkpoint(self, db, tmp_path, mocker):
+        """A chunk committed but not checkpointed is redone without duplicate or uncounted sessions"""
+        checkpoint_path = str(tmp_path / "checkpoint.json")
+        save = BatchCheckpoint.save
+        calls = []
+
+        def crash_on_second_chunk(checkpoint, path):
+            calls.append(checkpoint.chunks_completed)
+            if len(calls) == 2:
+                raise OSError("disk full")
+            save(checkpoint, path)
+
+        mocker.patch.object(BatchCheckpoint, "save", crash_on_second_chunk)
+        with pytest.raises(OSError):
+            WeeklyBatchScheduler(chunk_size=5, checkpoint_path=checkpoint_path).run(db, WEEK_START)
+        mocker.stopall()
+        assert BatchCheckpoint.load(checkpoint_path, WEEK_START).chunks_completed == 1
+
+        summary = WeeklyBatchScheduler(chunk_size=5, checkpoint_path=checkpoint_path).run(db, WEEK_START)
+        sessions = stored_sessions(db)
+        assert summary["resumed"] and summary["chunks_this_run"] == 4
+        assert summary["sessions_written"] == len(sessions)
+        assert len({frozenset(session[:2]) for session in sessions}) == len(sessions)
+
+        uninterrupted = make_db()
+        WeeklyBatchScheduler(chunk_size=5, checkpoint_path=str(tmp_path / "other.json")).run(uninterrupted, WEEK_START)
+        assert stored_sessions(uninterrupted) == sessions
+        uninterrupted.close()
+
+    def test_completed_week_not_rescheduled(self, db, tmp_path):
+        """Running a finished week again writes nothing"""
+        checkpoint_path = str(tmp_path / "checkpoint.json")
+        WeeklyBatchScheduler(chunk_size=10, checkpoint_path=checkpoint_path).run(db, WEEK_START)
+        sessions = stored_sessions(db)
+
+        summary = WeeklyBatchScheduler(chunk_size=10, checkpoint_path=checkpoint_path).run(db, WEEK_START)
+        assert summary["chunks_this_run"] == 0
+        assert stored_sessions(db) == sessions
@@ -0,0 +1,112 @@
+"""
+Unit tests for the SQL candidate prefilter
+Tests that every profile able to reach min_score survives the filter and that others are dropped
+"""
+import random
+import pytest
+from sqlalchemy import create_engine, select, Column, BigInteger, DateTime, Integer, String, JSON
+from sqlalchemy.orm import declarative_base, sessionmaker
+from smart_buddy.matching.candidate_prefilter import viable_partner_filter
+from smart_buddy.matching.compatibility_engine import CompatibilityEngine, StudentProfile
+from smart_buddy.matching.profile_normalization import register_profile_normalization
+from smart_buddy.tests.test_encoded_population import random_student
+
+
+Base = declarative_base()
+
+
+class Profile(Base):
+    """Matching and match key columns of the profiles table"""
+    __tablename__ = "profiles"
+    id = Column(Integer, primary_key=True)
+    username = Column(String(100))
+    email = Column(String(255))
+    personality_traits = Column(JSON)
+    study_style = Column(String(100))
+    preferred_environment = Column(String(100))
+    academic_focus_areas = Column(JSON)
+    availability = Column(JSON)
+    updated_at = Column(DateTime)
+    profile_format_version = Column(Integer)
+    personality_key = Column(String(100), index=True)
+    study_style_key = Column(String(100), index=True)
+    environment_key = Column(String(100), index=True)
+    availability_mask = Column(BigInteger)
+
+
+register_profile_normalization(Profile)
+
+
+@pytest.fixture(scope="module")
+def db():
+    """Session over a varied population saved through the ORM"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    rng = random.Random(5)
+    for student_id in range(1, 301):
+        student = random_student(rng, student_id)
+        session.add(Profile(id=student.id, username=student.username, email=student.email,
+                            personality_traits=student.personality_type, study_style=student.study_style,
+                            preferred_environment=student.preferred_environment,
+                            academic_focus_areas=student.academic_focus_areas, availability=student.availability))
+    session.commit()
+    yield session
+    session.close()
+
+
+def load_students(db, condition=None):
+    """Stored profiles, optionally restricted by a WHERE condition"""
+    query = select(Profile.__table__)
+    if condition is not None:
+        query = query.where(condition)
+    return [StudentProfile.from_db_profile(row) for row in db.execute(query)]
+
+
+class TestCandidatePrefilter:
+    """Test score upper bounds as SQL conditions"""
+
+    @pytest.mark.parametrize("weights", [(0.25, 0.25, 0.25, 0.25), (0.1, 0.1, 0.1, 0.7), (0.5, 0.3, 0.2, 0.0)])
+    @pytest.mark.parametrize("min_score", [40.0, 60.0, 75.0])
+    def test_keeps_every_viable_partner(self, db, weights, min_score):
+        """No profile that reaches min_score is filtered out"""
+        engine = CompatibilityEngine(*weights)
+        everyone = load_students(db)
+
+        for student in everyone[:10]:
+            condition = viable_partner_filter(engine, student, min_score, Profile.__table__)
+            kept = {profile.id for profile in load_students(db, condition)}
+            viable = {partner.id for partner in everyone if partner.id != student.id and
+                      engine.compute_compatibility_score(student, partner).total_score >= min_score}
+            assert viable <= kept
+
+    def test_drops_profiles_below_bound(self, db):
+        """With availability weighted heavily, partners without a shared slot are never loaded"""
+        engine = CompatibilityEngine(0.1, 0.1, 0.1, 0.7)
+        student = next(profile for profile in load_students(db) if profile.availability)
+
+        condition = viable_partner_filter(engine, student, 60.0, Profile.__table__)
+        kept = load_students(db, condition)
+
+        assert condition is not None
+        assert len(kept) < len(load_students(db))
+        for partner in kept:
+            _, shared_slots = engine.compute_availability_compatibility(student, partner)
+            assert shared_slots or partner.id == student.id
+
+    def test_nothing_ruled_out(self, db):
+        """A threshold every pair can reach needs no condition"""
+        student = load_students(db)[0]
+
+        assert viable_partner_filter(CompatibilityEngine(), student, 10.0, Profile.__table__) is None
+
+    def test_off_grid_slots_keep_availability_open(self, db):
+        """Slots the mask cannot represent never rule a partner out on availability"""
+        engine = CompatibilityEngine(0.1, 0.1, 0.1, 0.7)
+        student = StudentProfile(id=0, username="night", email="n@example.com", personality_type="Introvert",
+                                 study_style="Group", preferred_environment="Quiet", academic_focus_areas=["CS"],
+                                 availability={"Monday": ["Night"]})
+
+        condition = viable_partner_filter(engine, student, 60.0, Profile.__table__)
+
+        assert condition is None
@@ -0,0 +1,110 @@
+"""
+Unit tests for the matching compute pool
+Tests that work runs in worker processes, that queue depth and timeouts are enforced,
+and that a pool whose worker died is replaced once
+"""
+import asyncio
+import os
+import time
+import pytest
+from smart_buddy.matching.compute_pool import ComputePool, ComputePoolBusy, ComputePoolError, ComputePoolTimeout
+
+
+def worker_pid(delay: float = 0.0) -> int:
+    """Process id of whoever runs the task, after an optional delay"""
+    time.sleep(delay)
+    return os.getpid()
+
+
+def fail(message: str):
+    raise ValueError(message)
+
+
+def crash():
+    """Kill the worker process running the task"""
+    os._exit(1)
+
+
+@pytest.fixture
+def pool():
+    """Started pool with a single worker"""
+    pool = ComputePool(max_workers=1, max_pending=1, task_timeout=10.0)
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+
+class TestComputePool:
+    """Test the bounded process pool"""
+
+    @pytest.mark.asyncio
+    async def test_runs_in_worker_process(self, pool):
+        """Awaited and blocking calls both run outside this process"""
+        assert await pool.run(worker_pid) != os.getpid()
+        assert pool.call(worker_pid) != os.getpid()
+        assert pool.stats()["completed"] == 2
+
+    def test_errors_propagate(self, pool):
+        """Exceptions raised by the task reach the caller"""
+        with pytest.raises(ValueError, match="bad input"):
+            pool.call(fail, "bad input")
+        assert pool.stats()["failed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_rejects_beyond_max_pending(self, pool):
+        """A full queue refuses new work instead of growing"""
+        pool.call(worker_pid)  # let the worker start
+        slow = asyncio.create_task(pool.run(worker_pid, 0.5))
+        await asyncio.sleep(0)
+
+        with pytest.raises(ComputePoolBusy):
+            await pool.run(worker_pid)
+
+        await slow
+        assert pool.stats()["rejected"] == 1
+        assert await pool.run(worker_pid) != os.getpid()
+
+    def test_timeout_keeps_slot_until_finished(self, pool):
+        """A timed out task still counts as pending while the worker is busy with it"""
+        pool.call(worker_pid)
+        with pytest.raises(ComputePoolTimeout):
+            pool.call(worker_pid, 0.5, timeout=0.05)
+
+        assert pool.stats()["pending"] == 1
+        time.sleep(0.8)
+        assert pool.stats()["pending"] == 0
+        assert pool.stats()["timed_out"] == 1
+
+    def test_broken_executor_replaced_once(self, pool):
+        """A second report of the same dead executor leaves its replacement running"""
+        failed = pool._executor
+        pool._broken(failed)
+        replacement = pool._executor
+
+        assert replacement is not failed
+        pool._broken(failed)
+        assert pool._executor is replacement
+        assert pool.call(worker_pid) != os.getpid()
+
+    @pytest.mark.asyncio
+    async def test_recovers_when_tasks_fail_together(self):
+        """Tasks lost with the same dead worker all fail, and the pool keeps serving"""
+        pool = ComputePool(max_workers=1, max_pending=3, task_timeout=10.0)
+        pool.start()
+        try:
+            results = await asyncio.gather(pool.run(crash), pool.run(worker_pid, 0.2), return_exceptions=True)
+
+            assert all(isinstance(result, ComputePoolError) for result in results)
+            assert await pool.run(worker_pid) != os.getpid()
+        finally:
+            pool.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_without_pool_runs_locally(self):
+        """A pool that was never started runs work in this process"""
+        pool = ComputePool(max_workers=0)
+        pool.start()
+
+        assert not pool.running
+        assert pool.call(worker_pid) == os.getpid()
+        assert await pool.run(worker_pid) == os.getpid()
@@ -0,0 +1,313 @@
+"""
+Unit tests for the CSP scheduling solver
+Tests pair overlap caching, incremental constraint state, schedule construction, repair
+and solver traces
+"""
+import random
+import pytest
+from smart_buddy.matching.csp_solver import (
+    CSPSolver, SchedulingConstraints, ScheduleSlot, StudySession, PairOverlapCache, ConstraintState,
+    SolverTrace
+)
+from smart_buddy.matching.metrics import MetricsRegistry, record_solver_trace
+
+
+@pytest.fixture
+def solver():
+    """Create a CSP solver with default constraints"""
+    return CSPSolver(SchedulingConstraints())
+
+
+@pytest.fixture
+def availabilities():
+    """Availability for a small group of students"""
+    return {
+        1: {"Monday": ["Morning", "Evening"], "Tuesday": ["Afternoon"]},
+        2: {"Monday": ["Evening"], "Tuesday": ["Afternoon"]},
+        3: {"Monday": ["Morning"], "Wednesday": ["Evening"]},
+        4: {"Friday": ["Morning"]}
+    }
+
+
+class TestPairOverlapCache:
+    """Test the per-run pair overlap cache"""
+
+    def test_pair_order_does_not_matter(self):
+        """(a, b) and (b, a) share a cache entry"""
+        cache = PairOverlapCache()
+        cache.put(1, 2, [ScheduleSlot("Monday", "Morning")])
+
+        assert cache.get(2, 1) == frozenset({ScheduleSlot("Monday", "Morning")})
+        assert cache.hits == 1
+
+    def test_version_change_misses(self):
+        """A new availability version must not reuse the old overlap"""
+        cache = PairOverlapCache({1: "v1", 2: "v1"})
+        cache.put(1, 2, [ScheduleSlot("Monday", "Morning")])
+
+        cache.student_versions[2] = "v2"
+        assert cache.get(1, 2) is None
+        assert cache.misses == 1
+
+    def test_seed_from_engine_overlap(self):
+        """Engine (day, time_slot) tuples seed ScheduleSlot entries"""
+        cache = PairOverlapCache()
+        cache.seed(3, 1, [("Monday", "Morning")])
+
+        assert cache.get(1, 3) == frozenset({ScheduleSlot("Monday", "Morning")})
+
+    def test_each_pair_computed_once_per_run(self, solver, availabilities, mocker):
+        """solve_schedule and optimize_schedule share one computation per pair"""
+        spy = mocker.spy(solver, "find_common_availability")
+        cache = PairOverlapCache()
+        pairs = [(1, 2, 90.0), (1, 3, 80.0), (2, 3, 70.0)]
+
+        schedule = solver.solve_schedule(availabilities, pairs, overlap_cache=cache)
+        solver.optimize_schedule(schedule, availabilities, overlap_cache=cache)
+
+        assert spy.call_count == 3
+        assert cache.hits == len(schedule)
+
+    def test_seeded_pairs_skip_computation(self, solver, availabilities, mocker):
+        """Seeded overlaps are used without recomputing availability"""
+        spy = mocker.spy(solver, "find_common_availability")
+        cache = PairOverlapCache()
+        cache.seed(1, 2, [("Tuesday", "Afternoon"), ("Monday", "Evening")])
+
+        schedule = solver.solve_schedule(availabilities, [(1, 2, 90.0)], overlap_cache=cache)
+
+        assert spy.call_count == 0
+        assert schedule[0].schedule_slot == ScheduleSlot("Monday", "Evening")
+
+
+class TestSolveSchedule:
+    """Test schedule construction"""
+
+    def test_pairs_without_overlap_skipped(self, solver, availabilities):
+        """Pairs with no common availability get no session"""
+        schedule = solver.solve_schedule(availabilities, [(1, 4, 95.0), (1, 2, 60.0)])
+
+        assert [(s.partner1_id, s.partner2_id) for s in schedule] == [(1, 2)]
+
+    def test_preferred_slot_chosen(self, solver, availabilities):
+        """Earlier days and times are preferred"""
+        schedule = solver.solve_schedule(availabilities, [(1, 2, 90.0)])
+
+        assert schedule[0].schedule_slot == ScheduleSlot("Monday", "Evening")
+
+    def test_schedule_is_valid(self, solver, availabilities):
+        """The produced schedule satisfies every constraint"""
+        pairs = [(1, 2, 90.0), (1, 3, 80.0), (2, 3, 70.0)]
+        schedule = solver.solve_schedule(availabilities, pairs)
+
+        is_valid, violations = solver.validate_full_schedule(schedule)
+        assert is_valid, violations
+
+    def test_daily_limit_enforced(self, availabilities):
+        """No student exceeds the daily session limit"""
+        constraints = SchedulingConstraints()
+        constraints.max_sessions_per_day = 1
+        schedule = CSPSolver(constraints).solve_schedule(
+            {1: {"Monday": ["Morning", "Evening"]}, 2: {"Monday": ["Morning"]}, 3: {"Monday": ["Evening"]}},
+            [(1, 2, 90.0), (1, 3, 80.0)]
+        )
+
+        assert len(schedule) == 1
+        assert isinstance(schedule[0], StudySession)
+
+
+class TestConstraintState:
+    """Test the incremental constraint state"""
+
+    def test_matches_validate_session(self):
+        """Incremental checks agree with the full-scan validator"""
+        constraints = SchedulingConstraints()
+        rng = random.Random(7)
+        days = ["Monday", "Tuesday", "Wednesday"]
+        existing = []
+        state = ConstraintState(constraints)
+
+        for _ in range(300):
+            a, b = rng.sample(range(1, 7), 2)
+            session = StudySession(a, b, ScheduleSlot(rng.choice(days), "Morning"))
+            expected = constraints.validate_session(session, existing)
+            assert state.can_schedule(session) == expected
+            if expected:
+                existing.append(session)
+                state.add(session)
+            elif existing and rng.random() < 0.3:
+                removed = existing.pop(rng.randrange(len(existing)))
+                state.remove(removed)
+
+    def test_check_reports_rule(self):
+        """The violated rule is named"""
+        constraints = SchedulingConstraints()
+        constraints.max_sessions_per_day = 1
+        state = ConstraintState(constraints, [StudySession(1, 2, ScheduleSlot("Monday", "Morning"))])
+
+        assert state.check(StudySession(1, 3, ScheduleSlot("Monday", "Evening"))) == "daily"
+        assert state.check(StudySession(1, 3, ScheduleSlot("Tuesday", "Evening"))) is None
+
+
+class TestRepairSchedule:
+    """Test incremental schedule repair"""
+
+    @pytest.fixture
+    def group(self):
+        """Four students who are all free Monday to Wednesday"""
+        week = {"Monday": ["Morning", "Evening"], "Tuesday": ["Morning"], "Wednesday": ["Morning"]}
+        return {student_id: dict(week) for student_id in range(1, 5)}
+
+    def test_unaffected_sessions_kept(self, solver, group):
+        """Sessions that still fit are not reshuffled"""
+        pairs = [(1, 2, 90.0), (3, 4, 85.0), (1, 3, 80.0)]
+        schedule = solver.solve_schedule(group, pairs)
+
+        repaired, report = solver.repair_schedule(
+            schedule, 4, {"Monday": ["Morning"], "Tuesday": ["Morning"]}, group, pairs
+        )
+
+        assert repaired == schedule
+        assert report["sessions_unassigned"] == 0
+
+    def test_infeasible_session_replaced(self, solver, group):
+        """A session outside the new availability moves to a feasible slot"""
+        pairs = [(1, 2, 90.0), (3, 4, 85.0)]
+        schedule = solver.solve_schedule(group, pairs)
+        assert schedule[1].schedule_slot == ScheduleSlot("Monday", "Morning")
+
+        repaired, report = solver.repair_schedule(schedule, 4, {"Wednesday": ["Morning"]}, group, pairs)
+
+        assert repaired[0] == schedule[0]
+        assert repaired[1].schedule_slot == ScheduleSlot("Wednesday", "Morning")
+        assert report["sessions_unassigned"] == 1
+        assert report["sessions_replaced"] == 1
+        is_valid, violations = solver.validate_full_schedule(repaired)
+        assert is_valid, violations
+
+    def test_session_dropped_without_common_time(self, solver, group):
+        """Sessions with no remaining common availability are dropped and reported"""
+        pairs = [(1, 2, 90.0), (3, 4, 85.0)]
+        schedule = solver.solve_schedule(group, pairs)
+
+        repaired, report = solver.repair_schedule(schedule, 4, {"Sunday": ["Evening"]}, group, pairs)
+
+        assert repaired == schedule[:1]
+        assert len(report["sessions_dropped"]) == 1
+
+    def test_neighbor_moved_to_make_room(self, group):
+        """A blocking session of a partner is moved within the neighborhood budget"""
+        constraints = SchedulingConstraints()
+        constraints.max_sessions_per_day = 1
+        solver = CSPSolver(constraints)
+        availabilities = dict(group)
+        availabilities[3] = {"Monday": ["Morning"], "Tuesday": ["Morning"]}
+        schedule = [
+            StudySession(1, 2, ScheduleSlot("Monday", "Morning")),
+            StudySession(1, 3, ScheduleSlot("Tuesday", "Morning"))
+        ]
+
+        # Student 3 can now only meet on Monday, where student 1 is already booked
+        repaired, report = solver.repair_schedule(schedule, 3, {"Monday": ["Morning"]}, availabilities,
+                                                  neighborhood_size=1)
+
+        assert report["sessions_moved"] == 1
+        assert StudySession(1, 3, ScheduleSlot("Monday", "Morning")) in repaired
+        assert any(s.partner2_id == 2 and s.schedule_slot.day != "Monday" for s in repaired)
+        is_valid, violations = solver.validate_full_schedule(repaired)
+        assert is_valid, violations
+
+    def test_no_neighborhood_means_drop(self, group):
+        """Without a neighborhood budget, blocked sessions are dropped"""
+        constraints = SchedulingConstraints()
+        constraints.max_sessions_per_day = 1
+        solver = CSPSolver(constraints)
+        schedule = [
+            StudySession(1, 2, ScheduleSlot("Monday", "Morning")),
+            StudySession(1, 3, ScheduleSlot("Tuesday", "Morning"))
+        ]
+
+        repaired, report = solver.repair_schedule(schedule, 3, {"Monday": ["Morning"]}, group,
+                                                  neighborhood_size=0)
+
+        assert repaired == schedule[:1]
+        assert report["sessions_moved"] == 0
+
+    def test_newly_feasible_pair_added(self, solver, group):
+        """A pair that had no common time gets a session once availability opens up"""
+        availabilities = dict(group)
+        availabilities[4] = {"Sunday": ["Evening"]}
+        pairs = [(1, 2, 90.0), (1, 4, 70.0)]
+        schedule = solver.solve_schedule(availabilities, pairs)
+        assert len(schedule) == 1
+
+        repaired, report = solver.repair_schedule(schedule, 4, {"Tuesday": ["Morning"]}, availabilities, pairs)
+
+        assert report["sessions_added"] == 1
+        assert repaired[-1] == StudySession(1, 4, ScheduleSlot("Tuesday", "Morning"))
+
+
+class TestSolverTrace:
+    """Test solver search statistics"""
+
+    def test_skips_counted_by_reason(self, solver, availabilities):
+        """Missing availability and empty overlaps are reported separately"""
+        trace = SolverTrace()
+        solver.solve_schedule(availabilities, [(1, 2, 90.0), (1, 4, 80.0), (1, 99, 70.0)], trace=trace)
+
+        assert trace.pairs_considered == 3
+        assert trace.pairs_scheduled == 1
+        assert trace.pairs_skipped_no_overlap == 1
+        assert trace.pairs_skipped_missing_availability == 1
+
+    def test_rejections_broken_down_by_rule(self):
+        """Every rejected slot is attributed to the rule that blocked it"""
+        constraints = SchedulingConstraints()
+        constraints.max_sessions_per_day = 1
+        constraints.max_partners_per_student = 1
+        trace = SolverTrace()
+        CSPSolver(constraints).solve_schedule(
+            {1: {"Monday": ["Morning", "Evening"], "Tuesday": ["Morning"]},
+             2: {"Monday": ["Morning"]},
+             3: {"Monday": ["Evening"], "Tuesday": ["Morning"]}},
+            [(1, 2, 90.0), (1, 3, 80.0)],
+            trace=trace
+        )
+
+        assert trace.rejections == {"daily": 1, "weekly": 0, "partner": 1}
+        assert trace.slots_tried == 3
+        assert trace.pairs_blocked_by_constraints == 1
+
+    def test_session_limit_reported(self, solver, availabilities):
+        """Stopping at max_sessions_to_schedule is visible in the trace"""
+        trace = SolverTrace()
+        solver.solve_schedule(availabilities, [(1, 2, 90.0), (1, 3, 80.0)],
+                              max_sessions_to_schedule=1, trace=trace)
+
+        assert trace.stopped_at_session_limit
+        assert trace.pairs_considered == 1
+
+    def test_optimize_and_phases_recorded(self, solver, availabilities):
+        """Optimization work and phase timings accumulate on the same trace"""
+        trace = SolverTrace()
+        schedule = [StudySession(1, 2, ScheduleSlot("Tuesday", "Afternoon"))]
+        with trace.phase("optimize"):
+            optimized = solver.optimize_schedule(schedule, availabilities, trace=trace)
+
+        assert optimized[0].schedule_slot == ScheduleSlot("Monday", "Evening")
+        assert trace.optimize_sessions_moved == 1
+        assert trace.to_dict()["phase_ms"]["optimize"] >= 0
+
+    def test_trace_emitted_to_metrics(self, solver, availabilities):
+        """Solver runs feed counters and per-phase timings"""
+        registry = MetricsRegistry()
+        for _ in range(2):
+            trace = SolverTrace()
+            with trace.phase("solve"):
+                solver.solve_schedule(availabilities, [(1, 2, 90.0), (1, 4, 80.0)], trace=trace)
+            record_solver_trace(trace, registry)
+
+        snapshot = registry.snapshot()
+        assert snapshot["counters"]["csp.runs"] == 2
+        assert snapshot["counters"]["csp.pairs_skipped_no_overlap"] == 2
+        assert snapshot["timings"]["csp.phase.solve"]["count"] == 2
@@ -0,0 +1,80 @@
+"""
+Unit tests for diversity-aware re-ranking
+Tests the incremental MMR against a direct implementation and its effect on near-identical partners
+"""
+import random
+import pytest
+from smart_buddy.matching.compatibility_engine import CompatibilityEngine, StudentProfile
+from smart_buddy.matching.diversity import profile_similarity, rerank_diverse
+from smart_buddy.matching.encoded_population import EncodedPopulation
+from smart_buddy.tests.test_encoded_population import random_student
+
+
+def features(population, student_id):
+    index = population.index_by_id[student_id]
+    return (population.personality_codes[index], population.style_codes[index],
+            population.environment_codes[index], population.area_sets[index], population.slot_masks[index])
+
+
+def direct_mmr(population, ranked, max_results, diversity):
+    """MMR recomputing every similarity to the picked set at each step"""
+    remaining = list(ranked)
+    picked = []
+    while remaining and len(picked) < max_results:
+        def marginal(pair):
+            similarity = max((profile_similarity(features(population, pair[0]), features(population, other[0]))
+                              for other in picked), default=0.0)
+            return (1.0 - diversity) * pair[1] / 100.0 - diversity * similarity
+        best = max(remaining, key=marginal)
+        remaining.remove(best)
+        picked.append(best)
+    return picked
+
+
+@pytest.fixture
+def population():
+    rng = random.Random(17)
+    population = EncodedPopulation()
+    for student_id in range(1, 401):
+        population.add(random_student(rng, student_id))
+    return population
+
+
+class TestDiversity:
+    """Test maximal marginal relevance re-ranking"""
+
+    def test_no_diversity_keeps_ranking(self, population):
+        """diversity=0 returns the plain top matches"""
+        student = random_student(random.Random(2), 0)
+        ranked = population.top_matches(CompatibilityEngine(), student, min_score=0.0, max_results=100)
+
+        assert rerank_diverse(population, ranked, 10, 0.0) == ranked[:10]
+
+    @pytest.mark.parametrize("diversity", [0.2, 0.5, 0.9])
+    def test_incremental_equals_direct(self, population, diversity):
+        """Keeping per-candidate highest similarities picks exactly what the direct MMR picks"""
+        engine = CompatibilityEngine()
+        for seed in range(5):
+            student = random_student(random.Random(seed), 0)
+            ranked = population.top_matches(engine, student, min_score=0.0, max_results=120)
+            reranked = rerank_diverse(population, ranked, 10, diversity)
+
+            assert reranked == direct_mmr(population, ranked, 10, diversity)
+            assert reranked[0] == ranked[0]
+
+    def test_spreads_near_identical_partners(self):
+        """Clones of the best partner give way to a different partner"""
+        population = EncodedPopulation()
+
+        def profile(student_id, personality, areas):
+            return StudentProfile(id=student_id, username=f"s{student_id}", email=f"s{student_id}@example.com",
+                                  personality_type=personality, study_style="Group", preferred_environment="Quiet",
+                                  academic_focus_areas=areas, availability={"Monday": ["Morning"]})
+
+        for student_id in range(1, 6):
+            population.add(profile(student_id, "Introvert", ["CS"]))
+        population.add(profile(6, "Extrovert", ["Art"]))
+        ranked = [(1, 90.0), (2, 89.0), (3, 88.0), (4, 87.0), (5, 86.0), (6, 70.0)]
+
+        assert [student_id for student_id, _ in rerank_diverse(population, ranked, 2, 0.0)] == [1, 2]
+        assert [student_id for student_id, _ in rerank_diverse(population, ranked, 2, 0.5)] == [1, 6]
@@ -0,0 +1,163 @@
+"""
+Unit tests for the encoded student population
+Tests score parity with the compatibility engine, ranking, row loading and in-place updates
+"""
+import random
+from types import SimpleNamespace
+import pytest
+from smart_buddy.matching.compatibility_engine import CompatibilityEngine, StudentProfile
+from smart_buddy.matching.encoded_population import EncodedPopulation
+
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+SLOTS = ["Morning", "Afternoon", "Evening"]
+
+
+def random_student(rng, student_id):
+    """Profile mixing canonical values, odd casing and missing fields"""
+    return StudentProfile(
+        id=student_id,
+        username=f"student{student_id}",
+        email=f"student{student_id}@example.com",
+        personality_type=rng.choice(["Introvert", "extrovert", "Ambivert", "None", "Curious"]),
+        study_style=rng.choice(["Group", "Individual", "mixed", None]),
+        preferred_environment=rng.choice(["Quiet", "Collaborative", "Mixed", "Library"]),
+        academic_focus_areas=rng.sample(["CS", "math", "Physics ", "Art", ""], rng.randint(0, 3)),
+        availability={day: rng.sample(SLOTS, rng.randint(0, 3)) + (["Morning"] if rng.random() < 0.1 else [])
+                      for day in rng.sample(DAYS, rng.randint(0, 4))}
+    )
+
+
+@pytest.fixture
+def students():
+    """A population with enough variety to exercise every scoring branch"""
+    rng = random.Random(11)
+    return [random_student(rng, student_id) for student_id in range(1, 201)]
+
+
+class TestEncodedPopulation:
+    """Test the encoded population against the compatibility engine"""
+
+    @pytest.mark.parametrize("weights", [(0.25, 0.25, 0.25, 0.25), (0.1, 0.2, 0.3, 0.4)])
+    def test_scores_match_engine(self, students, weights):
+        """Encoded scores are bit-for-bit the engine's total scores"""
+        engine = CompatibilityEngine(*weights)
+        population = EncodedPopulation()
+        for student in students:
+            population.add(student)
+
+        for student in students[:20]:
+            for index, score in population.iter_scores(engine, student):
+                expected = engine.compute_compatibility_score(student, students[index]).total_score
+                assert score == expected
+
+    def test_top_matches_match_find_matches(self, students):
+        """Ranking, ties and the score threshold agree with find_matches"""
+        engine = CompatibilityEngine()
+        population = EncodedPopulation()
+        for student in students:
+            population.add(student)
+
+        for student in students[:20]:
+            expected = engine.find_matches(student, students, min_score=55.0, max_results=7)
+            ranked = population.top_matches(engine, student, min_score=55.0, max_results=7)
+            assert ranked == [(match.partner_id, match.total_score) for match in expected]
+
+    def test_pages_concatenate_to_full_ranking(self, students):
+        """Resuming after each page walks the whole ranking in (score, id) order"""
+        engine = CompatibilityEngine()
+        population = EncodedPopulation()
+        for student in students:
+            population.add(student)
+        student = students[0]
+
+        pages, after = [], None
+        while True:
+            page = population.matches_after(engine, student, min_score=40.0, max_results=15, after=after)
+            if not page:
+                break
+            pages.extend(page)
+            after = (page[-1][1], page[-1][0])
+
+        expected = sorted(((population.ids[index], score) for index, score in population.iter_scores(engine, student)
+                           if score >= 40.0), key=lambda pair: (-pair[1], pair[0]))
+        assert pages == expected
+
+    def test_unseen_query_values(self, students):
+        """A student outside the population is scored without growing the vocabularies"""
+        engine = CompatibilityEngine()
+        population = EncodedPopulation()
+        for student in students:
+            population.add(student)
+        vocab_sizes = (len(population.personality_vocab), len(population.area_vocab), len(population.slot_vocab))
+
+        outsider = StudentProfile(
+            id=999, username="outsider", email="o@example.com", personality_type="Unknown",
+            study_style="Solo", preferred_environment="Cafe", academic_focus_areas=["CS", "Biology"],
+            availability={"Monday": ["Morning"], "Sunday": ["Night"]}
+        )
+        for index, score in population.iter_scores(engine, outsider):
+            assert score == engine.compute_compatibility_score(outsider, students[index]).total_score
+        assert (len(population.personality_vocab), len(population.area_vocab),
+                len(population.slot_vocab)) == vocab_sizes
+
+    def test_from_rows_parses_raw_columns(self):
+        """Raw column values (JSON strings included) are parsed like from_db_profile"""
+        rows = [
+            SimpleNamespace(id=1, username="a", email="a@x", personality_traits='{"type": "Introvert"}',
+                            study_style="Group", preferred_environment="Quiet",
+                            academic_focus_areas='["CS", "Math"]', availability='{"Monday": ["Morning"]}',
+                            updated_at=None),
+            SimpleNamespace(id=2, username="b", email="b@x", personality_traits="Introvert",
+                            study_style="Group", preferred_environment="Quiet",
+                            academic_focus_areas=["cs"], availability={"Monday": ["Morning"]},
+                            updated_at=None),
+        ]
+        population = EncodedPopulation.from_rows(rows)
+
+        assert len(population) == 2
+        assert population.personality_codes[0] == population.personality_codes[1]
+        assert population.area_sets[1] < population.area_sets[0]
+        assert population.slot_masks[0] == population.slot_masks[1]
+
+    def test_identical_area_sets_shared(self, students):
+        """Equal focus area sets are stored once"""
+        population = EncodedPopulation()
+        for student in students:
+            population.add(student)
+
+        assert len({id(areas) for areas in population.area_sets}) == len(set(population.area_sets))
+
+    def test_update_and_remove(self, students):
+        """Updated and removed profiles are reflected in scores"""
+        engine = CompatibilityEngine()
+        population = EncodedPopulation()
+        for student in students[:10]:
+            population.add(student)
+
+        changed = StudentProfile(**{**students[3].__dict__, "availability": {"Friday": ["Evening"]}})
+        population.add(changed)
+        assert population.remove(students[0].id)
+        assert not population.remove(students[0].id)
+
+        current = {student.id: student for student in students[1:10]}
+        current[changed.id] = changed
+        scores = dict((population.ids[index], score) for index, score in population.iter_scores(engine, students[5]))
+        assert set(scores) == set(current) - {students[5].id}
+        for student_id, score in scores.items():
+            assert score == engine.compute_compatibility_score(students[5], current[student_id]).total_score
+
+    def test_member_ranking_equals_profile_ranking(self, students):
+        """Members ranked from their encoded columns rank exactly like their full profiles"""
+        engine = CompatibilityEngine(0.1, 0.2, 0.3, 0.4)
+        population = EncodedPopulation()
+        for student in students:
+            population.add(student)
+        copy = population.copy()
+        population.remove(students[0].id)
+
+        for student in students[1:60]:
+            assert population.member_top_matches(engine, student.id, min_score=0.0, max_results=25) == \
+                population.top_matches(engine, student, min_score=0.0, max_results=25)
+            assert list(copy.iter_member_scores(engine, student.id)) == list(copy.iter_scores(engine, student))
+        assert len(copy) == len(students)
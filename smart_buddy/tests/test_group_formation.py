@@ -0,0 +1,118 @@
+"""
+Unit tests for study group formation
+Tests partitioning, group sizes and compatibility-aware grouping
+"""
+import pytest
+from smart_buddy.matching.compatibility_engine import StudentProfile
+from smart_buddy.matching.group_formation import GroupFormationEngine, StudyGroup
+
+
+def make_student(student_id, personality="Introvert", style="Group", environment="Quiet",
+                 areas=None, availability=None):
+    """Build a student profile with sensible defaults"""
+    return StudentProfile(
+        id=student_id,
+        username=f"student{student_id}",
+        email=f"student{student_id}@example.com",
+        personality_type=personality,
+        study_style=style,
+        preferred_environment=environment,
+        academic_focus_areas=areas if areas is not None else ["Computer Science"],
+        availability=availability if availability is not None else {"Monday": ["Morning"]}
+    )
+
+
+@pytest.fixture
+def two_cliques():
+    """Two clearly separated cohorts of four students each"""
+    science = [
+        make_student(i, areas=["Physics"], availability={"Monday": ["Morning", "Evening"]})
+        for i in range(1, 5)
+    ]
+    arts = [
+        make_student(i, personality="Extrovert", style="Individual", environment="Collaborative",
+                     areas=["Art"], availability={"Friday": ["Afternoon"]})
+        for i in range(5, 9)
+    ]
+    # Interleave so grouping cannot rely on input order
+    return [student for pair in zip(science, arts) for student in pair]
+
+
+class TestGroupFormation:
+    """Test the greedy group formation engine"""
+
+    def test_every_student_assigned_once(self):
+        """Each student should appear in exactly one group"""
+        students = [make_student(i) for i in range(1, 11)]
+        groups = GroupFormationEngine(group_size=3).form_groups(students)
+
+        member_ids = [member for group in groups for member in group.member_ids]
+        assert sorted(member_ids) == list(range(1, 11))
+
+    def test_groups_respect_target_size(self):
+        """Groups should have the target size, with a singleton folded into another group"""
+        students = [make_student(i) for i in range(1, 10)]
+        groups = GroupFormationEngine(group_size=4).form_groups(students)
+
+        sizes = sorted(len(group.member_ids) for group in groups)
+        assert sizes == [4, 5]
+
+    @pytest.mark.parametrize("group_size,count,expected", [
+        (4, 13, [4, 4, 5]),
+        (4, 14, [2, 4, 4, 4]),
+        (4, 15, [3, 4, 4, 4]),
+        (3, 10, [3, 3, 4]),
+        (2, 7, [2, 2, 3]),
+    ])
+    def test_uneven_cohort_sizes(self, group_size, count, expected):
+        """Only a single leftover student pushes one group past the target size"""
+        students = [make_student(i, areas=[["Physics"], ["Art"], ["Math"]][i % 3],
+                                 availability={"Monday": [["Morning"], ["Evening"]][i % 2]})
+                    for i in range(1, count + 1)]
+        groups = GroupFormationEngine(group_size=group_size, candidate_pool_size=3).form_groups(students)
+
+        assert sorted(len(group.member_ids) for group in groups) == expected
+        assert sorted(member for group in groups for member in group.member_ids) == list(range(1, count + 1))
+
+    def test_compatible_students_grouped_together(self, two_cliques):
+        """Students sharing interests and availability should end up together"""
+        groups = GroupFormationEngine(group_size=4).form_groups(two_cliques)
+
+        assert len(groups) == 2
+        assert sorted(sorted(group.member_ids) for group in groups) == [[1, 2, 3, 4], [5, 6, 7, 8]]
+        for group in groups:
+            assert group.common_time_slots
+
+    def test_small_candidate_pool_still_covers_cohort(self, two_cliques):
+        """A tiny candidate pool bounds work but must not drop students"""
+        groups = GroupFormationEngine(group_size=2, candidate_pool_size=1).form_groups(two_cliques)
+
+        member_ids = [member for group in groups for member in group.member_ids]
+        assert sorted(member_ids) == list(range(1, 9))
+
+    def test_students_without_availability_still_grouped(self):
+        """Students with no indexed slots or areas fall back to unassigned students"""
+        students = [make_student(i, areas=[], availability={}) for i in range(1, 5)]
+        groups = GroupFormationEngine(group_size=2).form_groups(students)
+
+        assert len(groups) == 2
+        assert all(group.common_time_slots == [] for group in groups)
+
+    def test_empty_cohort(self):
+        """An empty cohort produces no groups"""
+        assert GroupFormationEngine().form_groups([]) == []
+
+    def test_invalid_group_size(self):
+        """Groups smaller than two students are rejected"""
+        with pytest.raises(ValueError):
+            GroupFormationEngine(group_size=1)
+
+    def test_group_to_dict(self, two_cliques):
+        """Test conversion to dictionary format"""
+        group = GroupFormationEngine(group_size=4).form_groups(two_cliques)[0]
+        group_dict = group.to_dict()
+
+        assert isinstance(group, StudyGroup)
+        assert group_dict["group_size"] == 4
+        assert "average_compatibility" in group_dict
+        assert "common_time_slots" in group_dict
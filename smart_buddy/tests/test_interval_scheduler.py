@@ -0,0 +1,152 @@
+"""
+Unit tests for the interval-based scheduler
+Tests interval merging, sweep-line intersection and session placement with breaks
+"""
+import pytest
+from types import SimpleNamespace
+from datetime import date, time
+from smart_buddy.matching.csp_solver import CSPSolver, SchedulingConstraints
+from smart_buddy.matching.interval_scheduler import (
+    IntervalScheduler, merge_intervals, intersect_intervals,
+    availability_rows_to_intervals, format_minute_of_week, MINUTES_PER_DAY
+)
+
+
+def hours(day_index, start_hour, end_hour):
+    """Interval on a given day between two whole hours"""
+    offset = day_index * MINUTES_PER_DAY
+    return (offset + start_hour * 60, offset + end_hour * 60)
+
+
+def availability_row(start, end, day_of_week=None, on_date=None, is_active=True):
+    """Stand-in for an Availability row"""
+    return SimpleNamespace(day_of_week=day_of_week, date=on_date, start_time=start,
+                           end_time=end, is_active=is_active)
+
+
+class TestIntervalOperations:
+    """Test merging and intersecting availability intervals"""
+
+    def test_merge_overlapping_and_touching(self):
+        """Overlapping and touching intervals should merge"""
+        merged = merge_intervals([(300, 400), (0, 100), (100, 200), (350, 500)])
+        assert merged == [(0, 200), (300, 500)]
+
+    def test_intersect_two_students(self):
+        """Only time shared by both students should remain"""
+        student1 = [hours(0, 9, 12), hours(0, 14, 18)]
+        student2 = [hours(0, 11, 15)]
+        assert intersect_intervals([student1, student2]) == [hours(0, 11, 12), hours(0, 14, 15)]
+
+    def test_intersect_touching_intervals_do_not_overlap(self):
+        """Intervals that only touch share no time"""
+        assert intersect_intervals([[hours(0, 9, 10)], [hours(0, 10, 11)]]) == []
+
+    def test_intersect_three_students(self):
+        """The sweep line handles more than two students"""
+        lists = [[hours(2, 8, 20)], [hours(2, 10, 16)], [hours(2, 12, 18)]]
+        assert intersect_intervals(lists) == [hours(2, 12, 16)]
+
+    def test_intersect_with_empty_list(self):
+        """A student with no availability empties the intersection"""
+        assert intersect_intervals([[hours(0, 9, 10)], []]) == []
+
+
+class TestAvailabilityRows:
+    """Test conversion of Availability rows into intervals"""
+
+    def test_recurring_rows(self):
+        """Recurring rows are placed on their day of the week"""
+        rows = [availability_row(time(9, 0), time(11, 0), day_of_week=1),
+                availability_row(time(10, 0), time(12, 30), day_of_week=1)]
+        assert availability_rows_to_intervals(rows) == [(MINUTES_PER_DAY + 540, MINUTES_PER_DAY + 750)]
+
+    def test_one_time_rows_need_matching_week(self):
+        """One-time rows only count inside the scheduled week"""
+        rows = [availability_row(time(9, 0), time(10, 0), on_date=date(2025, 9, 3))]
+        assert availability_rows_to_intervals(rows) == []
+        assert availability_rows_to_intervals(rows, week_start=date(2025, 9, 1)) == [hours(2, 9, 10)]
+        assert availability_rows_to_intervals(rows, week_start=date(2025, 9, 8)) == []
+
+    def test_inactive_rows_ignored(self):
+        """Soft-deleted rows are skipped"""
+        rows = [availability_row(time(9, 0), time(10, 0), day_of_week=0, is_active=False)]
+        assert availability_rows_to_intervals(rows) == []
+
+    def test_format_minute_of_week(self):
+        """Minute offsets map back to day names and clock times"""
+        assert format_minute_of_week(hours(3, 14, 15)[0] + 30) == ("Thursday", "14:30")
+
+
+class TestIntervalScheduler:
+    """Test session placement over continuous availability"""
+
+    @pytest.fixture
+    def scheduler(self):
+        return IntervalScheduler(SchedulingConstraints())
+
+    def test_session_placed_at_earliest_common_time(self, scheduler):
+        """A session starts at the beginning of the common window"""
+        sessions = scheduler.solve_schedule(
+            {1: [hours(0, 9, 13)], 2: [hours(0, 10, 14)]},
+            [(1, 2, 80.0)]
+        )
+        assert len(sessions) == 1
+        assert sessions[0].schedule_slot.day == "Monday"
+        assert sessions[0].schedule_slot.time == "10:00"
+        assert sessions[0].duration_hours == 2.0
+
+    def test_window_shorter_than_session_skipped(self, scheduler):
+        """Common windows shorter than the session length cannot hold a session"""
+        sessions = scheduler.solve_schedule(
+            {1: [hours(0, 9, 11)], 2: [hours(0, 10, 12)]},
+            [(1, 2, 80.0)]
+        )
+        assert sessions == []
+
+    def test_break_enforced_between_sessions(self, scheduler):
+        """A student's back-to-back sessions are separated by the minimum break"""
+        availability = {1: [hours(0, 8, 20)], 2: [hours(0, 8, 20)], 3: [hours(0, 8, 20)]}
+        sessions = scheduler.solve_schedule(availability, [(1, 2, 90.0), (1, 3, 80.0)])
+
+        assert [s.schedule_slot.time for s in sessions] == ["08:00", "11:00"]
+
+    def test_daily_limit_moves_session_to_next_day(self):
+        """Once the daily limit is reached the next session moves to another day"""
+        constraints = SchedulingConstraints()
+        constraints.max_sessions_per_day = 1
+        availability = {1: [hours(0, 8, 20), hours(1, 8, 20)],
+                        2: [hours(0, 8, 20), hours(1, 8, 20)],
+                        3: [hours(0, 8, 20), hours(1, 8, 20)]}
+
+        sessions = IntervalScheduler(constraints).solve_schedule(availability, [(1, 2, 90.0), (1, 3, 80.0)])
+
+        assert [s.schedule_slot.day for s in sessions] == ["Monday", "Tuesday"]
+
+    def test_partner_limit_respected(self):
+        """Students cannot exceed the maximum number of partners"""
+        constraints = SchedulingConstraints()
+        constraints.max_partners_per_student = 1
+        availability = {i: [hours(0, 8, 20)] for i in range(1, 4)}
+
+        sessions = IntervalScheduler(constraints).solve_schedule(availability, [(1, 2, 90.0), (1, 3, 80.0)])
+
+        assert len(sessions) == 1
+        assert (sessions[0].partner1_id, sessions[0].partner2_id) == (1, 2)
+
+    def test_many_intervals_per_student(self):
+        """Hundreds of fragmented intervals are handled without issue"""
+        constraints = SchedulingConstraints()
+        constraints.max_partners_per_student = 4
+        # Hundreds of 20-minute fragments early in the week, usable windows at the end
+        fragments = [(start, start + 20) for start in range(0, 4 * MINUTES_PER_DAY, 30)]
+        windows = [hours(day, 8, 22) for day in range(4, 7)]
+        availability = {i: fragments + windows for i in range(1, 6)}
+        pairs = [(a, b, 50.0 + a + b) for a in range(1, 6) for b in range(a + 1, 6)]
+
+        sessions = IntervalScheduler(constraints).solve_schedule(availability, pairs)
+
+        assert len(fragments) > 100
+        assert len(sessions) == len(pairs)
+        is_valid, violations = CSPSolver(constraints).validate_full_schedule(sessions)
+        assert is_valid, violations
@@ -0,0 +1,39 @@
+"""
+Unit tests for match pagination cursors
+Tests cursor round trips and rejection of foreign, malformed and stale cursors
+"""
+import pytest
+from smart_buddy.matching.match_cursor import MatchCursor, InvalidCursorError, StaleCursorError, \
+    encode_cursor, decode_cursor, query_fingerprint, resume_after
+
+
+WEIGHTS = {"personality": 0.25, "study_preferences": 0.25, "academic_goals": 0.25, "availability": 0.25}
+
+
+class TestMatchCursor:
+    """Test opaque match cursors"""
+
+    def test_round_trip_is_exact(self):
+        """Scores come back bit-for-bit, so resuming never skips or repeats a tie"""
+        cursor = MatchCursor(population_version=7, score=71.33333333333333, partner_id=42,
+                             query=query_fingerprint(1, 50.0, WEIGHTS))
+
+        assert decode_cursor(encode_cursor(cursor)) == cursor
+
+    def test_resume_checks_query_and_version(self):
+        """Cursors only resume the ranking and population they were issued for"""
+        query = query_fingerprint(1, 50.0, WEIGHTS)
+        token = encode_cursor(MatchCursor(population_version=3, score=80.0, partner_id=9, query=query))
+
+        assert resume_after(token, query, 3).partner_id == 9
+        assert resume_after(None, query, 3) is None
+        with pytest.raises(StaleCursorError):
+            resume_after(token, query, 4)
+        with pytest.raises(InvalidCursorError):
+            resume_after(token, query_fingerprint(1, 60.0, WEIGHTS), 3)
+
+    @pytest.mark.parametrize("token", ["not a cursor", "e30", encode_cursor(MatchCursor(1, 1.0, 1, "q"))[:-3]])
+    def test_malformed_rejected(self, token):
+        """Anything that is not a whole cursor is refused"""
+        with pytest.raises(InvalidCursorError):
+            decode_cursor(token)
@@ -0,0 +1,73 @@
+"""
+Unit tests for the matcher registry and per-matcher ranking cache
+Tests key normalization, LRU eviction and invalidation of rankings by population version
+"""
+from smart_buddy.matching.matcher_registry import MatcherRegistry, RankingCache, matcher_key
+
+
+class TestMatcherRegistry:
+    """Test reuse of long-lived matchers"""
+
+    def test_key_normalizes_weights(self):
+        """Weights that score identically share a key; constraints and caching tell keys apart"""
+        assert matcher_key((1.0, 1.0, 1.0, 1.0)) == matcher_key((0.25, 0.25, 0.25, 0.25))
+        assert matcher_key((0.5, 0.3, 0.2, 0.0)) != matcher_key((0.25, 0.25, 0.25, 0.25))
+        assert matcher_key((1, 1, 1, 1), {"max_sessions_per_day": 2, "max_sessions_per_week": 5}) == \
+            matcher_key((1, 1, 1, 1), {"max_sessions_per_week": 5, "max_sessions_per_day": 2})
+        assert matcher_key((1, 1, 1, 1), {"max_sessions_per_day": 2}) != matcher_key((1, 1, 1, 1))
+        assert matcher_key((1, 1, 1, 1), cached_schedules=True) != matcher_key((1, 1, 1, 1))
+
+    def test_reuses_and_evicts_least_recently_used(self):
+        """A key is built once while it stays among the max_size most recently used"""
+        registry = MatcherRegistry(max_size=2)
+        builds = []
+
+        def build(name):
+            builds.append(name)
+            return object()
+
+        first = registry.get("a", lambda: build("a"))
+        registry.get("b", lambda: build("b"))
+        assert registry.get("a", lambda: build("a")) is first
+        registry.get("c", lambda: build("c"))
+        registry.get("b", lambda: build("b"))
+
+        assert builds == ["a", "b", "c", "b"]
+        assert len(registry) == 2
+        stats = registry.stats()
+        assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 4, 2)
+
+
+class TestRankingCache:
+    """Test rankings cached per population version"""
+
+    def test_hit_within_version(self):
+        """A ranking is returned until the population changes"""
+        cache = RankingCache()
+        cache.put(3, (1, 50.0, 10), (12, [(4, 91.5), (7, 80.25)]))
+
+        assert cache.get(3, (1, 50.0, 10)) == (12, [(4, 91.5), (7, 80.25)])
+        assert cache.get(3, (1, 60.0, 10)) is None
+        assert cache.get(4, (1, 50.0, 10)) is None
+        assert cache.stats() == {"entries": 0, "hits": 1, "misses": 2}
+
+    def test_stale_rankings_ignored(self):
+        """A ranking made on an older population is not cached once a newer one was seen"""
+        cache = RankingCache()
+        cache.get(5, "key")
+        cache.put(4, "key", (1, [(2, 70.0)]))
+
+        assert cache.get(5, "key") is None
+        assert cache.get(4, "key") is None
+
+    def test_bounded(self):
+        """The least recently used ranking is dropped beyond max_entries"""
+        cache = RankingCache(max_entries=2)
+        for key in ("a", "b"):
+            cache.put(1, key, (0, []))
+        cache.get(1, "a")
+        cache.put(1, "c", (0, []))
+
+        assert cache.get(1, "b") is None
+        assert cache.get(1, "a") == (0, [])
+        assert cache.get(1, "c") == (0, [])
@@ -0,0 +1,250 @@
+"""
+API tests for the matching endpoints
+Testing /matching responses against the matcher service on a small profile table
+"""
+from array import array
+import base64
+import json
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from smart_buddy.models.sqlalchemy_models import Profile, Base
+from smart_buddy.db import get_db
+from smart_buddy.routers import matching
+from smart_buddy.matching.matching_service import profile_store
+from smart_buddy.matching.matcher_registry import matcher_registry
+from smart_buddy.matching.matrix_format import read_columnar_binary
+
+# Test database setup
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_matching_router.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    """Override database dependency for testing"""
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+app = FastAPI()
+app.include_router(matching.router)
+app.dependency_overrides[get_db] = override_get_db
+
+PERSONALITIES = ["Introvert", "Extrovert", "Ambivert"]
+STYLES = ["Group", "Individual", "Mixed"]
+ENVIRONMENTS = ["Quiet", "Collaborative", "Flexible"]
+AREAS = [["Computer Science"], ["Mathematics", "Computer Science"], ["Physics"], ["Mathematics"]]
+SLOTS = [["Morning"], ["Afternoon"], ["Morning", "Evening"], ["Afternoon", "Evening"]]
+
+@pytest.fixture
+def db_session():
+    """Create database session for test setup"""
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+    Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def profiles(db_session):
+    """Twelve varied profiles, loaded into the resident profile store"""
+    for i in range(12):
+        db_session.add(Profile(
+            email=f"student{i}@example.com",
+            username=f"student{i}",
+            study_style=STYLES[i % 3],
+            preferred_environment=ENVIRONMENTS[i % 3 - 1],
+            personality_traits={"type": PERSONALITIES[i % 3]},
+            academic_focus_areas=AREAS[i % 4],
+            password="testpassword",
+            availability={"Monday": SLOTS[i % 4], "Wednesday": SLOTS[(i + 1) % 4]}
+        ))
+    db_session.commit()
+    profile_store.load(db_session, from_snapshot=False)
+    matcher_registry.clear()
+    return [profile.id for profile in db_session.query(Profile).order_by(Profile.id)]
+
+@pytest.fixture
+def client(monkeypatch):
+    """Create test client, with the matching sessions on the test database"""
+    monkeypatch.setattr(matching, "SessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(matching, "USE_ASYNC_DB", False)
+    return TestClient(app)
+
+
+class TestMatchingSystemEndpoint:
+    """Test GET /matching/test-matching-system"""
+
+    def test_matches_first_profile(self, client, profiles, db_session):
+        """Test the sample matches are the matcher's own matches for the first profile"""
+        response = client.get("/matching/test-matching-system")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "success"
+        assert data["profile_count"] == len(profiles)
+        assert data["test_student_id"] == profiles[0]
+        expected = matching.create_matcher().find_matches_for_student(
+            student_id=profiles[0], db=db_session, min_score=0.0, max_results=5
+        )
+        assert data["test_results"]["matches"] and \
+            [match["partner_id"] for match in data["test_results"]["matches"]] == \
+            [match["partner_id"] for match in expected["matches"]]
+
+    def test_matches_first_profile_on_async_session(self, client, profiles, db_session, monkeypatch):
+        """Test the endpoint gives the same sample through an AsyncSession"""
+        expected = client.get("/matching/test-matching-system").json()
+        async_engine = create_async_engine("sqlite+aiosqlite:///./test_matching_router.db")
+        monkeypatch.setattr(matching, "USE_ASYNC_DB", True)
+        monkeypatch.setattr(matching, "get_async_sessionmaker", lambda: async_sessionmaker(async_engine))
+        response = client.get("/matching/test-matching-system")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert (data["status"], data["profile_count"], data["test_student_id"]) == \
+            ("success", len(profiles), profiles[0])
+        assert [match["partner_id"] for match in data["test_results"]["matches"]] == \
+            [match["partner_id"] for match in expected["test_results"]["matches"]]
+
+    def test_insufficient_data(self, client, db_session):
+        """Test fewer than two profiles is reported rather than matched"""
+        response = client.get("/matching/test-matching-system")
+
+        assert response.status_code == 200
+        assert response.json()["status"] == "insufficient_data"
+
+
+class TestFindMatchesBatchEndpoint:
+    """Test POST /matching/find-matches-batch"""
+
+    def expected_results(self, db_session, student_ids):
+        """find_matches_for_student for each student, shaped like the batch results"""
+        matcher = matching.create_matcher()
+        results = []
+        for student_id in student_ids:
+            result = matcher.find_matches_for_student(student_id=student_id, db=db_session, min_score=0.0,
+                                                      max_results=5, include_scheduling=False)
+            results.append({"student_id": student_id, **result} if "error" in result else result)
+        return json.loads(json.dumps(results))
+
+    def test_results_equal_single_student_matches(self, client, profiles, db_session):
+        """Test every batch result is the student's own find-matches result, in request order"""
+        student_ids = [profiles[5], 9999, profiles[0], profiles[11]]
+        response = client.post("/matching/find-matches-batch", json={
+            "student_ids": student_ids, "min_score": 0.0, "max_results": 5
+        })
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["students_requested"] == 4 and data["students_found"] == 3
+        assert data["results"] == self.expected_results(db_session, student_ids)
+
+    def test_stream_framing(self, client, profiles, db_session):
+        """Test the stream is one JSON record per line: a result per student, then the summary"""
+        student_ids = [profiles[2], 9999, profiles[7]]
+        response = client.post("/matching/find-matches-batch?stream=true", json={
+            "student_ids": student_ids, "min_score": 0.0, "max_results": 5
+        })
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        assert response.text.endswith("\n")
+        records = [json.loads(line) for line in response.text.split("\n")[:-1]]
+        assert [record.pop("type") for record in records] == ["result"] * 3 + ["summary"]
+        assert records[:-1] == self.expected_results(db_session, student_ids)
+        assert records[-1]["students_requested"] == 3 and records[-1]["students_found"] == 2
+
+    def test_validation(self, client, profiles):
+        """Test empty and oversized batches are rejected"""
+        assert client.post("/matching/find-matches-batch", json={"student_ids": []}).status_code == 400
+        response = client.post("/matching/find-matches-batch",
+                               json={"student_ids": list(range(matching.MAX_BATCH_STUDENTS + 1))})
+        assert response.status_code == 400
+
+
+def ndjson_records(text):
+    """Records of an NDJSON body, checking every record ends its own line"""
+    assert text.endswith("\n")
+    return [json.loads(line) for line in text.split("\n")[:-1]]
+
+
+class TestCompatibilityMatrixStream:
+    """Test POST /matching/compatibility-matrix?stream=true"""
+
+    @pytest.mark.parametrize("include_details", [False, True])
+    def test_rows_equal_matrix(self, client, profiles, include_details):
+        """Test streamed rows and summary equal the matrix returned in one response"""
+        student_ids = profiles[:7]
+        matrix = client.post("/matching/compatibility-matrix", json={"student_ids": student_ids}).json()
+        response = client.post(f"/matching/compatibility-matrix?stream=true&include_details={include_details}",
+                               json={"student_ids": student_ids})
+
+        assert response.status_code == 200
+        records = ndjson_records(response.text)
+        assert [record["type"] for record in records] == ["students"] + ["row"] * 7 + ["summary"]
+        assert records[0]["students"] == list(matrix["compatibility_matrix"])
+        rows = records[1:-1]
+        assert {row["student"]: row["scores"] for row in rows} == matrix["compatibility_matrix"]
+        if include_details:
+            assert {row["student"]: row["detailed_scores"] for row in rows} == matrix["detailed_scores"]
+        assert records[-1]["summary_statistics"] == matrix["summary_statistics"]
+        assert records[-1]["weights_used"] == matrix["weights_used"]
+
+    @pytest.mark.parametrize("count", [0, 1])
+    def test_too_few_students_refused_before_streaming(self, client, profiles, count):
+        """Test empty and one-student requests get a 400, not a stream"""
+        response = client.post("/matching/compatibility-matrix?stream=true", json={"student_ids": profiles[:count]})
+
+        assert response.status_code == 400
+        assert response.headers["content-type"] == "application/json"
+        response = client.post("/matching/compatibility-matrix?stream=true", json={"student_ids": profiles[:count] + [9999]})
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize("count", [0, 1])
+    def test_framing_of_small_groups(self, profiles, db_session, count):
+        """Test the stream of an empty or one-student group is still whole: students, rows, summary"""
+        matcher = matching.create_matcher()
+        student_profiles = matcher.load_group_profiles(profiles[:count], db_session)
+        text = "".join(matching.ndjson_lines(matcher.iter_compatibility_matrix(student_profiles),
+                                             {"weights_used": {}}))
+
+        records = ndjson_records(text)
+        assert [record["type"] for record in records] == ["students"] + ["row"] * count + ["summary"]
+        assert records[0]["student_count"] == count
+        if count:
+            assert records[1]["scores"] == {records[1]["student"]: 100.0}
+        assert records[-1]["summary_statistics"]["total_pairs"] == 0
+        assert records[-1]["weights_used"] == {}
+
+
+class TestCompatibilityMatrixColumns:
+    """Test POST /matching/compatibility-matrix?format=columnar"""
+
+    def test_cells_follow_requested_order(self, client, profiles):
+        """Test unsorted ids keep their order in the id array and in every cell"""
+        student_ids = [profiles[6], profiles[1], 9999, profiles[9], profiles[1], profiles[3]]
+        ordered = [profiles[6], profiles[1], profiles[9], profiles[3]]
+        matrix = client.post("/matching/compatibility-matrix", json={"student_ids": student_ids}).json()
+        scores = {int(row.split("_")[0]): {int(column.split("_")[0]): score for column, score in cells.items()}
+                  for row, cells in matrix["compatibility_matrix"].items()}
+
+        columnar = client.post("/matching/compatibility-matrix?format=columnar",
+                               json={"student_ids": student_ids}).json()
+        binary = read_columnar_binary(client.post("/matching/compatibility-matrix",
+                                                  json={"student_ids": student_ids},
+                                                  headers={"Accept": "application/octet-stream"}).content)
+
+        total_score = array("f", base64.b64decode(columnar["arrays"]["total_score"]))
+        for payload, cells in ((columnar, total_score), (binary, binary["arrays"]["total_score"])):
+            assert payload["student_ids"] == ordered
+            assert payload["shape"] == [4, 4]
+            for i, student1 in enumerate(ordered):
+                for j, student2 in enumerate(ordered):
+                    assert cells[i * 4 + j] == pytest.approx(scores[student1][student2], abs=0.01)
@@ -0,0 +1,193 @@
+"""
+Unit tests for the study buddy matching service
+Tests matcher behaviour over the resident profile store that the API tests do not reach
+"""
+import random
+import threading
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from smart_buddy.models.sqlalchemy_models import Profile as ProfileRecord, Base as ProfileBase
+from smart_buddy.matching.matching_service import StudyBuddyMatcher, PARTITIONED_NEEDS_STORE, \
+    PROFILE_MATCHING_COLUMNS
+from smart_buddy.matching.profile_store import ProfileStore, register_profile_store_events
+from smart_buddy.tests.test_profile_store import Base, Profile, COLUMNS, profile_row
+
+
+def random_row(rng, student_id):
+    """Profile columns with enough variety for distinct rankings"""
+    return profile_row(
+        student_id,
+        personality_traits={"type": rng.choice(["Introvert", "Extrovert", "Ambivert"])},
+        study_style=rng.choice(["Group", "Individual", "Mixed"]),
+        preferred_environment=rng.choice(["Quiet", "Collaborative", "Mixed"]),
+        academic_focus_areas=rng.sample(["CS", "Math", "Physics", "Art"], rng.randint(1, 2)),
+        availability={day: rng.sample(["Morning", "Afternoon", "Evening"], rng.randint(1, 2))
+                      for day in rng.sample(["Monday", "Tuesday", "Wednesday"], rng.randint(1, 3))}
+    )
+
+
+@pytest.fixture
+def db():
+    """Session over an in-memory database with sixty profiles"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    rng = random.Random(5)
+    session.execute(insert(Profile), [random_row(rng, i) for i in range(1, 61)])
+    session.commit()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def store(db):
+    """Loaded store that only refreshes when asked or when changes are pending"""
+    store = ProfileStore(COLUMNS, Profile.id, Profile.updated_at, refresh_interval=3600)
+    register_profile_store_events(Profile, store)
+    store.load(db)
+    return store
+
+
+class TestMutualIndex:
+    """Test the mutual match index kept over the profile store"""
+
+    def test_refresh_updates_only_affected_lists(self, store, db, mocker):
+        """After writes the index equals a full build, without ranking everyone again"""
+        matcher = StudyBuddyMatcher(profile_store=store)
+        assert matcher._current_mutual_index().forward == matcher._local_mutual_index(store.population).forward
+
+        rng = random.Random(9)
+        for student_id in (4, 17):
+            row = random_row(rng, student_id)
+            profile = db.get(Profile, student_id)
+            profile.availability, profile.study_style = row["availability"], row["study_style"]
+        db.delete(db.get(Profile, 30))
+        db.add(Profile(**random_row(rng, 61)))
+        db.commit()
+        rank_members = mocker.spy(matcher, "_rank_members")
+        store.ensure_fresh(db)
+
+        index = matcher._current_mutual_index()
+        ranked_fully = sum(len(call.args[1]) for call in rank_members.call_args_list if call.args[3] is None)
+        assert 0 < ranked_fully < len(store.population)
+        assert index.version == store.version
+        assert index.forward == matcher._local_mutual_index(store.population).forward
+
+    def test_stale_index_served_during_update(self, store, db):
+        """While one caller updates the index, the others get the previous one"""
+        matcher = StudyBuddyMatcher(profile_store=store)
+        previous = matcher._current_mutual_index()
+        db.get(Profile, 4).study_style = "Mixed"
+        db.commit()
+        store.ensure_fresh(db)
+
+        with matcher._mutual_lock:
+            assert matcher._current_mutual_index() is previous
+        assert matcher._current_mutual_index().version == store.version
+
+
+class TestFindMatchesBatch:
+    """Test batch matching without a profile store"""
+
+    def test_partitioned_needs_store(self):
+        """A partitioned batch is refused rather than silently searching everyone"""
+        matcher = StudyBuddyMatcher()
+
+        assert matcher.find_matches_batch([1, 2], db=None, partitioned=True) == {"error": PARTITIONED_NEEDS_STORE}
+        with pytest.raises(ValueError):
+            next(matcher.iter_find_matches_batch([1, 2], db=None, partitioned=True))
+
+
+class TestRepairGroupSchedule:
+    """Test repairing a schedule after one student's availability changes"""
+
+    @pytest.fixture
+    def group_db(self):
+        """Session over the full profiles table: a changed student and three partners"""
+        engine = create_engine("sqlite://")
+        ProfileBase.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        for student_id, availability in (
+                (1, {"Thursday": ["Evening"], "Friday": ["Afternoon", "Evening"]}),
+                (2, {"Monday": ["Morning"], "Tuesday": ["Morning"], "Thursday": ["Evening"],
+                     "Friday": ["Afternoon", "Evening"]}),
+                (3, {"Monday": ["Morning"], "Tuesday": ["Morning"], "Friday": ["Afternoon"]}),
+                (4, {"Monday": ["Morning", "Evening"], "Tuesday": ["Morning"], "Friday": ["Evening"]})):
+            session.add(ProfileRecord(id=student_id, email=f"student{student_id}@example.com",
+                                      username=f"student{student_id}", password="testpassword",
+                                      personality_traits={"type": "Introvert"}, study_style="Group",
+                                      preferred_environment="Quiet", academic_focus_areas=["CS"],
+                                      availability=availability))
+        session.commit()
+        yield session
+        session.close()
+
+    def test_pairs_scored_with_new_availability(self, group_db):
+        """Re-placement follows the new overlap: the best partner now takes a Monday slot, not the leftover one"""
+        sessions = [{"partner1_id": 1, "partner2_id": 2, "day": "Thursday", "time": "Evening"},
+                    {"partner1_id": 1, "partner2_id": 3, "day": "Friday", "time": "Afternoon"},
+                    {"partner1_id": 1, "partner2_id": 4, "day": "Friday", "time": "Evening"}]
+        result = StudyBuddyMatcher().repair_group_schedule(
+            sessions, 1, {"Monday": ["Morning", "Evening"], "Tuesday": ["Morning"]}, group_db)
+
+        placed = {session["partner2_id"]: (session["day"], session["time"]) for session in result["sessions"]}
+        assert result["repair"]["sessions_replaced"] == 3
+        assert placed == {4: ("Monday", "Morning"), 2: ("Monday", "Morning"), 3: ("Tuesday", "Morning")}
+
+
+class TestFindMatchesPage:
+    """Test cursor paging over the resident profile store"""
+
+    @pytest.fixture
+    def file_db(self, tmp_path):
+        """Sessions over a database file, so a second thread gets its own connection"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'profiles.db'}")
+        ProfileBase.metadata.create_all(engine)
+        sessions = sessionmaker(bind=engine)
+        rng = random.Random(5)
+        with sessions() as session:
+            session.execute(insert(ProfileRecord),
+                            [{**random_row(rng, i), "password": "testpassword"} for i in range(1, 61)])
+            session.commit()
+        yield sessions
+        engine.dispose()
+
+    def test_cursor_version_is_the_ranked_population(self, file_db, mocker):
+        """A refresh while a page is taken cannot pair the newer population with the older version"""
+        db = file_db()
+        store = ProfileStore(PROFILE_MATCHING_COLUMNS, ProfileRecord.id, ProfileRecord.updated_at,
+                             refresh_interval=3600)
+        register_profile_store_events(ProfileRecord, store)
+        store.load(db)
+        matcher = StudyBuddyMatcher(profile_store=store)
+        before = matcher.find_matches_page(1, db, page_size=5, min_score=0.0)
+        top_partner_id = before["matches"][0]["partner_id"]
+
+        def refresh():
+            with file_db() as session:
+                session.get(ProfileRecord, top_partner_id).availability = {}
+                session.get(ProfileRecord, top_partner_id).academic_focus_areas = []
+                session.commit()
+                store.refresh(session)
+
+        resume_page = matcher._resume_page
+        refresher = threading.Thread(target=refresh)
+
+        def refresh_during_page(*args):
+            refresher.start()
+            refresher.join(timeout=0.5)
+            return resume_page(*args)
+
+        mocker.patch.object(matcher, "_resume_page", side_effect=refresh_during_page)
+        during = matcher.find_matches_page(1, db, page_size=5, min_score=0.0)
+        refresher.join()
+        mocker.stopall()
+        after = matcher.find_matches_page(1, db, page_size=5, min_score=0.0)
+
+        assert store.version != before["population_version"]
+        partner_ids = [match["partner_id"] for match in during["matches"]]
+        expected = before if during["population_version"] == before["population_version"] else after
+        assert during["population_version"] in (before["population_version"], after["population_version"])
+        assert partner_ids == [match["partner_id"] for match in expected["matches"]]
+        db.close()
@@ -0,0 +1,83 @@
+"""
+Unit tests for the compact compatibility matrix encodings
+Tests summary statistics, field selection and the base64 and binary columnar layouts
+"""
+from array import array
+import base64
+import math
+import pytest
+from smart_buddy.matching.matrix_format import MatrixSummary, MATRIX_FIELDS, parse_fields, \
+    columnar_json, columnar_binary, read_columnar_binary
+
+
+def sample_columns():
+    """A 3 x 3 matrix with one score array and one NaN-diagonal component array"""
+    total = array('f', [100.0, 72.5, 41.25, 72.5, 100.0, 90.0, 41.25, 90.0, 100.0])
+    personality = array('f', [math.nan, 80.0, 20.0, 80.0, math.nan, 100.0, 20.0, 100.0, math.nan])
+    return {
+        "student_ids": [3, 5, 8],
+        "usernames": ["ada", "bo", "cy"],
+        "shape": [3, 3],
+        "arrays": {"total_score": total, "personality": personality}
+    }
+
+
+class TestMatrixFormat:
+    """Test matrix encodings"""
+
+    def test_summary_matches_list_statistics(self):
+        """Accumulated statistics equal those computed from the full list of scores"""
+        scores = [72.5, 41.25, 90.0, 88.13, 70.0, 79.99]
+        summary = MatrixSummary()
+        for score in scores:
+            summary.add(score)
+
+        assert summary.to_dict() == {
+            "total_pairs": 6,
+            "average_compatibility": round(sum(scores) / len(scores), 2),
+            "highest_compatibility": 90.0,
+            "lowest_compatibility": 41.25,
+            "pairs_above_70": 5,
+            "pairs_above_80": 2,
+            "pairs_above_90": 1
+        }
+        assert MatrixSummary().to_dict()["average_compatibility"] == 0
+
+    def test_parse_fields(self):
+        """Fields default to everything and unknown names are rejected"""
+        assert parse_fields(None) == MATRIX_FIELDS
+        assert parse_fields("scores, summary") == ("scores", "summary")
+        with pytest.raises(ValueError):
+            parse_fields("scores,detailed_scores")
+
+    def test_columnar_json_decodes_to_arrays(self):
+        """Base64 arrays decode to the original little-endian float32 values"""
+        columns = sample_columns()
+        encoded = columnar_json(columns)
+
+        assert encoded["student_ids"] == [3, 5, 8]
+        assert (encoded["format"], encoded["dtype"], encoded["byteorder"]) == ("columnar", "float32", "little")
+        decoded = array('f')
+        decoded.frombytes(base64.b64decode(encoded["arrays"]["total_score"]))
+        assert decoded == columns["arrays"]["total_score"]
+
+    def test_binary_round_trip(self):
+        """A binary payload decodes to the same metadata and arrays, NaNs included"""
+        columns = sample_columns()
+        payload = columnar_binary(columns)
+        decoded = read_columnar_binary(payload)
+
+        assert decoded["student_ids"] == columns["student_ids"]
+        assert decoded["usernames"] == columns["usernames"]
+        assert list(decoded["arrays"]) == ["total_score", "personality"]
+        assert decoded["arrays"]["total_score"] == columns["arrays"]["total_score"]
+        personality = decoded["arrays"]["personality"]
+        assert [math.isnan(value) for value in personality] == [index % 4 == 0 for index in range(9)]
+        assert personality[1] == 80.0
+
+    def test_binary_rejects_foreign_payload(self):
+        """Payloads without the matrix header are refused"""
+        with pytest.raises(ValueError):
+            read_columnar_binary(b"{}")
+        with pytest.raises(ValueError):
+            read_columnar_binary(b"NOTMATRX" + bytes(8))
@@ -0,0 +1,71 @@
+"""
+Unit tests for the reciprocal top-K index
+Tests that mutual matches equal the intersection of forward top-K lists, in both directions
+"""
+import random
+from smart_buddy.matching.compatibility_engine import CompatibilityEngine
+from smart_buddy.matching.encoded_population import EncodedPopulation
+from smart_buddy.matching.mutual_index import MutualMatchIndex
+from smart_buddy.tests.test_encoded_population import random_student
+
+
+def forward_lists(k):
+    """Every student's top k over a random population"""
+    rng = random.Random(21)
+    students = [random_student(rng, student_id) for student_id in range(1, 151)]
+    population = EncodedPopulation()
+    for student in students:
+        population.add(student)
+    engine = CompatibilityEngine()
+    return {student.id: population.top_matches(engine, student, min_score=0.0, max_results=k)
+            for student in students}
+
+
+class TestMutualMatchIndex:
+    """Test mutual matches from forward and reverse lists"""
+
+    def test_matches_brute_force_intersection(self):
+        """A partner is mutual exactly when each is in the other's top K"""
+        forward = forward_lists(10)
+        index = MutualMatchIndex(10, 1, forward)
+
+        for student_id, ranked in forward.items():
+            expected = [partner_id for partner_id, _ in ranked
+                        if student_id in dict(forward[partner_id])]
+            mutual = index.mutual(student_id)
+            assert [match.partner_id for match in mutual] == expected
+            for match in mutual:
+                assert forward[match.partner_id][match.their_rank - 1] == (student_id, match.their_score)
+                assert ranked[match.rank - 1] == (match.partner_id, match.score)
+            assert index.listed_by_count(student_id) == \
+                sum(1 for other in forward.values() if student_id in dict(other))
+
+    def test_min_score_applies_both_ways(self):
+        """Pairs below min_score in either direction are left out, and max_results caps the list"""
+        index = MutualMatchIndex(2, 1, {
+            1: [(2, 90.0), (3, 70.0)],
+            2: [(1, 60.0), (3, 50.0)],
+            3: [(1, 80.0), (2, 75.0)]
+        })
+
+        assert [match.partner_id for match in index.mutual(1)] == [2, 3]
+        assert [match.partner_id for match in index.mutual(1, min_score=65.0)] == [3]
+        assert [match.partner_id for match in index.mutual(1, max_results=1)] == [2]
+        assert index.mutual(4) == []
+        assert index.stats()["mutual_pairs"] == 3
+
+    def test_updated_equals_rebuilt(self):
+        """Replacing and dropping lists gives the index built from the new lists, leaving the old one alone"""
+        forward = forward_lists(10)
+        index = MutualMatchIndex(10, 1, forward)
+        mutual_before = {student_id: [match.partner_id for match in index.mutual(student_id)] for student_id in forward}
+        changed = {1: [(5, 99.0), (7, 98.0)], 2: forward[3][:4], 151: [(1, 90.0), (2, 80.0)]}
+
+        updated = index.updated(2, changed, removed_ids=[3])
+        new_forward = {**{student_id: ranked for student_id, ranked in forward.items() if student_id != 3}, **changed}
+        rebuilt = MutualMatchIndex(10, 2, new_forward)
+
+        assert updated.forward == rebuilt.forward
+        assert {partner_id: listed for partner_id, listed in updated.reverse.items() if listed} == rebuilt.reverse
+        assert {student_id: [match.partner_id for match in index.mutual(student_id)]
+                for student_id in forward} == mutual_before
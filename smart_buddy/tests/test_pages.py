@@ -0,0 +1,92 @@
+"""
+API tests for the HTML page routes
+Testing the profile form writes canonical matching fields and match keys
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from smart_buddy.models.sqlalchemy_models import Profile, Base
+from smart_buddy.routers import pages
+from smart_buddy.matching.profile_normalization import PROFILE_FORMAT_VERSION
+
+# Test database setup
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_pages.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+app = FastAPI()
+app.include_router(pages.router)
+
+FORM = {
+    "email": "form@example.com",
+    "username": "formuser",
+    "study_style": "Group",
+    "preferred_environment": "Quiet",
+    "personality_traits": '{"type": "Introvert"}',
+    "academic_focus_areas": "Computer Science, Mathematics",
+    "password": "testpassword"
+}
+
+@pytest.fixture
+def client(monkeypatch):
+    """Create test client, with the form writing to the test database"""
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(pages, "SessionLocal", TestingSessionLocal)
+    yield TestClient(app)
+    Base.metadata.drop_all(bind=engine)
+
+
+class TestProfileForm:
+    """Test POST /profile"""
+
+    def test_stores_match_keys(self, client):
+        """Test a submitted profile is stored canonical, with the keys the candidate prefilter reads"""
+        client.post("/profile", data=FORM)
+
+        db = TestingSessionLocal()
+        try:
+            profile = db.query(Profile).filter(Profile.email == "form@example.com").one()
+            assert profile.personality_traits == "Introvert"
+            assert profile.academic_focus_areas == ["Computer Science", "Mathematics"]
+            assert profile.availability == {}
+            assert profile.profile_format_version == PROFILE_FORMAT_VERSION
+            assert (profile.personality_key, profile.study_style_key, profile.environment_key) == \
+                ("INTROVERT", "GROUP", "QUIET")
+            assert profile.availability_mask == 0
+        finally:
+            db.close()
+
+    @pytest.mark.parametrize("availability", [
+        ["Monday Morning", "Tuesday Evening", "Monday Afternoon"],
+        ['{"Monday": ["Morning", "Afternoon"]}', '{"Tuesday": "Evening"}'],
+    ])
+    def test_stores_submitted_availability(self, client, availability):
+        """Test "Day Slot" and JSON availability entries are stored as a day -> slots dict with its mask"""
+        client.post("/profile", data={**FORM, "availability": availability})
+
+        db = TestingSessionLocal()
+        try:
+            profile = db.query(Profile).filter(Profile.email == "form@example.com").one()
+            assert profile.availability == {"Monday": ["Morning", "Afternoon"], "Tuesday": ["Evening"]}
+            assert profile.availability_mask == (1 << 0) | (1 << 1) | (1 << 5)
+        finally:
+            db.close()
+
+    def test_rejects_malformed_profile(self, client):
+        """Test a profile without a personality type is refused before anything is stored"""
+        response = client.post("/profile", data={**FORM, "personality_traits": " "})
+
+        assert response.status_code == 400
+        db = TestingSessionLocal()
+        try:
+            assert db.query(Profile).count() == 0
+        finally:
+            db.close()
+
+    def test_rejects_malformed_availability(self, client):
+        """Test an availability entry without a time slot is refused"""
+        response = client.post("/profile", data={**FORM, "availability": ["Monday"]})
+
+        assert response.status_code == 400
@@ -0,0 +1,99 @@
+"""
+Unit tests for course and department partitions of the population
+Tests shard keys, partitioned rankings and partitions kept current by profile store refreshes
+"""
+import random
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from smart_buddy.matching.compatibility_engine import CompatibilityEngine
+from smart_buddy.matching.encoded_population import EncodedPopulation
+from smart_buddy.matching.population_partitions import PopulationPartitions, shard_key, shard_keys, shard_of
+from smart_buddy.matching.profile_store import ProfileStore, register_profile_store_events
+from smart_buddy.tests.test_encoded_population import random_student
+from smart_buddy.tests.test_profile_store import Base, Profile, COLUMNS, profile_row
+
+
+def full_rebuild(population):
+    partitions = PopulationPartitions()
+    partitions.rebuild(population, None)
+    return partitions.members
+
+
+class TestPopulationPartitions:
+    """Test partitioned search over the encoded population"""
+
+    def test_shard_keys(self):
+        """Course codes share their department's partition; other subjects are their own"""
+        assert shard_key("ITSC 4155") == shard_key("itsc-3160") == "ITSC"
+        assert shard_key(" Physics ") == "PHYSICS"
+        assert shard_key("") is None
+        assert shard_keys(["CS", "cs", "MATH 1241", None]) == {"CS", "MATH"}
+        assert shard_of("ITSC", 4) == shard_of("ITSC", 4)
+
+    def test_partitioned_ranking_is_full_ranking_restricted(self):
+        """Scoring only the candidates ranks them exactly as the full ranking would"""
+        rng = random.Random(3)
+        population = EncodedPopulation()
+        for student_id in range(1, 301):
+            population.add(random_student(rng, student_id))
+        partitions = PopulationPartitions()
+        partitions.rebuild(population, 1)
+        engine = CompatibilityEngine()
+
+        for student_id in range(1, 40):
+            student = random_student(random.Random(student_id), 1000 + student_id)
+            candidates = partitions.candidate_ids(population, student)
+            if candidates is None:
+                assert not shard_keys(student.academic_focus_areas)
+                continue
+            keys = shard_keys(student.academic_focus_areas)
+            sharing = {population.ids[index] for index in range(len(population))
+                       if partitions.population_keys(population, population.ids[index]) & keys}
+            assert set(candidates) == sharing
+
+            full = population.top_matches(engine, student, min_score=0.0, max_results=len(population))
+            assert population.top_matches(engine, student, min_score=40.0, max_results=10,
+                                          indexes=population.indexes_of(candidates)) == \
+                [pair for pair in full if pair[0] in sharing and pair[1] >= 40.0][:10]
+
+    def test_global_sample_and_owned_shards(self):
+        """The sample adds at most global_sample students; unowned partitions are never built"""
+        population = EncodedPopulation()
+        rng = random.Random(8)
+        for student_id in range(1, 201):
+            population.add(random_student(rng, student_id))
+        partitions = PopulationPartitions(owns=lambda key: key == "CS")
+        partitions.rebuild(population, 1)
+        student = random_student(rng, 500)
+        student.academic_focus_areas = ["Art"]
+
+        assert set(partitions.members) == {"CS"}
+        assert partitions.candidate_ids(population, student) == []
+        assert len(partitions.candidate_ids(population, student, global_sample=25)) == 25
+
+
+class TestStorePartitions:
+    """Test partitions maintained by the profile store"""
+
+    def test_refresh_rebuilds_touched_partitions(self):
+        """After writes and deletes the partitions equal a full rebuild of the new population"""
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        db = sessionmaker(bind=engine)()
+        db.execute(insert(Profile), [profile_row(i, academic_focus_areas=[["CS"], ["MATH 1241"], ["Art"]][i % 3])
+                                     for i in range(1, 31)])
+        db.commit()
+        store = ProfileStore(COLUMNS, Profile.id, Profile.updated_at, refresh_interval=3600)
+        register_profile_store_events(Profile, store)
+        store.load(db)
+        assert store.current_partitions().members == full_rebuild(store.population)
+
+        db.get(Profile, 1).academic_focus_areas = ["ITSC 4155"]
+        db.get(Profile, 2).academic_focus_areas = ["CS", "MATH 2164"]
+        db.delete(db.get(Profile, 3))
+        db.commit()
+        with store.read(db) as population:
+            assert store.partitions.version == store.version
+            assert store.current_partitions().members == full_rebuild(population)
+            assert 1 in store.partitions.members["ITSC"] and 3 not in store.partitions.members["ART"]
+        db.close()
@@ -0,0 +1,171 @@
+"""
+Unit tests for the memory-mapped population snapshot
+Tests round trips through the snapshot file, generation swaps between worker stores and warm starts
+"""
+import random
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine, delete, insert
+from sqlalchemy.orm import sessionmaker
+from smart_buddy.matching.compatibility_engine import CompatibilityEngine, StudentProfile
+from smart_buddy.matching.encoded_population import EncodedPopulation
+from smart_buddy.matching.population_snapshot import MappedPopulation, SnapshotError, write_snapshot
+from smart_buddy.matching.profile_store import ProfileStore, register_profile_store_events
+from smart_buddy.tests.test_encoded_population import random_student
+from smart_buddy.tests.test_profile_store import Base, Profile, COLUMNS, profile_row
+
+
+@pytest.fixture
+def population():
+    """Encoded population of varied students with known versions"""
+    rng = random.Random(5)
+    population = EncodedPopulation()
+    for student_id in range(1, 151):
+        student = random_student(rng, student_id)
+        student.version = datetime(2026, 10, 1, 8, 30, 15, student_id)
+        population.add(student)
+    return population
+
+
+@pytest.fixture
+def db():
+    """Session over an in-memory database with three profiles"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.execute(insert(Profile), [profile_row(i) for i in range(1, 4)])
+    session.commit()
+    yield session
+    session.close()
+
+
+class TestMappedPopulation:
+    """Test that a mapped snapshot behaves like the population it was written from"""
+
+    def test_rankings_identical(self, population, tmp_path):
+        """Scores and rankings from the mapping equal those of the source population"""
+        path = str(tmp_path / "population.snapshot")
+        write_snapshot(population, path, generation=1)
+        mapped = MappedPopulation(path)
+        engine = CompatibilityEngine()
+        rng = random.Random(8)
+
+        for student_id in range(1000, 1020):
+            student = random_student(rng, student_id)
+            assert mapped.top_matches(engine, student, min_score=40.0, max_results=15) == \
+                population.top_matches(engine, student, min_score=40.0, max_results=15)
+
+    def test_columns_round_trip(self, population, tmp_path):
+        """Ids, lookups, names and versions read back unchanged"""
+        path = str(tmp_path / "population.snapshot")
+        write_snapshot(population, path, generation=3, last_seen=datetime(2026, 10, 1))
+        mapped = MappedPopulation(path)
+
+        assert mapped.generation == 3
+        assert mapped.last_seen == datetime(2026, 10, 1)
+        assert list(mapped.ids) == list(population.ids)
+        assert mapped.index_by_id[42] == population.index_by_id[42]
+        assert 999 not in mapped.index_by_id
+        assert mapped.usernames[7] == population.usernames[7]
+        assert mapped.versions[7] == population.versions[7]
+
+    def test_wide_availability_masks(self, tmp_path):
+        """Masks over more than 64 distinct slots survive the round trip"""
+        population = EncodedPopulation()
+        for student_id in range(1, 4):
+            population.add(StudentProfile(
+                id=student_id, username=f"s{student_id}", email="", personality_type="Introvert",
+                study_style="Group", preferred_environment="Quiet", academic_focus_areas=[],
+                availability={f"Day{day}": [f"Slot{slot}" for slot in range(student_id, 10)] for day in range(10)}
+            ))
+        path = str(tmp_path / "population.snapshot")
+        write_snapshot(population, path, generation=1)
+
+        assert MappedPopulation(path).thaw().slot_masks == population.slot_masks
+
+    def test_thaw_is_writable_copy(self, population, tmp_path):
+        """A thawed copy can be changed without touching the mapping"""
+        path = str(tmp_path / "population.snapshot")
+        write_snapshot(population, path, generation=1)
+        mapped = MappedPopulation(path)
+
+        copy = mapped.thaw()
+        copy.remove(1)
+
+        assert len(copy) == len(population) - 1
+        assert len(mapped) == len(population)
+        with pytest.raises(TypeError):
+            mapped.remove(1)
+
+    def test_rejects_other_files(self, tmp_path):
+        """Files that are not snapshots are refused"""
+        path = tmp_path / "population.snapshot"
+        path.write_bytes(b"not a snapshot at all, just some bytes")
+
+        with pytest.raises(SnapshotError):
+            MappedPopulation(str(path))
+
+
+class TestSharedProfileStore:
+    """Test profile stores backed by a snapshot file"""
+
+    def test_workers_share_generations(self, db, tmp_path):
+        """A refresh in one worker publishes a generation the other worker maps"""
+        path = str(tmp_path / "population.snapshot")
+        writer = ProfileStore(COLUMNS, Profile.id, Profile.updated_at, refresh_interval=3600, snapshot_path=path)
+        register_profile_store_events(Profile, writer)
+        reader = ProfileStore(COLUMNS, Profile.id, Profile.updated_at, refresh_interval=3600, snapshot_path=path)
+
+        writer.load(db)
+        reader.load(db)
+        assert isinstance(reader.population, MappedPopulation)
+        assert reader.version == writer.version == 1
+
+        db.get(Profile, 2).study_style = "Individual"
+        db.commit()
+        with writer.read(db):
+            pass
+        with reader.read(db) as population:
+            style = population.style_vocab.values[population.style_codes[population.index_by_id[2]]]
+
+        assert style == "INDIVIDUAL"
+        assert reader.version == writer.version == 2
+
+    def test_warm_start_catches_up(self, db, tmp_path):
+        """A restarted store maps the old snapshot and applies only what changed since"""
+        path = str(tmp_path / "population.snapshot")
+        ProfileStore(COLUMNS, Profile.id, Profile.updated_at, snapshot_path=path).load(db)
+        db.execute(insert(Profile), [profile_row(4, datetime(2026, 10, 19, 13, 0, 0), study_style="Mixed")])
+        db.execute(delete(Profile).where(Profile.id == 1))
+        db.commit()
+
+        restarted = ProfileStore(COLUMNS, Profile.id, Profile.updated_at, snapshot_path=path)
+        restarted.load(db)
+
+        assert restarted.load_stats["source"] == "snapshot"
+        assert restarted.load_stats["caught_up"] == {"updated": 1, "removed": 1}
+        assert sorted(restarted.population.ids) == [2, 3, 4]
+        assert restarted.version == 2
+
+    def test_rebuild_ignores_snapshot(self, db, tmp_path):
+        """An offline build reads the table and publishes the next generation"""
+        path = str(tmp_path / "population.snapshot")
+        ProfileStore(COLUMNS, Profile.id, Profile.updated_at, snapshot_path=path).load(db)
+
+        builder = ProfileStore(COLUMNS, Profile.id, Profile.updated_at, snapshot_path=path)
+        builder.load(db, from_snapshot=False)
+
+        assert builder.load_stats["source"] == "database"
+        assert MappedPopulation(path).generation == 2
+
+    def test_unusable_snapshot_rebuilt(self, db, tmp_path):
+        """A snapshot in an unknown format is replaced from the database"""
+        path = tmp_path / "population.snapshot"
+        path.write_bytes(b"SBPOPSNP" + b"\xff" * 64)
+
+        store = ProfileStore(COLUMNS, Profile.id, Profile.updated_at, snapshot_path=str(path))
+        store.load(db)
+
+        assert store.load_stats["source"] == "database"
+        assert "format version" in store.load_stats["snapshot_error"]
+        assert len(MappedPopulation(str(path))) == 3
@@ -0,0 +1,133 @@
+"""
+Unit tests for the request-scoped profile cache
+Tests that each profile is queried and parsed at most once per request
+"""
+import pytest
+from sqlalchemy import create_engine, event, select, Column, Integer, String, JSON
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import declarative_base
+from smart_buddy.matching.compatibility_engine import StudentProfile
+from smart_buddy.matching.profile_cache import RequestProfileCache
+
+
+Base = declarative_base()
+
+
+class Profile(Base):
+    """Matching columns of the profiles table"""
+    __tablename__ = "profiles"
+    id = Column(Integer, primary_key=True)
+    username = Column(String(100))
+    email = Column(String(255))
+    personality_traits = Column(JSON)
+    study_style = Column(String(100))
+    preferred_environment = Column(String(100))
+    academic_focus_areas = Column(JSON)
+    availability = Column(JSON)
+
+
+@pytest.fixture
+def engine():
+    """In-memory database with five profiles and a statement counter"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(Profile.__table__.insert(), [
+            {"id": i, "username": f"student{i}", "email": f"student{i}@example.com",
+             "personality_traits": {"type": "Introvert"}, "study_style": "Group",
+             "preferred_environment": "Quiet", "academic_focus_areas": ["CS"],
+             "availability": {"Monday": ["Morning"]}}
+            for i in range(1, 6)
+        ])
+
+    engine.statements = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: engine.statements.append(statement))
+    return engine
+
+
+@pytest.fixture
+def cache(engine):
+    """Profile cache backed by the test database"""
+    connection = engine.connect()
+    yield RequestProfileCache(
+        lambda ids: connection.execute(select(Profile.__table__).where(Profile.id.in_(ids))).all()
+    )
+    connection.close()
+
+
+class TestRequestProfileCache:
+    """Test query counts of the request-scoped cache"""
+
+    def test_each_profile_queried_once(self, cache, engine, mocker):
+        """Overlapping lookups only query and parse profiles not seen yet"""
+        parse = mocker.spy(StudentProfile, "from_db_profile")
+
+        student = cache.get(1)
+        partners = cache.get_many([2, 3, 4])
+        again = cache.get_many([1, 2, 3, 4])
+
+        assert len(engine.statements) == 2
+        assert parse.call_count == 4
+        assert again == [student] + partners
+
+    def test_results_ordered_by_id_without_duplicates(self, cache):
+        """Profiles come back in id order, like an unordered IN query on the primary key"""
+        profiles = cache.get_many([4, 2, 4, 1])
+
+        assert [profile.id for profile in profiles] == [1, 2, 4]
+
+    def test_missing_profiles_remembered(self, cache, engine):
+        """Ids that do not exist are not queried again"""
+        assert cache.get(99) is None
+        assert cache.get_many([99, 1]) == [cache.get(1)]
+        assert cache.get(99) is None
+
+        assert len(engine.statements) == 2
+
+    def test_large_lookups_batched(self, engine):
+        """IN lists are split into bounded batches"""
+        connection = engine.connect()
+        cache = RequestProfileCache(
+            lambda ids: connection.execute(select(Profile.__table__).where(Profile.id.in_(ids))).all(),
+            batch_size=2
+        )
+
+        assert len(cache.get_many(range(1, 6))) == 5
+        assert cache.queries == 3
+        connection.close()
+
+    def test_primed_profiles_not_queried(self, cache, engine):
+        """Profiles added directly are served without a query"""
+        cache.add(StudentProfile(id=7, username="primed", email="p@example.com", personality_type="Introvert",
+                                 study_style="Group", preferred_environment="Quiet",
+                                 academic_focus_areas=[], availability={}))
+
+        assert cache.get(7).username == "primed"
+        assert engine.statements == []
+
+    @pytest.mark.asyncio
+    async def test_async_loads_served_synchronously(self, tmp_path):
+        """Profiles loaded with aget_many are then served by get_many without any loader"""
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'profiles.db'}")
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+            await connection.execute(Profile.__table__.insert(), [
+                {"id": i, "username": f"student{i}", "personality_traits": "Introvert", "study_style": "Group",
+                 "preferred_environment": "Quiet", "academic_focus_areas": ["CS"], "availability": {}}
+                for i in range(1, 4)
+            ])
+
+        async with engine.connect() as connection:
+            async def load(ids):
+                return (await connection.execute(select(Profile.__table__).where(Profile.id.in_(ids)))).all()
+            cache = RequestProfileCache(async_loader=load)
+
+            assert (await cache.aget(2)).username == "student2"
+            assert [profile.id for profile in await cache.aget_many([1, 2, 9])] == [1, 2]
+
+        assert [profile.id for profile in cache.get_many([2, 1, 9])] == [1, 2]
+        assert cache.queries == 2
+        with pytest.raises(RuntimeError):
+            cache.get(3)
+        await engine.dispose()
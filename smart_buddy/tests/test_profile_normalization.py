@@ -0,0 +1,122 @@
+"""
+Unit tests for write-time profile normalization
+Tests that canonical profiles read exactly like legacy rows, strict validation and the backfill
+"""
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import create_engine, insert, select, Column, BigInteger, DateTime, Integer, String, JSON
+from sqlalchemy.orm import declarative_base, sessionmaker
+from smart_buddy.matching.compatibility_engine import StudentProfile
+from smart_buddy.matching.profile_normalization import PROFILE_FORMAT_VERSION, ProfileFormatError, \
+    normalize_profile_fields, backfill_profile_format, register_profile_normalization
+
+
+Base = declarative_base()
+
+
+class Profile(Base):
+    """Matching columns of the profiles table"""
+    __tablename__ = "profiles"
+    id = Column(Integer, primary_key=True)
+    username = Column(String(100))
+    email = Column(String(255))
+    personality_traits = Column(JSON)
+    study_style = Column(String(100))
+    preferred_environment = Column(String(100))
+    academic_focus_areas = Column(JSON)
+    availability = Column(JSON)
+    updated_at = Column(DateTime)
+    profile_format_version = Column(Integer)
+    personality_key = Column(String(100))
+    study_style_key = Column(String(100))
+    environment_key = Column(String(100))
+    availability_mask = Column(BigInteger)
+
+
+register_profile_normalization(Profile)
+
+# Raw values seen in stored profiles, as (personality_traits, academic_focus_areas, availability)
+LEGACY_VALUES = [
+    ("Introvert", "CS", {"Monday": ["Morning"]}),
+    ('{"type": "Extrovert"}', '["CS", "Math"]', '{"Tuesday": ["Evening", "Evening"]}'),
+    ('"Ambivert"', '"Physics"', "not json"),
+    ("42", "  ", None),
+    (None, None, ""),
+    ("Introvert", ["CS", "", None, 3], {"Friday": ["Afternoon"]}),
+    ("Introvert", 7, {}),
+]
+
+
+def raw_profile(personality_traits, academic_focus_areas, availability, **columns):
+    """Row-like object with the attributes from_db_profile reads"""
+    return SimpleNamespace(id=1, username="a", email="a@example.com", study_style="Group",
+                           preferred_environment="Quiet", updated_at=None, personality_traits=personality_traits,
+                           academic_focus_areas=academic_focus_areas, availability=availability, **columns)
+
+
+@pytest.fixture
+def db():
+    """Session over an empty in-memory profiles table"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+class TestProfileNormalization:
+    """Test canonical profile fields"""
+
+    @pytest.mark.parametrize("values", LEGACY_VALUES)
+    def test_canonical_rows_read_like_legacy_rows(self, values):
+        """The unparsed read of a canonical row equals the parsed read of the raw row"""
+        legacy = StudentProfile.from_db_profile(raw_profile(*values))
+        canonical = StudentProfile.from_db_profile(raw_profile(**normalize_profile_fields(*values, strict=False)))
+
+        assert canonical == legacy
+
+    def test_type_objects_unwrapped(self):
+        """A personality object stored by the JSON column keeps only its type"""
+        fields = normalize_profile_fields({"type": "Introvert"}, [], {})
+
+        assert fields["personality_traits"] == "Introvert"
+        assert fields["profile_format_version"] == PROFILE_FORMAT_VERSION
+
+    @pytest.mark.parametrize("values", [
+        (None, [], {}),
+        ("Introvert", [], ["Monday-Morning"]),
+        ("Introvert", [], {"Monday": 3}),
+    ])
+    def test_strict_rejects_malformed_values(self, values):
+        """Writes with unusable matching fields are refused"""
+        with pytest.raises(ProfileFormatError):
+            normalize_profile_fields(*values)
+
+    def test_orm_writes_normalized(self, db):
+        """Profiles saved through the ORM are stored canonical"""
+        db.add(Profile(id=1, username="a", personality_traits='{"type": "Introvert"}', study_style="group",
+                       academic_focus_areas='["CS"]', availability='{"Monday": ["Morning"]}'))
+        db.commit()
+
+        row = db.execute(select(Profile.__table__)).one()
+        assert (row.personality_traits, row.academic_focus_areas, row.availability) == \
+            ("Introvert", ["CS"], {"Monday": ["Morning"]})
+        assert row.profile_format_version == PROFILE_FORMAT_VERSION
+        assert (row.personality_key, row.study_style_key, row.environment_key, row.availability_mask) == \
+            ("INTROVERT", "GROUP", "NONE", 1)
+
+    def test_backfill_rewrites_old_rows(self, db):
+        """Old rows are normalized in batches and a second run has nothing to do"""
+        db.execute(insert(Profile), [
+            {"id": i, "username": f"s{i}", "personality_traits": '{"type": "Introvert"}',
+             "academic_focus_areas": "CS", "availability": '{"Monday": ["Morning"]}'}
+            for i in range(1, 6)
+        ])
+        db.commit()
+
+        assert backfill_profile_format(db, Profile.__table__, batch_size=2) == {"normalized": 5}
+        assert backfill_profile_format(db, Profile.__table__) == {"normalized": 0}
+        rows = db.execute(select(Profile.__table__)).all()
+        assert {(row.personality_traits, tuple(row.academic_focus_areas), row.profile_format_version)
+                for row in rows} == {("Introvert", ("CS",), PROFILE_FORMAT_VERSION)}
+        assert {(row.personality_key, row.availability_mask) for row in rows} == {("INTROVERT", 1)}
@@ -0,0 +1,207 @@
+"""
+Unit tests for the resident profile store
+Tests the initial load, commit-driven and polled refreshes, deletes, the version counter and async refreshes
+"""
+from datetime import datetime, timedelta
+import asyncio
+import threading
+import time
+import pytest
+from sqlalchemy import create_engine, delete, insert, Column, DateTime, Integer, String, JSON
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+from smart_buddy.matching.profile_store import ProfileStore, register_profile_store_events
+
+
+Base = declarative_base()
+NOW = datetime(2026, 10, 19, 12, 0, 0)
+
+
+class Profile(Base):
+    """Matching columns of the profiles table"""
+    __tablename__ = "profiles"
+    id = Column(Integer, primary_key=True)
+    username = Column(String(100))
+    email = Column(String(255))
+    personality_traits = Column(JSON)
+    study_style = Column(String(100))
+    preferred_environment = Column(String(100))
+    academic_focus_areas = Column(JSON)
+    availability = Column(JSON)
+    updated_at = Column(DateTime, default=NOW)
+
+
+COLUMNS = (Profile.id, Profile.username, Profile.email, Profile.personality_traits, Profile.study_style,
+           Profile.preferred_environment, Profile.academic_focus_areas, Profile.availability,
+           Profile.updated_at)
+
+
+def profile_row(student_id, updated_at=NOW, **fields):
+    """Column values for one profile"""
+    return {"id": student_id, "username": f"student{student_id}", "email": f"student{student_id}@example.com",
+            "personality_traits": {"type": "Introvert"}, "study_style": "Group", "preferred_environment": "Quiet",
+            "academic_focus_areas": ["CS"], "availability": {"Monday": ["Morning"]}, "updated_at": updated_at,
+            **fields}
+
+
+@pytest.fixture
+def db():
+    """Session over an in-memory database with three profiles"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.execute(insert(Profile), [profile_row(i) for i in range(1, 4)])
+    session.commit()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def store(db):
+    """Loaded store that only refreshes when asked or when changes are pending"""
+    store = ProfileStore(COLUMNS, Profile.id, Profile.updated_at, refresh_interval=3600)
+    register_profile_store_events(Profile, store)
+    store.load(db)
+    return store
+
+
+def style_of(store, student_id):
+    """Decoded study style code of a stored profile"""
+    population = store.population
+    return population.style_vocab.values[population.style_codes[population.index_by_id[student_id]]]
+
+
+class TestProfileStore:
+    """Test incremental freshness of the resident population"""
+
+    def test_initial_load(self, store):
+        """Every profile is encoded once at load"""
+        assert len(store.population) == 3
+        assert store.version == 1
+        assert store.last_seen == NOW
+
+    def test_committed_orm_write_applied_on_next_read(self, store, db):
+        """ORM commits are re-read even when updated_at did not move"""
+        db.get(Profile, 2).study_style = "Individual"
+        db.commit()
+
+        with store.read(db) as population:
+            assert style_of(store, 2) == "INDIVIDUAL"
+            assert len(population) == 3
+        assert store.version == 2
+
+    def test_rolled_back_write_ignored(self, store, db):
+        """Rolled back changes never mark profiles dirty"""
+        db.get(Profile, 2).study_style = "Individual"
+        db.flush()
+        db.rollback()
+
+        assert store.stats()["pending_changes"] == 0
+        with store.read(db):
+            assert style_of(store, 2) == "GROUP"
+
+    def test_other_writers_found_by_polling(self, store, db):
+        """Rows inserted outside the ORM are picked up by updated_at"""
+        db.execute(insert(Profile), [profile_row(4, NOW + timedelta(minutes=1), study_style="Mixed")])
+        db.commit()
+
+        assert store.refresh(db) == {"updated": 1, "removed": 0}
+        assert style_of(store, 4) == "MIXED"
+        assert store.last_seen == NOW + timedelta(minutes=1)
+
+    def test_unchanged_rows_not_reapplied(self, store, db):
+        """A refresh with no changes leaves the version alone"""
+        assert store.refresh(db) == {"updated": 0, "removed": 0}
+        assert store.version == 1
+
+    def test_deletes_reconciled(self, store, db):
+        """ORM deletes and deletes by other writers both remove profiles"""
+        db.delete(db.get(Profile, 1))
+        db.commit()
+        db.execute(delete(Profile).where(Profile.id == 3))
+        db.commit()
+
+        assert store.refresh(db) == {"updated": 0, "removed": 2}
+        assert list(store.population.ids) == [2]
+
+    def test_changed_since(self, store, db):
+        """Changed ids are known across refreshes until a full load"""
+        db.get(Profile, 2).study_style = "Individual"
+        db.commit()
+        store.refresh(db)
+        db.delete(db.get(Profile, 3))
+        db.commit()
+        store.refresh(db)
+
+        assert store.changed_since(3) == set()
+        assert store.changed_since(2) == {3}
+        assert store.changed_since(1) == {2, 3}
+        store.load(db)
+        assert store.changed_since(3) is None
+
+    def test_read_loads_lazily(self, db):
+        """A store that was never loaded loads on first read"""
+        store = ProfileStore(COLUMNS, Profile.id, Profile.updated_at)
+
+        with store.read(db) as population:
+            assert len(population) == 3
+
+    @pytest.mark.asyncio
+    async def test_async_refresh(self, tmp_path):
+        """An async session loads and refreshes the store; ranking then reads it without one"""
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'profiles.db'}")
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+            await connection.execute(insert(Profile), [profile_row(i) for i in range(1, 4)])
+        store = ProfileStore(COLUMNS, Profile.id, Profile.updated_at, refresh_interval=0)
+
+        async with AsyncSession(engine) as db:
+            await store.ensure_fresh_async(db)
+            await db.execute(insert(Profile), [profile_row(4, NOW + timedelta(minutes=1))])
+            await db.commit()
+            await store.ensure_fresh_async(db)
+
+        with store.current() as population:
+            assert sorted(population.ids) == [1, 2, 3, 4]
+        assert store.version == 2
+        await engine.dispose()
+
+    @pytest.mark.asyncio
+    async def test_async_refresh_waits_off_the_event_loop(self, tmp_path):
+        """A due refresh waits for a ranking that holds the store, while the event loop keeps running"""
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'profiles.db'}")
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+            await connection.execute(insert(Profile), [profile_row(i) for i in range(1, 4)])
+        store = ProfileStore(COLUMNS, Profile.id, Profile.updated_at, refresh_interval=0)
+
+        ranking = threading.Event()
+        ranked_sizes = []
+
+        def rank():
+            with store.current() as population:
+                ranking.set()
+                time.sleep(0.3)
+                ranked_sizes.append(len(population))
+
+        async with AsyncSession(engine) as db:
+            await store.ensure_fresh_async(db)
+            await db.execute(insert(Profile), [profile_row(4, NOW + timedelta(minutes=1))])
+            await db.commit()
+
+            ranker = threading.Thread(target=rank)
+            ranker.start()
+            await asyncio.to_thread(ranking.wait)
+            refresh = asyncio.ensure_future(store.ensure_fresh_async(db))
+            ticks = 0
+            while not refresh.done():
+                await asyncio.sleep(0.01)
+                ticks += 1
+            await refresh
+            ranker.join()
+
+        assert ticks >= 10
+        assert ranked_sizes == [3]
+        with store.current() as population:
+            assert sorted(population.ids) == [1, 2, 3, 4]
+        await engine.dispose()
@@ -0,0 +1,116 @@
+"""
+Unit tests for the schedule result cache
+Tests canonical keys, LRU eviction, size limits and profile-driven invalidation
+"""
+import pytest
+from sqlalchemy import create_engine, Column, Integer, String
+from sqlalchemy.orm import declarative_base, sessionmaker
+from smart_buddy.matching.result_cache import (
+    ScheduleResultCache, schedule_cache_key, register_profile_invalidation
+)
+
+
+WEIGHTS = {"personality": 0.25, "availability": 0.25}
+CONSTRAINTS = {"max_sessions_per_day": 2, "max_sessions_per_week": 6}
+
+
+class TestScheduleCacheKey:
+    """Test the canonical input hash"""
+
+    def test_member_order_ignored(self):
+        """The same group in a different order hashes the same"""
+        key1 = schedule_cache_key([(1, "v1"), (2, "v1")], WEIGHTS, CONSTRAINTS, True)
+        key2 = schedule_cache_key([(2, "v1"), (1, "v1")], dict(reversed(list(WEIGHTS.items()))),
+                                  CONSTRAINTS, True)
+        assert key1 == key2
+
+    @pytest.mark.parametrize("versions, weights, constraints, optimize", [
+        ([(1, "v2"), (2, "v1")], WEIGHTS, CONSTRAINTS, True),
+        ([(1, "v1"), (3, "v1")], WEIGHTS, CONSTRAINTS, True),
+        ([(1, "v1"), (2, "v1")], {**WEIGHTS, "availability": 0.5}, CONSTRAINTS, True),
+        ([(1, "v1"), (2, "v1")], WEIGHTS, {**CONSTRAINTS, "max_sessions_per_day": 1}, True),
+        ([(1, "v1"), (2, "v1")], WEIGHTS, CONSTRAINTS, False),
+    ])
+    def test_any_input_change_changes_key(self, versions, weights, constraints, optimize):
+        """Versions, members, weights, constraints and optimize all feed the key"""
+        base = schedule_cache_key([(1, "v1"), (2, "v1")], WEIGHTS, CONSTRAINTS, True)
+        assert schedule_cache_key(versions, weights, constraints, optimize) != base
+
+
+class TestScheduleResultCache:
+    """Test LRU storage and invalidation"""
+
+    def test_hit_returns_copy(self):
+        """Callers cannot mutate the cached result"""
+        cache = ScheduleResultCache()
+        cache.put("k", [1, 2], {"schedule": {"Monday": []}})
+
+        result = cache.get("k")
+        result["schedule"]["Monday"].append("x")
+
+        assert cache.get("k") == {"schedule": {"Monday": []}}
+        assert cache.hits == 2
+
+    def test_least_recently_used_evicted(self):
+        """The entry not read for longest is evicted first"""
+        cache = ScheduleResultCache(max_entries=2)
+        cache.put("a", [1], {"n": 1})
+        cache.put("b", [2], {"n": 2})
+        cache.get("a")
+        cache.put("c", [3], {"n": 3})
+
+        assert cache.get("b") is None
+        assert cache.get("a") == {"n": 1}
+        assert cache.evictions == 1
+
+    def test_byte_limit(self):
+        """Total size stays under max_bytes and oversized results are skipped"""
+        cache = ScheduleResultCache(max_bytes=40)
+        cache.put("big", [1], {"payload": "x" * 100})
+        cache.put("a", [1], {"payload": "x" * 10})
+        cache.put("b", [2], {"payload": "y" * 10})
+
+        assert cache.get("big") is None
+        assert len(cache) == 1
+        assert cache.stats()["bytes"] <= 40
+
+    def test_invalidate_student(self):
+        """Only results that include the student are dropped"""
+        cache = ScheduleResultCache()
+        cache.put("ab", [1, 2], {"n": 1})
+        cache.put("bc", [2, 3], {"n": 2})
+        cache.put("cd", [3, 4], {"n": 3})
+
+        assert cache.invalidate_student(2) == 2
+        assert cache.get("ab") is None and cache.get("bc") is None
+        assert cache.get("cd") == {"n": 3}
+        assert cache.invalidate_student(2) == 0
+
+    def test_profile_write_invalidates(self):
+        """ORM updates and deletes of a profile drop its cached results"""
+        Base = declarative_base()
+
+        class Profile(Base):
+            __tablename__ = "profiles"
+            id = Column(Integer, primary_key=True)
+            username = Column(String(100))
+
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        db = sessionmaker(bind=engine)()
+        db.add_all([Profile(id=1, username="a"), Profile(id=2, username="b"), Profile(id=3, username="c")])
+        db.commit()
+
+        cache = ScheduleResultCache()
+        register_profile_invalidation(Profile, cache)
+        cache.put("ab", [1, 2], {"n": 1})
+        cache.put("bc", [2, 3], {"n": 2})
+
+        db.get(Profile, 1).username = "renamed"
+        db.commit()
+        assert cache.get("ab") is None
+        assert cache.get("bc") == {"n": 2}
+
+        db.delete(db.get(Profile, 3))
+        db.commit()
+        assert len(cache) == 0
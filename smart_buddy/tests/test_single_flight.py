@@ -0,0 +1,85 @@
+"""
+Unit tests for request coalescing
+Tests that concurrent identical calls share one computation and that results and errors fan out
+"""
+import asyncio
+import pytest
+from smart_buddy.matching.single_flight import SingleFlight
+
+
+class Computation:
+    """Counts calls and blocks until released"""
+
+    def __init__(self, result=None, error=None):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.result = result
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class TestSingleFlight:
+    """Test single-flight request coalescing"""
+
+    @pytest.mark.asyncio
+    async def test_identical_calls_share_one_computation(self):
+        """Every concurrent waiter gets the result of a single call"""
+        flights = SingleFlight()
+        computation = Computation(result={"matches": []})
+
+        waiters = [asyncio.create_task(flights.do(("student", 1), computation)) for _ in range(5)]
+        await asyncio.sleep(0)
+        computation.release.set()
+        results = await asyncio.gather(*waiters)
+
+        assert computation.calls == 1
+        assert all(result is results[0] for result in results)
+        assert flights.stats() == {"in_flight": 0, "computed": 1, "coalesced": 4, "coalescing_rate": 0.8}
+
+    @pytest.mark.asyncio
+    async def test_different_keys_computed_separately(self):
+        """Requests with other parameters are not merged"""
+        flights = SingleFlight()
+        computation = Computation(result=1)
+        computation.release.set()
+
+        await asyncio.gather(flights.do(("student", 1), computation), flights.do(("student", 2), computation))
+
+        assert computation.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_errors_fan_out_and_clear_key(self):
+        """Waiters all see the failure and the next request computes again"""
+        flights = SingleFlight()
+        computation = Computation(error=ValueError("database unavailable"))
+
+        waiters = [asyncio.create_task(flights.do("key", computation)) for _ in range(3)]
+        await asyncio.sleep(0)
+        computation.release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+
+        assert all(isinstance(result, ValueError) for result in results)
+        computation.error = None
+        assert await flights.do("key", computation) is None
+        assert computation.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_cancel_others(self):
+        """A request that goes away leaves the shared computation running"""
+        flights = SingleFlight()
+        computation = Computation(result="done")
+
+        first = asyncio.create_task(flights.do("key", computation))
+        second = asyncio.create_task(flights.do("key", computation))
+        await asyncio.sleep(0)
+        first.cancel()
+        computation.release.set()
+
+        assert await second == "done"
+        assert first.cancelled()